@@ -2,9 +2,11 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from app.moteur import SessionRoutee
+import os
 
 # Initialisation des extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': SessionRoutee})
 login_manager = LoginManager()
 
 def create_app(config_class=Config):
@@ -19,6 +21,23 @@ def create_app(config_class=Config):
     login_manager.login_message = 'Veuillez vous connecter pour accéder à cette page.'
     login_manager.login_message_category = 'info'
     
+    from app.cache import cache_utilisateurs
+    cache_utilisateurs.configurer(app.config['CACHE_UTILISATEURS_TAILLE'], app.config['CACHE_UTILISATEURS_TTL'])
+    
+    from app.hachage import hachage
+    hachage.configurer(app.config['HACHAGE_METHODE'], app.config['HACHAGE_FILS'], app.config['HACHAGE_FILE_MAX'])
+    
+    from app.bulletins import file_bulletins, pool_rendus
+    pool_rendus.configurer(app.config['BULLETINS_PROCESSUS'])
+    file_bulletins.configurer(
+        app.config['BULLETINS_CACHE_DOSSIER'] or os.path.join(app.instance_path, 'bulletins'),
+        app.config['BULLETINS_FILE_FILS']
+    )
+    
+    # Référentiels en mémoire, aussi accessibles aux templates : {{ referentiels().nom_classe(id) }}
+    from app.referentiels import referentiels
+    app.add_template_global(referentiels.lire, 'referentiels')
+    
     # Enregistrer les blueprints (routes)
     from app.routes import auth, admin, enseignant, etudiant, main
     app.register_blueprint(auth.bp)
@@ -27,12 +46,55 @@ def create_app(config_class=Config):
     app.register_blueprint(etudiant.bp)
     app.register_blueprint(main.bp)
     
-    # Créer les tables de la base de données
+    # Enregistrer les commandes CLI
+    from app.commandes import bdd_cli, utilisateurs_cli, moyennes_cli, compteurs_cli, bulletins_cli, deliberations_cli, recherche_cli, seed
+    app.cli.add_command(bdd_cli)
+    app.cli.add_command(utilisateurs_cli)
+    app.cli.add_command(moyennes_cli)
+    app.cli.add_command(compteurs_cli)
+    app.cli.add_command(bulletins_cli)
+    app.cli.add_command(deliberations_cli)
+    app.cli.add_command(recherche_cli)
+    app.cli.add_command(seed)
+    
+    # Créer les tables de la base de données puis appliquer les migrations du schéma
     with app.app_context():
+        from app.moteur import configurer_moteur
+        configurer_moteur(app, db)
+        
+        if app.config['INSTRUMENTATION_SQL']:
+            from app.instrumentation import instrumenter
+            moteurs = [db.engine]
+            if 'moteur_lecture' in app.extensions:
+                moteurs.append(app.extensions['moteur_lecture'])
+            instrumenter(app, moteurs)
+        
+        if app.config['METRIQUES']:
+            from app.metriques import installer_metriques
+            moteurs = {'ecriture': db.engine}
+            if 'moteur_lecture' in app.extensions:
+                moteurs['lecture'] = app.extensions['moteur_lecture']
+            installer_metriques(app, moteurs)
+        
         db.create_all()
         
+        from app.migrations import appliquer_migrations
+        appliquer_migrations()
+        
         # Importer la fonction d'initialisation
         from app.utils import init_data
-        init_data()
+        from app.hachage import SaturationHachage
+        try:
+            init_data()
+        except SaturationHachage:
+            # Rien n'est enregistré : les données de base seront créées au prochain démarrage
+            db.session.rollback()
+            app.logger.warning('Pool de hachage saturé : données de base non initialisées')
+        
+        from app.calculs import initialiser_moyennes
+        initialiser_moyennes()
+        
+        from app.compteurs import initialiser_compteurs
+        initialiser_compteurs()
     
     return app
@@ -0,0 +1,342 @@
+from app import db
+from app.models import Etudiant
+from app.deliberations import resultats_bulletins
+from app.metriques import duree_pdf, cache_bulletins
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from flask import current_app
+from reportlab.lib.units import cm
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+# À changer quand la mise en page du PDF change : les bulletins en cache sont alors refaits
+VERSION_MODELE = 2
+
+
+def donnees_bulletin(etudiant, resultat, classe_nom=None):
+    """Préparer les données d'un bulletin sous forme de dictionnaire simple (sérialisable)
+
+    `resultat` vient de resultats_bulletins : la décision du jury n'y
+    figure que si l'étudiant a été délibéré.
+    """
+    return {
+        'nom': etudiant.nom,
+        'prenom': etudiant.prenom,
+        'matricule': etudiant.matricule,
+        'classe': classe_nom,
+        'matieres': resultat['matieres'],
+        'moyenne_generale': resultat['moyenne_generale'],
+        'credits_valides': resultat['credits_valides'],
+        'credits_cible': current_app.config['CREDITS_CIBLE'],
+        'decision': resultat.get('decision')
+    }
+
+
+def generer_bulletin_pdf(donnees):
+    """Dessiner le bulletin PDF et renvoyer son contenu en octets"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # En-tête
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(width/2, height - 2*cm, "BULLETIN DE NOTES")
+
+    c.setFont("Helvetica", 12)
+    c.drawCentredString(width/2, height - 3*cm, "Année Universitaire 2024-2025")
+
+    # Informations étudiant
+    y = height - 5*cm
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(2*cm, y, "Informations de l'étudiant")
+
+    y -= 1*cm
+    c.setFont("Helvetica", 12)
+    c.drawString(2*cm, y, f"Nom: {donnees['nom']}")
+    y -= 0.7*cm
+    c.drawString(2*cm, y, f"Prénom: {donnees['prenom']}")
+    y -= 0.7*cm
+    c.drawString(2*cm, y, f"Matricule: {donnees['matricule']}")
+    y -= 0.7*cm
+    if donnees['classe']:
+        c.drawString(2*cm, y, f"Classe: {donnees['classe']}")
+        y -= 0.7*cm
+
+    # Notes par matière
+    y -= 1*cm
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(2*cm, y, "Notes par matière")
+
+    y -= 1*cm
+    c.setFont("Helvetica", 10)
+
+    # Afficher chaque matière
+    for matiere_nom, data in donnees['matieres'].items():
+        matiere = data['matiere']
+
+        c.drawString(2*cm, y, f"{matiere_nom}")
+        c.drawString(10*cm, y, f"Coef: {matiere['coefficient']}")
+        c.drawString(13*cm, y, f"Moyenne: {data['moyenne']:.2f}/20")
+        obtenus = matiere['credit'] if data['valide'] or data.get('compense') else 0
+        c.drawString(17*cm, y, f"Crédits: {obtenus}/{matiere['credit']}{' (C)' if data.get('compense') else ''}")
+
+        y -= 0.7*cm
+
+        if y < 3*cm:  # Nouvelle page si nécessaire
+            c.showPage()
+            y = height - 2*cm
+            c.setFont("Helvetica", 10)
+
+    # Résumé
+    y -= 1*cm
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(2*cm, y, "Résumé")
+
+    y -= 1*cm
+    c.setFont("Helvetica", 12)
+    moyenne_generale = donnees['moyenne_generale']
+    credits_valides = donnees['credits_valides']
+
+    c.drawString(2*cm, y, f"Moyenne générale: {moyenne_generale if moyenne_generale else 'N/A'}/20")
+    y -= 0.8*cm
+    c.drawString(2*cm, y, f"Crédits validés: {credits_valides}/{donnees['credits_cible']}")
+    if donnees['decision']:
+        y -= 0.8*cm
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(2*cm, y, f"Décision du jury: {donnees['decision']}")
+
+    # Pied de page
+    c.setFont("Helvetica", 10)
+    c.drawString(2*cm, 2*cm, f"Édité le {datetime.now().strftime('%d/%m/%Y à %H:%M')}")
+
+    c.save()
+
+    return buffer.getvalue()
+
+
+def cle_bulletin(donnees):
+    """Empreinte des données d'un bulletin : deux bulletins de même clé ont le même contenu"""
+    contenu = json.dumps([VERSION_MODELE, donnees], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:32]
+
+
+class FileBulletins:
+    """File locale de rendu des bulletins PDF, avec un cache sur disque adressé par le contenu
+
+    Chaque PDF est enregistré sous `<etudiant_id>_<clé>.pdf`, la clé étant
+    l'empreinte des données du bulletin (identité, moyennes, crédits). Une
+    note ajoutée ou modifiée change les moyennes de cet étudiant seulement,
+    donc sa clé : son ancien PDF n'est plus servi et il est effacé au rendu
+    suivant. Le dossier est partagé par tous les processus (workers).
+
+    Les rendus passent par un pool de fils : deux demandes du même bulletin
+    pendant son rendu attendent le même calcul.
+    """
+
+    def __init__(self, dossier=None, fils=1):
+        self._pool = None
+        self._en_cours = {}
+        self._verrou = threading.Lock()
+        self.configurer(dossier or os.path.join(tempfile.gettempdir(), 'bulletins'), fils)
+
+    def configurer(self, dossier, fils=1):
+        """Changer le dossier du cache et le nombre de rendus simultanés"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+        self.dossier = dossier
+        self._pool = ThreadPoolExecutor(max_workers=fils, thread_name_prefix='bulletins')
+        with self._verrou:
+            self._en_cours.clear()
+
+    def chemin(self, etudiant_id, cle):
+        return os.path.join(self.dossier, f'{etudiant_id}_{cle}.pdf')
+
+    def demander(self, etudiant_id, donnees):
+        """Bulletin PDF d'un étudiant : Future dont le résultat est le chemin du fichier
+
+        La Future est déjà terminée si le bulletin est en cache ; sinon le
+        rendu est mis en file (une seule fois par clé).
+        """
+        chemin = self.chemin(etudiant_id, cle_bulletin(donnees))
+        if os.path.exists(chemin):
+            cache_bulletins.incrementer('succes')
+            future = Future()
+            future.set_result(chemin)
+            return future
+
+        with self._verrou:
+            future = self._en_cours.get(chemin)
+            if future is None:
+                cache_bulletins.incrementer('rendu')
+                future = self._en_cours[chemin] = self._pool.submit(self._rendre, etudiant_id, chemin, donnees)
+                future.add_done_callback(lambda _: self._terminer(chemin))
+            else:
+                cache_bulletins.incrementer('en_cours')
+        return future
+
+    def _terminer(self, chemin):
+        with self._verrou:
+            self._en_cours.pop(chemin, None)
+
+    def _rendre(self, etudiant_id, chemin, donnees):
+        """Rendre le PDF, l'écrire de façon atomique et effacer les anciens bulletins de l'étudiant"""
+        with duree_pdf.mesurer('unitaire'):
+            contenu = generer_bulletin_pdf(donnees)
+
+        os.makedirs(self.dossier, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=self.dossier, suffix='.tmp')
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+
+        for ancien in glob.glob(os.path.join(self.dossier, f'{etudiant_id}_*.pdf')):
+            if ancien != chemin:
+                try:
+                    os.remove(ancien)
+                except FileNotFoundError:
+                    pass
+        return chemin
+
+
+# Bulletins PDF des étudiants (téléchargement depuis leur espace)
+file_bulletins = FileBulletins()
+
+
+def _generer_fichier(donnees):
+    """Tâche exécutée dans un processus du pool : (nom du fichier, contenu PDF, durée du rendu)
+
+    La durée est renvoyée au processus parent : les métriques d'un
+    processus du pool ne sont visibles de personne.
+    """
+    debut = time.perf_counter()
+    contenu = generer_bulletin_pdf(donnees)
+    return f"bulletin_{donnees['matricule']}.pdf", contenu, time.perf_counter() - debut
+
+
+class PoolRendus:
+    """Pool de processus partagé par toutes les archives ZIP de bulletins
+
+    Créé à la première archive puis réutilisé : une archive ne paie pas le
+    démarrage des processus. Ils sont lancés par « spawn » et non par fork,
+    qui peut bloquer un processus enfant copié d'un serveur à plusieurs fils.
+    """
+
+    def __init__(self, processus=None):
+        self._pool = None
+        self._verrou = threading.Lock()
+        self.configurer(processus)
+
+    def configurer(self, processus=None):
+        """Changer le nombre de processus (None = un par cœur) ; le pool est recréé à la demande"""
+        with self._verrou:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self.processus = processus or os.cpu_count() or 1
+
+    def pool(self):
+        with self._verrou:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processus,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+
+# Rendu des bulletins d'une classe (archives ZIP)
+pool_rendus = PoolRendus()
+
+
+def donnees_bulletins_classe(classe, taille_lot=100):
+    """Générer les données des bulletins d'une classe, lot par lot
+
+    Chaque lot coûte quelques requêtes (étudiants, résultats délibérés, cumul
+    des moyennes des autres) et seul le lot courant est gardé en mémoire.
+    """
+    dernier_id = 0
+    while True:
+        etudiants = db.session.query(
+            Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom
+        ).filter(
+            Etudiant.classe_id == classe.id,
+            Etudiant.id > dernier_id
+        ).order_by(Etudiant.id).limit(taille_lot).all()
+
+        if not etudiants:
+            return
+
+        resultats = resultats_bulletins([e.id for e in etudiants])
+        for etudiant in etudiants:
+            yield donnees_bulletin(etudiant, resultats[etudiant.id], classe.nom)
+
+        dernier_id = etudiants[-1].id
+
+
+class _FluxZip(io.RawIOBase):
+    """Tampon d'écriture non positionnable vidé après chaque fichier ajouté à l'archive"""
+
+    def __init__(self):
+        super().__init__()
+        self.tampon = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, octets):
+        self.tampon += octets
+        return len(octets)
+
+    def vider(self):
+        octets = bytes(self.tampon)
+        self.tampon.clear()
+        return octets
+
+
+def generer_zip_bulletins(donnees):
+    """Rendre les bulletins en parallèle et produire l'archive ZIP morceau par morceau
+
+    Les PDF sont rendus par le pool partagé (pool_rendus) et ajoutés à
+    l'archive dans l'ordre où ils sont terminés. Le nombre de rendus en
+    cours est borné pour que la mémoire reste constante quelle que soit la
+    taille de la classe.
+    """
+    pool = pool_rendus.pool()
+    flux = _FluxZip()
+    archive = zipfile.ZipFile(flux, mode='w', compression=zipfile.ZIP_DEFLATED)
+    donnees = iter(donnees)
+
+    limite = pool_rendus.processus * 2
+    en_cours = set()
+    try:
+        while True:
+            # Alimenter le pool sans dépasser la limite de rendus en attente
+            for d in donnees:
+                en_cours.add(pool.submit(_generer_fichier, d))
+                if len(en_cours) >= limite:
+                    break
+
+            if not en_cours:
+                break
+
+            termines, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+            for future in termines:
+                nom_fichier, contenu, duree = future.result()
+                duree_pdf.observer(duree, 'classe')
+                archive.writestr(nom_fichier, contenu)
+                yield flux.vider()
+    finally:
+        for future in en_cours:
+            future.cancel()
+
+    archive.close()
+    yield flux.vider()
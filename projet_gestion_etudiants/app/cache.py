@@ -0,0 +1,77 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class CacheTTL:
+    """Cache en mémoire du processus, borné en taille (LRU), dont les entrées expirent après `ttl` secondes
+
+    Chaque processus (worker) a son propre cache : une invalidation ne
+    concerne que le processus qui écrit, la durée de vie borne le délai
+    au-delà duquel les autres processus relisent la base.
+    """
+
+    def __init__(self, taille=1024, ttl=300):
+        self.taille = taille
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+
+    def configurer(self, taille, ttl):
+        """Changer la taille et la durée de vie (vide le cache)"""
+        with self._verrou:
+            self.taille = taille
+            self.ttl = ttl
+            self._entrees.clear()
+
+    def lire(self, cle):
+        """Valeur en cache ou None si absente ou expirée"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None or entree[0] < time.monotonic():
+                if entree is not None:
+                    del self._entrees[cle]
+                self.echecs += 1
+                return None
+
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return entree[1]
+
+    def ecrire(self, cle, valeur):
+        """Mettre une valeur en cache, en évinçant la plus ancienne si le cache est plein"""
+        with self._verrou:
+            self._entrees[cle] = (time.monotonic() + self.ttl, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+                self.evictions += 1
+
+    def invalider(self, cle=None):
+        """Retirer une entrée, ou tout le cache si aucune clé n'est donnée"""
+        with self._verrou:
+            if cle is None:
+                self._entrees.clear()
+            else:
+                self._entrees.pop(cle, None)
+
+    def statistiques(self):
+        """Compteurs de succès/échecs et occupation du cache"""
+        with self._verrou:
+            total = self.succes + self.echecs
+            return {
+                'succes': self.succes,
+                'echecs': self.echecs,
+                'taux_succes': round(self.succes / total, 4) if total else None,
+                'evictions': self.evictions,
+                'entrees': len(self._entrees),
+                'taille_max': self.taille,
+                'ttl': self.ttl
+            }
+
+
+# Utilisateurs connectés, chargés par Flask-Login à chaque requête
+cache_utilisateurs = CacheTTL()
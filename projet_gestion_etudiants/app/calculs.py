@@ -0,0 +1,279 @@
+from app import db
+from app.models import Etudiant, Matiere, Note, MoyenneMatiere
+from app.referentiels import referentiels
+from sqlalchemy import func, bindparam, case, tuple_, select
+
+SEUIL_VALIDATION = 10
+
+
+def _resultat_vide():
+    """Structure de résultat d'un étudiant sans note"""
+    return {
+        'matieres': {},
+        'moyenne_generale': None,
+        'credits_valides': 0,
+        'total_notes': 0
+    }
+
+
+def _agreger(filtre):
+    """Calculer moyennes et crédits à partir du cumul par (étudiant, matière)"""
+    # Une ligne par matière notée : le coût ne dépend pas du nombre de notes.
+    # Nom, coefficient et crédit viennent des référentiels en mémoire, sans jointure.
+    matieres = referentiels.lire().matieres
+    lignes = db.session.query(
+        MoyenneMatiere.etudiant_id,
+        MoyenneMatiere.matiere_id,
+        MoyenneMatiere.moyenne,
+        MoyenneMatiere.nombre
+    ).filter(filtre).all()
+    if any(ligne[1] not in matieres for ligne in lignes):
+        # Cumul lu après la version des référentiels (matière créée entre-temps) : relire une fois,
+        # puis ignorer une matière supprimée depuis
+        matieres = referentiels.lire(relire=True).matieres
+        lignes = [ligne for ligne in lignes if ligne[1] in matieres]
+    lignes.sort(key=lambda ligne: (ligne[0], matieres[ligne[1]].nom))
+
+    resultats = {}
+    for etudiant_id, matiere_id, moyenne, nombre in lignes:
+        _, nom, coefficient, credit, _ = matieres[matiere_id]
+        resultat = resultats.setdefault(etudiant_id, _resultat_vide())
+        valide = moyenne >= SEUIL_VALIDATION
+        resultat['matieres'][nom] = {
+            'matiere': {'id': matiere_id, 'nom': nom, 'coefficient': coefficient, 'credit': credit},
+            'moyenne': round(moyenne, 2),
+            'nombre_notes': nombre,
+            'valide': valide
+        }
+        resultat['total_notes'] += nombre
+        resultat['_points'] = resultat.get('_points', 0) + moyenne * coefficient
+        resultat['_coefficients'] = resultat.get('_coefficients', 0) + coefficient
+        if valide:
+            resultat['credits_valides'] += credit
+
+    # Moyenne générale pondérée par les coefficients
+    for resultat in resultats.values():
+        points = resultat.pop('_points')
+        coefficients = resultat.pop('_coefficients')
+        if coefficients:
+            resultat['moyenne_generale'] = round(points / coefficients, 2)
+
+    return resultats
+
+
+def resultats_etudiants(etudiant_ids):
+    """Résultats (moyennes, crédits) d'une liste d'étudiants, indexés par id"""
+    etudiant_ids = list(etudiant_ids)
+    if not etudiant_ids:
+        return {}
+
+    resultats = _agreger(MoyenneMatiere.etudiant_id.in_(etudiant_ids))
+    return {etudiant_id: resultats.get(etudiant_id, _resultat_vide()) for etudiant_id in etudiant_ids}
+
+
+def resultats_etudiant(etudiant):
+    """Résultats d'un seul étudiant"""
+    return _agreger(MoyenneMatiere.etudiant_id == etudiant.id).get(etudiant.id, _resultat_vide())
+
+
+def resultats_classe(classe):
+    """Résultats de tous les étudiants d'une classe, indexés par id"""
+    requete_ids = db.session.query(Etudiant.id).filter(Etudiant.classe_id == classe.id)
+    etudiant_ids = [etudiant_id for (etudiant_id,) in requete_ids]
+
+    # Sous-requête plutôt qu'une liste IN : pas de limite de paramètres SQLite
+    resultats = _agreger(MoyenneMatiere.etudiant_id.in_(requete_ids.scalar_subquery()))
+    return {etudiant_id: resultats.get(etudiant_id, _resultat_vide()) for etudiant_id in etudiant_ids}
+
+
+def ajouter_detail_notes(etudiant, resultat):
+    """Joindre la liste des notes de chaque matière au résultat (une requête)"""
+    noms = {data['matiere']['id']: nom for nom, data in resultat['matieres'].items()}
+    for data in resultat['matieres'].values():
+        data['notes'] = []
+
+    notes = Note.query.filter_by(etudiant_id=etudiant.id).order_by(Note.date_ajout).all()
+    for note in notes:
+        resultat['matieres'][noms[note.matiere_id]]['notes'].append(note)
+
+    return resultat
+
+
+def classement_classe(classe_id):
+    """Classer les étudiants d'une classe, en général et par matière (une requête)
+
+    Les rangs sont calculés par la base avec RANK() OVER sur les moyennes
+    arrondies au centième, telles qu'affichées : deux étudiants à égalité
+    partagent le même rang et le suivant saute d'autant. Les étudiants sans
+    note sont listés en dernier, sans rang.
+    """
+    par_matiere = select(
+        MoyenneMatiere.etudiant_id,
+        MoyenneMatiere.matiere_id,
+        MoyenneMatiere.moyenne,
+        Matiere.nom.label('matiere_nom'),
+        Matiere.coefficient,
+        Matiere.credit,
+        func.rank().over(
+            partition_by=MoyenneMatiere.matiere_id,
+            order_by=func.round(MoyenneMatiere.moyenne, 2).desc()
+        ).label('rang_matiere')
+    ).join(Matiere, MoyenneMatiere.matiere_id == Matiere.id).join(
+        Etudiant, MoyenneMatiere.etudiant_id == Etudiant.id
+    ).where(Etudiant.classe_id == classe_id).cte('par_matiere')
+
+    generale = select(
+        par_matiere.c.etudiant_id,
+        func.round(
+            func.sum(par_matiere.c.moyenne * par_matiere.c.coefficient) / func.sum(par_matiere.c.coefficient), 2
+        ).label('moyenne_generale'),
+        func.sum(case((par_matiere.c.moyenne >= SEUIL_VALIDATION, par_matiere.c.credit), else_=0)).label('credits')
+    ).group_by(par_matiere.c.etudiant_id).cte('generale')
+
+    rangs = select(
+        generale,
+        func.rank().over(order_by=generale.c.moyenne_generale.desc()).label('rang')
+    ).cte('rangs')
+
+    lignes = db.session.execute(
+        select(
+            Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom,
+            rangs.c.rang, rangs.c.moyenne_generale, rangs.c.credits,
+            par_matiere.c.matiere_nom, par_matiere.c.moyenne, par_matiere.c.rang_matiere
+        ).outerjoin(rangs, rangs.c.etudiant_id == Etudiant.id).outerjoin(
+            par_matiere, par_matiere.c.etudiant_id == Etudiant.id
+        ).where(Etudiant.classe_id == classe_id).order_by(
+            rangs.c.rang.nulls_last(), Etudiant.nom, Etudiant.prenom, Etudiant.id, par_matiere.c.matiere_nom
+        )
+    ).all()
+
+    classement = {}
+    for ligne in lignes:
+        entree = classement.get(ligne.id)
+        if entree is None:
+            entree = classement[ligne.id] = {
+                'etudiant': {'id': ligne.id, 'matricule': ligne.matricule, 'nom': ligne.nom, 'prenom': ligne.prenom},
+                'rang': ligne.rang,
+                'moyenne_generale': ligne.moyenne_generale,
+                'credits_valides': ligne.credits or 0,
+                'matieres': {}
+            }
+        if ligne.matiere_nom is not None:
+            entree['matieres'][ligne.matiere_nom] = {
+                'moyenne': round(ligne.moyenne, 2),
+                'rang': ligne.rang_matiere
+            }
+
+    return list(classement.values())
+
+
+# ========== MAINTENANCE DU CUMUL PAR MATIÈRE ==========
+
+def enregistrer_notes(ajouts=(), retraits=()):
+    """Répercuter des notes ajoutées ou retirées sur le cumul par matière
+    
+    Chaque note est un tuple (etudiant_id, matiere_id, valeur). Les requêtes
+    passent par la session : le cumul est validé dans la même transaction que
+    les notes. La version des étudiants concernés est incrémentée, même si
+    la valeur ne change pas (commentaire ou type d'évaluation modifié).
+    """
+    ajouts, retraits = list(ajouts), list(retraits)
+    etudiant_ids = {etudiant_id for etudiant_id, _, _ in ajouts + retraits}
+    if etudiant_ids:
+        db.session.execute(Etudiant.__table__.update().where(
+            Etudiant.id.in_(etudiant_ids)
+        ).values(version=Etudiant.version + 1))
+
+    deltas = {}
+    for signe, notes in ((1, ajouts), (-1, retraits)):
+        for etudiant_id, matiere_id, valeur in notes:
+            somme, nombre = deltas.get((etudiant_id, matiere_id), (0, 0))
+            deltas[(etudiant_id, matiere_id)] = (somme + signe * valeur, nombre + signe)
+
+    deltas = {cle: delta for cle, delta in deltas.items() if delta != (0, 0)}
+    if not deltas:
+        return
+
+    table = MoyenneMatiere.__table__
+    existants = set(db.session.query(MoyenneMatiere.etudiant_id, MoyenneMatiere.matiere_id).filter(
+        tuple_(MoyenneMatiere.etudiant_id, MoyenneMatiere.matiere_id).in_(list(deltas))
+    ).all())
+
+    mises_a_jour = [
+        {'e': e, 'm': m, 'ds': somme, 'dn': nombre}
+        for (e, m), (somme, nombre) in deltas.items() if (e, m) in existants
+    ]
+    if mises_a_jour:
+        nouvelle_somme = table.c.somme + bindparam('ds')
+        nouveau_nombre = table.c.nombre + bindparam('dn')
+        db.session.execute(
+            table.update().where(
+                table.c.etudiant_id == bindparam('e'),
+                table.c.matiere_id == bindparam('m')
+            ).values(
+                somme=nouvelle_somme,
+                nombre=nouveau_nombre,
+                moyenne=case((nouveau_nombre > 0, nouvelle_somme / nouveau_nombre), else_=0)
+            ),
+            mises_a_jour
+        )
+        # Une matière sans note n'a plus de moyenne
+        db.session.execute(table.delete().where(
+            tuple_(table.c.etudiant_id, table.c.matiere_id).in_([(d['e'], d['m']) for d in mises_a_jour]),
+            table.c.nombre <= 0
+        ))
+
+    insertions = [
+        {'etudiant_id': e, 'matiere_id': m, 'somme': somme, 'nombre': nombre, 'moyenne': somme / nombre}
+        for (e, m), (somme, nombre) in deltas.items() if (e, m) not in existants and nombre > 0
+    ]
+    if insertions:
+        db.session.execute(table.insert(), insertions)
+
+
+def reconstruire_moyennes():
+    """Recalculer entièrement le cumul à partir de la table des notes"""
+    table = MoyenneMatiere.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['etudiant_id', 'matiere_id', 'somme', 'nombre', 'moyenne'],
+        db.session.query(
+            Note.etudiant_id,
+            Note.matiere_id,
+            func.sum(Note.valeur),
+            func.count(Note.id),
+            func.avg(Note.valeur)
+        ).group_by(Note.etudiant_id, Note.matiere_id).statement
+    ))
+    db.session.commit()
+    return MoyenneMatiere.query.count()
+
+
+def verifier_moyennes(tolerance=1e-6):
+    """Comparer le cumul aux notes et renvoyer la liste des écarts"""
+    attendus = {
+        (e, m): (somme, nombre)
+        for e, m, somme, nombre in db.session.query(
+            Note.etudiant_id, Note.matiere_id, func.sum(Note.valeur), func.count(Note.id)
+        ).group_by(Note.etudiant_id, Note.matiere_id)
+    }
+
+    ecarts = []
+    for ligne in db.session.query(MoyenneMatiere).yield_per(1000):
+        cle = (ligne.etudiant_id, ligne.matiere_id)
+        somme, nombre = attendus.pop(cle, (0, 0))
+        if nombre != ligne.nombre or abs(somme - ligne.somme) > tolerance \
+                or abs(ligne.moyenne - (somme / nombre if nombre else 0)) > tolerance:
+            ecarts.append((cle, (ligne.somme, ligne.nombre), (somme, nombre)))
+
+    # Notes présentes sans ligne de cumul
+    for cle, attendu in attendus.items():
+        ecarts.append((cle, (0, 0), attendu))
+
+    return ecarts
+
+
+def initialiser_moyennes():
+    """Construire le cumul au premier démarrage d'une base qui contient déjà des notes"""
+    if not MoyenneMatiere.query.first() and Note.query.first():
+        reconstruire_moyennes()
@@ -0,0 +1,249 @@
+import sys
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from app import db
+from app.models import Classe
+from app.calculs import reconstruire_moyennes, verifier_moyennes
+from app.compteurs import recalculer_compteurs, lire_compteurs
+from app.generation import generer_donnees
+from app.bulletins import donnees_bulletins_classe, generer_zip_bulletins, pool_rendus
+from app.deliberations import deliberer, regles_deliberation, effectifs_deliberations, STATUTS
+from app.recherche import reconstruire_index_recherche, rechercher_etudiants
+from app.utils import lier_comptes_etudiants
+from app.moteur import tester_concurrence
+from app.hachage import hachage, mesurer_connexions
+from app.migrations import MIGRATIONS, appliquer_migrations, versions_appliquees, parcours_complets
+
+# ========== BASE DE DONNÉES ==========
+
+bdd_cli = AppGroup('bdd', help='Migrations et contrôle du schéma de la base de données.')
+
+
+@bdd_cli.command('migrer')
+def migrer():
+    """Appliquer les migrations du schéma qui manquent"""
+    appliquees = appliquer_migrations()
+    for version, description in appliquees:
+        click.echo(f'Migration {version} appliquée : {description}')
+    if not appliquees:
+        click.echo('Le schéma est à jour.')
+
+
+@bdd_cli.command('etat')
+def etat():
+    """Lister les migrations et leur état"""
+    deja_appliquees = versions_appliquees()
+    for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+        statut = 'appliquée' if version in deja_appliquees else 'en attente'
+        click.echo(f'{version:4d}  {statut:<11} {description}')
+
+
+@bdd_cli.command('verifier-plans')
+def verifier_plans():
+    """Échouer si une requête fréquente parcourt une table entière (EXPLAIN QUERY PLAN)"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Contrôle disponible uniquement pour SQLite.')
+    
+    problemes = parcours_complets()
+    for libelle, detail in problemes:
+        click.echo(f'{libelle} : {detail}')
+    
+    if problemes:
+        click.echo(f'{len(problemes)} parcours complet(s) de table détecté(s).')
+        sys.exit(1)
+    click.echo('Toutes les requêtes fréquentes utilisent un index.')
+
+
+@bdd_cli.command('tester-concurrence')
+@click.option('--lecteurs', type=int, default=8, help='Nombre de fils qui lisent en continu.')
+@click.option('--ecrivains', type=int, default=2, help='Nombre de fils qui insèrent des notes.')
+@click.option('--duree', type=float, default=5.0, help='Durée de chaque essai, en secondes.')
+@click.option('--comparer', is_flag=True, help='Refaire l\'essai avec les réglages SQLite par défaut.')
+def tester_concurrence_cli(lecteurs, ecrivains, duree, comparer):
+    """Lectures et écritures simultanées sur une base temporaire : échoue en cas de « database is locked »"""
+    essais = [('profil de la configuration', current_app.config['SQLITE_PRAGMAS'])]
+    if comparer:
+        essais.append(('réglages par défaut', None))
+    
+    erreurs = 0
+    for libelle, pragmas in essais:
+        bilan = tester_concurrence(db.metadata, pragmas, lecteurs, ecrivains, duree)
+        click.echo(f"{libelle} (journal {bilan['journal_mode']}) :")
+        for tache in ('lectures', 'ecritures'):
+            click.echo(f"  {tache:<10} {bilan[tache]['operations'] / duree:8.1f}/s  "
+                       f"{bilan[tache]['verrous']} erreur(s) de verrou")
+        if pragmas is not None:
+            erreurs = bilan['lectures']['verrous'] + bilan['ecritures']['verrous']
+    
+    if erreurs:
+        sys.exit(1)
+
+
+# ========== UTILISATEURS ==========
+
+utilisateurs_cli = AppGroup('utilisateurs', help='Gestion des comptes utilisateurs.')
+
+
+@utilisateurs_cli.command('lier-etudiants')
+def lier_etudiants():
+    """Relier les comptes étudiants existants à leur fiche (même nom et prénom)"""
+    lies, ambigus, introuvables = lier_comptes_etudiants()
+    click.echo(f'{lies} compte(s) relié(s).')
+    if ambigus:
+        click.echo(f"Homonymes ou fiche déjà reliée, à relier à la main : {', '.join(ambigus)}")
+    if introuvables:
+        click.echo(f"Aucune fiche étudiant trouvée : {', '.join(introuvables)}")
+
+
+@utilisateurs_cli.command('mesurer-hachage')
+@click.option('--connexions', type=int, default=200, help='Nombre de vérifications de mot de passe.')
+@click.option('--clients', type=int, default=50, help='Nombre de connexions simultanées.')
+def mesurer_hachage(connexions, clients):
+    """Mesurer les connexions par seconde que le pool de hachage soutient"""
+    for cle, valeur in mesurer_connexions(hachage, connexions, clients).items():
+        click.echo(f'{cle:<24} {valeur}')
+
+
+# ========== CUMUL DES MOYENNES ==========
+
+moyennes_cli = AppGroup('moyennes', help='Gestion du cumul des moyennes par matière.')
+
+
+@moyennes_cli.command('reconstruire')
+def reconstruire():
+    """Reconstruire le cumul des moyennes à partir des notes"""
+    total = reconstruire_moyennes()
+    click.echo(f'Cumul reconstruit : {total} lignes (étudiant, matière).')
+
+
+@moyennes_cli.command('verifier')
+@click.option('--corriger', is_flag=True, help='Reconstruire le cumul si des écarts sont trouvés.')
+def verifier(corriger):
+    """Détecter les écarts entre le cumul et les notes"""
+    ecarts = verifier_moyennes()
+    
+    if not ecarts:
+        click.echo('Aucun écart : le cumul est à jour.')
+        return
+    
+    for (etudiant_id, matiere_id), (somme, nombre), (somme_attendue, nombre_attendu) in ecarts[:20]:
+        click.echo(f'Étudiant {etudiant_id} - Matière {matiere_id} : '
+                   f'{somme}/{nombre} notes au lieu de {somme_attendue}/{nombre_attendu}')
+    click.echo(f'{len(ecarts)} écart(s) détecté(s).')
+    
+    if corriger:
+        total = reconstruire_moyennes()
+        click.echo(f'Cumul reconstruit : {total} lignes (étudiant, matière).')
+    else:
+        sys.exit(1)
+
+
+# ========== RECHERCHE DES ÉTUDIANTS ==========
+
+recherche_cli = AppGroup('recherche', help='Index plein texte des étudiants.')
+
+
+@recherche_cli.command('reconstruire')
+def reconstruire_recherche():
+    """Reconstruire l'index de recherche à partir de la table des étudiants"""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Index plein texte disponible uniquement pour SQLite.')
+    reconstruire_index_recherche()
+    click.echo('Index de recherche reconstruit.')
+
+
+@recherche_cli.command('chercher')
+@click.argument('saisie')
+@click.option('--limite', type=int, default=10, help='Nombre de résultats.')
+def chercher(saisie, limite):
+    """Chercher des étudiants comme l'autocomplétion"""
+    debut = time.perf_counter()
+    etudiants = rechercher_etudiants(saisie, limite, current_app.config['RECHERCHE_CANDIDATS'])
+    for e in etudiants:
+        click.echo(f"{e['matricule']:<12} {e['nom']} {e['prenom']}  {e['email'] or ''}  {e['classe'] or ''}")
+    click.echo(f'{len(etudiants)} résultat(s) en {(time.perf_counter() - debut) * 1000:.1f} ms.')
+
+
+# ========== COMPTEURS DU TABLEAU DE BORD ==========
+
+compteurs_cli = AppGroup('compteurs', help='Compteurs affichés sur le tableau de bord.')
+
+
+@compteurs_cli.command('recalculer')
+def recalculer():
+    """Recalculer les compteurs à partir des tables"""
+    recalculer_compteurs()
+    for cle, valeur in lire_compteurs().items():
+        click.echo(f'{cle:<24} {valeur}')
+
+
+# ========== BULLETINS ==========
+
+bulletins_cli = AppGroup('bulletins', help='Génération des bulletins PDF.')
+
+
+@bulletins_cli.command('classe')
+@click.argument('classe_id', type=int)
+@click.option('--sortie', type=click.Path(dir_okay=False, writable=True),
+              help='Fichier ZIP à écrire (par défaut bulletins_classe_<id>.zip).')
+@click.option('--processus', type=int, default=None, help='Nombre de processus de rendu.')
+def bulletins_classe(classe_id, sortie, processus):
+    """Générer les bulletins de toute une classe dans une archive ZIP"""
+    classe = db.session.get(Classe, classe_id)
+    if not classe:
+        raise click.ClickException(f'Classe {classe_id} introuvable.')
+    
+    sortie = sortie or f'bulletins_classe_{classe.id}.zip'
+    donnees = donnees_bulletins_classe(classe, current_app.config['BULLETINS_TAILLE_LOT'])
+    
+    if processus:
+        pool_rendus.configurer(processus)
+    with open(sortie, 'wb') as fichier:
+        for morceau in generer_zip_bulletins(donnees):
+            fichier.write(morceau)
+    
+    click.echo(f'Bulletins de la classe {classe.nom} écrits dans {sortie}.')
+
+
+# ========== DÉLIBÉRATIONS ==========
+
+deliberations_cli = AppGroup('deliberations', help='Délibérations du jury et résultats figés.')
+
+
+@deliberations_cli.command('lancer')
+@click.option('--classe', 'classe_id', type=int, help='Délibérer sur une classe.')
+@click.option('--filiere', 'filiere_id', type=int, help='Délibérer sur toutes les classes d\'une filière.')
+@click.option('--libelle', help='Libellé de la délibération.')
+def lancer_deliberation(classe_id, filiere_id, libelle):
+    """Calculer et figer les résultats d'une classe ou d'une filière"""
+    debut = time.perf_counter()
+    try:
+        deliberation = deliberer(regles_deliberation(current_app.config), classe_id=classe_id,
+                                 filiere_id=filiere_id, libelle=libelle)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    click.echo(f'{deliberation.libelle} (n° {deliberation.id}) enregistrée en {time.perf_counter() - debut:.2f} s.')
+    for statut, nombre in effectifs_deliberations([deliberation.id])[deliberation.id].items():
+        click.echo(f'{STATUTS[statut]:<24} {nombre}')
+
+
+# ========== DONNÉES DE TEST ==========
+
+@click.command('seed')
+@click.option('--etudiants', type=int, default=1000, show_default=True, help='Nombre d\'étudiants.')
+@click.option('--notes', type=int, default=50000, show_default=True, help='Nombre total de notes.')
+@click.option('--taille-classe', type=int, default=40, show_default=True, help='Étudiants par classe.')
+@click.option('--graine', type=int, default=42, show_default=True, help='Graine aléatoire (même graine = mêmes données).')
+@click.option('--sans-comptes', is_flag=True, help='Ne pas créer de compte utilisateur par étudiant.')
+@click.option('--mot-de-passe', default='etudiant123', show_default=True, help='Mot de passe des comptes étudiants.')
+@with_appcontext
+def seed(etudiants, notes, taille_classe, graine, sans_comptes, mot_de_passe):
+    """Générer filières, classes, étudiants, comptes et notes en masse"""
+    debut = time.perf_counter()
+    volumes = generer_donnees(etudiants, notes, taille_classe, graine, not sans_comptes, mot_de_passe)
+    for cle, valeur in volumes.items():
+        click.echo(f'{cle:<10} {valeur}')
+    click.echo(f'Données générées en {time.perf_counter() - debut:.1f} s.')
@@ -0,0 +1,139 @@
+from flask import g, has_app_context
+from app import db
+from app.models import Utilisateur, Etudiant, Classe, Matiere, Filiere, Note, Compteur
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Compteurs affichés sur le tableau de bord
+COMPTEURS = ('utilisateurs', 'etudiants', 'etudiants_sans_classe', 'classes', 'matieres', 'notes')
+# Incrémenté à chaque écriture d'une classe, d'une matière ou d'une filière ; jamais recalculé
+VERSION_REFERENTIEL = 'version_referentiel'
+
+
+def debut_semaine(maintenant=None):
+    """Lundi 0 h (UTC) de la semaine en cours"""
+    maintenant = maintenant or datetime.utcnow()
+    return datetime(maintenant.year, maintenant.month, maintenant.day) - timedelta(days=maintenant.weekday())
+
+
+def cle_semaine(maintenant=None):
+    """Clé du compteur des notes ajoutées pendant la semaine en cours"""
+    annee, semaine, _ = (maintenant or datetime.utcnow()).isocalendar()
+    return f'notes_semaine_{annee}-{semaine:02d}'
+
+
+def ajuster(deltas, connexion=None):
+    """Ajouter des deltas aux compteurs, dans la transaction en cours"""
+    connexion = connexion or db.session.connection()
+    for cle, delta in deltas.items():
+        if not delta:
+            continue
+        resultat = connexion.execute(
+            text('UPDATE compteur SET valeur = valeur + :delta WHERE cle = :cle'),
+            {'cle': cle, 'delta': delta}
+        )
+        if resultat.rowcount == 0:
+            connexion.execute(
+                text('INSERT INTO compteur (cle, valeur) VALUES (:cle, :delta)'),
+                {'cle': cle, 'delta': delta}
+            )
+
+
+def ajuster_notes_ajoutees(nombre):
+    """Compter des notes insérées en masse (hors ORM), datées de maintenant"""
+    ajuster({'notes': nombre, cle_semaine(): nombre})
+
+
+def lire_compteurs():
+    """Toutes les statistiques du tableau de bord, en une seule requête"""
+    semaine = cle_semaine()
+    valeurs = dict(db.session.query(Compteur.cle, Compteur.valeur).filter(
+        Compteur.cle.in_(COMPTEURS + (semaine,))
+    ).all())
+    
+    compteurs = {cle: valeurs.get(cle, 0) for cle in COMPTEURS}
+    compteurs['notes_semaine'] = valeurs.get(semaine, 0)
+    return compteurs
+
+
+def lire_version_referentiel():
+    """Version des référentiels (classes, matières, filières)"""
+    return db.session.query(Compteur.valeur).filter(Compteur.cle == VERSION_REFERENTIEL).scalar() or 0
+
+
+def recalculer_compteurs():
+    """Recalculer tous les compteurs à partir des tables (COUNT complets)"""
+    valeurs = {
+        'utilisateurs': Utilisateur.query.count(),
+        'etudiants': Etudiant.query.count(),
+        'etudiants_sans_classe': Etudiant.query.filter(Etudiant.classe_id.is_(None)).count(),
+        'classes': Classe.query.count(),
+        'matieres': Matiere.query.count(),
+        'notes': Note.query.count(),
+        cle_semaine(): Note.query.filter(Note.date_ajout >= debut_semaine()).count()
+    }
+    
+    # Les compteurs des semaines passées ne servent plus ; la version est conservée
+    Compteur.query.filter(Compteur.cle != VERSION_REFERENTIEL).delete()
+    for cle, valeur in valeurs.items():
+        db.session.add(Compteur(cle=cle, valeur=valeur))
+    db.session.commit()
+    return valeurs
+
+
+def initialiser_compteurs():
+    """Calculer les compteurs au premier démarrage d'une base existante"""
+    if not Compteur.query.first():
+        recalculer_compteurs()
+
+
+@event.listens_for(Session, 'after_flush')
+def _compter_ecritures(session, contexte):
+    """Répercuter les ajouts et suppressions du flush (cascades comprises) sur les compteurs"""
+    deltas = Counter()
+    debut = debut_semaine()
+    semaine = cle_semaine()
+    
+    for signe, objets in ((1, session.new), (-1, session.deleted)):
+        for objet in objets:
+            if isinstance(objet, Note):
+                deltas['notes'] += signe
+                if objet.date_ajout is None or objet.date_ajout >= debut:
+                    deltas[semaine] += signe
+            elif isinstance(objet, Etudiant):
+                deltas['etudiants'] += signe
+                if objet.classe_id is None:
+                    deltas['etudiants_sans_classe'] += signe
+            elif isinstance(objet, Classe):
+                deltas['classes'] += signe
+            elif isinstance(objet, Matiere):
+                deltas['matieres'] += signe
+            elif isinstance(objet, Utilisateur):
+                deltas['utilisateurs'] += signe
+    
+    # Étudiant affecté à une classe ou retiré de sa classe
+    for objet in session.dirty:
+        if isinstance(objet, Etudiant) and objet not in session.deleted:
+            historique = inspect(objet).attrs.classe_id.history
+            if historique.has_changes():
+                avant = historique.deleted[0] if historique.deleted else None
+                apres = historique.added[0] if historique.added else None
+                deltas['etudiants_sans_classe'] += (apres is None) - (avant is None)
+    
+    # Classe, matière ou filière créée, modifiée ou supprimée : les pages qui les affichent changent
+    referentiels = (Classe, Matiere, Filiere)
+    if any(isinstance(objet, referentiels) for objet in (*session.new, *session.deleted)) or any(
+        isinstance(objet, referentiels) and session.is_modified(objet, include_collections=False)
+        for objet in session.dirty
+    ):
+        deltas[VERSION_REFERENTIEL] = 1
+        # La version lue plus tôt dans cette requête est périmée, et les lignes
+        # modifiées ne sont pas encore validées : ne plus partager (app.referentiels)
+        if has_app_context():
+            g.pop('version_referentiel', None)
+            g.referentiel_modifie = True
+    
+    if any(deltas.values()):
+        ajuster(deltas, session.connection())
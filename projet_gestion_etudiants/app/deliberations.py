@@ -0,0 +1,250 @@
+from app import db
+from app.models import (Etudiant, Classe, Filiere, Matiere, MoyenneMatiere, Deliberation,
+                        ResultatDeliberation, ResultatMatiereDeliberation)
+from app.calculs import SEUIL_VALIDATION, resultats_etudiants
+from sqlalchemy import func, case, and_, select, literal
+import json
+
+STATUTS = {
+    'valide': 'Admis',
+    'compense': 'Admis par compensation',
+    'ajourne': 'Ajourné'
+}
+
+
+def regles_deliberation(config):
+    """Règles de délibération de la configuration, telles qu'enregistrées avec les résultats"""
+    return {
+        'seuil_validation': SEUIL_VALIDATION,
+        'credits_cible': config['CREDITS_CIBLE'],
+        'compensation': config['COMPENSATION'],
+        'moyenne_compensation': config['COMPENSATION_MOYENNE'],
+        'note_eliminatoire': config['COMPENSATION_NOTE_ELIMINATOIRE'],
+        'credits_min_compensation': config['COMPENSATION_CREDITS_MIN']
+    }
+
+
+def _etudiants_perimetre(classe_id, filiere_id):
+    """Condition sur Etudiant : étudiants de la classe ou des classes de la filière"""
+    if classe_id:
+        return Etudiant.classe_id == classe_id
+    return Etudiant.classe_id.in_(select(Classe.id).where(Classe.filiere_id == filiere_id))
+
+
+def deliberer(regles, classe_id=None, filiere_id=None, libelle=None):
+    """Délibérer sur une classe ou une filière et figer les résultats
+
+    Tout est calculé par la base à partir du cumul par matière, en deux
+    instructions INSERT ... SELECT quel que soit le nombre d'étudiants :
+    la décision de chaque étudiant (moyenne générale, crédits, statut,
+    rang), puis ses moyennes par matière, marquées validées ou compensées.
+    Les deux passes et l'en-tête sont dans la même transaction : le cumul
+    ne peut pas changer entre elles. La version des étudiants concernés
+    est incrémentée (leur bulletin change).
+    """
+    if bool(classe_id) == bool(filiere_id):
+        raise ValueError('Choisir une classe ou une filière.')
+
+    if classe_id:
+        classe = db.session.get(Classe, classe_id)
+        if classe is None:
+            raise ValueError(f'Classe {classe_id} introuvable.')
+        perimetre = classe.nom
+    else:
+        filiere = db.session.get(Filiere, filiere_id)
+        if filiere is None:
+            raise ValueError(f'Filière {filiere_id} introuvable.')
+        perimetre = f'{filiere.nom} - {filiere.niveau}'
+
+    deliberation = Deliberation(
+        libelle=libelle or f'Délibération {perimetre}',
+        classe_id=classe_id or None,
+        filiere_id=filiere_id or None,
+        perimetre=perimetre,
+        regles=json.dumps(regles, sort_keys=True)
+    )
+    db.session.add(deliberation)
+    db.session.flush()
+
+    dans_perimetre = _etudiants_perimetre(classe_id, filiere_id)
+    cible = regles['credits_cible']
+
+    # Passe 1 : une ligne par étudiant du périmètre, décision et rang compris
+    par_etudiant = select(
+        MoyenneMatiere.etudiant_id,
+        func.round(
+            func.sum(MoyenneMatiere.moyenne * Matiere.coefficient) / func.sum(Matiere.coefficient), 2
+        ).label('moyenne_generale'),
+        func.min(MoyenneMatiere.moyenne).label('note_minimale'),
+        func.sum(Matiere.credit).label('credits_notes'),
+        func.sum(case((MoyenneMatiere.moyenne >= regles['seuil_validation'], Matiere.credit), else_=0)).label(
+            'credits_valides'
+        )
+    ).join(Matiere, MoyenneMatiere.matiere_id == Matiere.id).join(
+        Etudiant, MoyenneMatiere.etudiant_id == Etudiant.id
+    ).where(dans_perimetre).group_by(MoyenneMatiere.etudiant_id).cte('par_etudiant')
+
+    credits_valides = func.coalesce(par_etudiant.c.credits_valides, 0)
+    credits_notes = func.coalesce(par_etudiant.c.credits_notes, 0)
+    decisions = [(credits_valides >= cible, 'valide')]
+    if regles['compensation']:
+        decisions.append((and_(
+            credits_notes >= cible,
+            credits_valides >= regles['credits_min_compensation'],
+            par_etudiant.c.moyenne_generale >= regles['moyenne_compensation'],
+            par_etudiant.c.note_minimale >= regles['note_eliminatoire']
+        ), 'compense'))
+
+    bilan = select(
+        Etudiant.id.label('etudiant_id'), Etudiant.matricule, Etudiant.nom, Etudiant.prenom,
+        Classe.nom.label('classe_nom'),
+        par_etudiant.c.moyenne_generale, par_etudiant.c.note_minimale,
+        credits_notes.label('credits_notes'), credits_valides.label('credits_valides'),
+        case(*decisions, else_='ajourne').label('statut')
+    ).outerjoin(par_etudiant, par_etudiant.c.etudiant_id == Etudiant.id).outerjoin(
+        Classe, Etudiant.classe_id == Classe.id
+    ).where(dans_perimetre).cte('bilan')
+
+    db.session.execute(ResultatDeliberation.__table__.insert().from_select(
+        ['deliberation_id', 'etudiant_id', 'matricule', 'nom', 'prenom', 'classe_nom', 'moyenne_generale',
+         'note_minimale', 'credits_notes', 'credits_valides', 'credits_obtenus', 'statut', 'rang'],
+        select(
+            literal(deliberation.id), bilan.c.etudiant_id, bilan.c.matricule, bilan.c.nom, bilan.c.prenom,
+            bilan.c.classe_nom, bilan.c.moyenne_generale, bilan.c.note_minimale,
+            bilan.c.credits_notes, bilan.c.credits_valides,
+            case((bilan.c.statut == 'compense', bilan.c.credits_notes), else_=bilan.c.credits_valides),
+            bilan.c.statut,
+            # Les étudiants sans note n'ont pas de rang
+            case((bilan.c.moyenne_generale.is_(None), None),
+                 else_=func.rank().over(order_by=bilan.c.moyenne_generale.desc().nulls_last()))
+        )
+    ))
+
+    # Passe 2 : moyennes par matière, les matières non validées d'un admis par compensation sont compensées
+    valide = MoyenneMatiere.moyenne >= regles['seuil_validation']
+    db.session.execute(ResultatMatiereDeliberation.__table__.insert().from_select(
+        ['deliberation_id', 'etudiant_id', 'matiere_id', 'matiere_nom', 'coefficient', 'credit',
+         'moyenne', 'nombre_notes', 'valide', 'compense'],
+        select(
+            literal(deliberation.id), MoyenneMatiere.etudiant_id, MoyenneMatiere.matiere_id, Matiere.nom,
+            Matiere.coefficient, Matiere.credit, MoyenneMatiere.moyenne, MoyenneMatiere.nombre,
+            valide, and_(~valide, ResultatDeliberation.statut == 'compense')
+        ).join(Matiere, MoyenneMatiere.matiere_id == Matiere.id).join(
+            ResultatDeliberation, and_(
+                ResultatDeliberation.deliberation_id == deliberation.id,
+                ResultatDeliberation.etudiant_id == MoyenneMatiere.etudiant_id
+            )
+        )
+    ))
+
+    db.session.execute(Etudiant.__table__.update().where(
+        Etudiant.id.in_(select(ResultatDeliberation.etudiant_id).where(
+            ResultatDeliberation.deliberation_id == deliberation.id
+        ))
+    ).values(version=Etudiant.version + 1))
+
+    db.session.commit()
+    return deliberation
+
+
+def effectifs_deliberations(deliberation_ids):
+    """Nombre d'étudiants par statut de chaque délibération : {id: {statut: nombre}}"""
+    effectifs = {deliberation_id: dict.fromkeys(STATUTS, 0) for deliberation_id in deliberation_ids}
+    if effectifs:
+        lignes = db.session.query(
+            ResultatDeliberation.deliberation_id, ResultatDeliberation.statut, func.count()
+        ).filter(ResultatDeliberation.deliberation_id.in_(list(effectifs))).group_by(
+            ResultatDeliberation.deliberation_id, ResultatDeliberation.statut
+        )
+        for deliberation_id, statut, nombre in lignes:
+            effectifs[deliberation_id][statut] = nombre
+    return effectifs
+
+
+def resultats_deliberation(deliberation_id):
+    """Résultats figés d'une délibération, dans l'ordre du classement"""
+    return ResultatDeliberation.query.filter_by(deliberation_id=deliberation_id).order_by(
+        ResultatDeliberation.rang.is_(None), ResultatDeliberation.rang,
+        ResultatDeliberation.nom, ResultatDeliberation.prenom
+    ).all()
+
+
+# ========== RÉSULTATS DES BULLETINS ==========
+
+def resultats_deliberes(etudiant_ids):
+    """Résultats de la dernière délibération de chaque étudiant qui en a une, indexés par id
+
+    Même structure que resultats_etudiants, avec en plus la décision du
+    jury : les crédits comptés sont les crédits obtenus, compensation
+    comprise. Deux requêtes, sans recalcul.
+    """
+    etudiant_ids = list(etudiant_ids)
+    if not etudiant_ids:
+        return {}
+
+    # Le matricule copié dans le résultat doit être celui de la fiche : un résultat
+    # ne passe jamais à un autre étudiant qui aurait repris l'id d'une fiche supprimée
+    derniere = select(
+        ResultatDeliberation.etudiant_id,
+        func.max(ResultatDeliberation.deliberation_id).label('deliberation_id')
+    ).join(Etudiant, and_(
+        Etudiant.id == ResultatDeliberation.etudiant_id,
+        Etudiant.matricule == ResultatDeliberation.matricule
+    )).where(ResultatDeliberation.etudiant_id.in_(etudiant_ids)).group_by(
+        ResultatDeliberation.etudiant_id
+    ).subquery()
+
+    lignes = db.session.execute(
+        select(ResultatDeliberation, Deliberation.libelle, Deliberation.date_creation).join(
+            derniere, and_(
+                derniere.c.etudiant_id == ResultatDeliberation.etudiant_id,
+                derniere.c.deliberation_id == ResultatDeliberation.deliberation_id
+            )
+        ).join(Deliberation, Deliberation.id == ResultatDeliberation.deliberation_id)
+    ).all()
+
+    resultats = {}
+    for resultat, libelle, date_creation in lignes:
+        resultats[resultat.etudiant_id] = {
+            'matieres': {},
+            'moyenne_generale': resultat.moyenne_generale,
+            'credits_valides': resultat.credits_obtenus,
+            'total_notes': 0,
+            'statut': resultat.statut,
+            'decision': STATUTS[resultat.statut],
+            'rang': resultat.rang,
+            'deliberation': {'id': resultat.deliberation_id, 'libelle': libelle, 'date': date_creation}
+        }
+
+    matieres = db.session.query(ResultatMatiereDeliberation).join(
+        derniere, and_(
+            derniere.c.etudiant_id == ResultatMatiereDeliberation.etudiant_id,
+            derniere.c.deliberation_id == ResultatMatiereDeliberation.deliberation_id
+        )
+    ).order_by(ResultatMatiereDeliberation.etudiant_id, ResultatMatiereDeliberation.matiere_nom)
+
+    for ligne in matieres:
+        resultat = resultats[ligne.etudiant_id]
+        resultat['matieres'][ligne.matiere_nom] = {
+            'matiere': {'id': ligne.matiere_id, 'nom': ligne.matiere_nom,
+                        'coefficient': ligne.coefficient, 'credit': ligne.credit},
+            'moyenne': round(ligne.moyenne, 2),
+            'nombre_notes': ligne.nombre_notes,
+            'valide': ligne.valide,
+            'compense': ligne.compense
+        }
+        resultat['total_notes'] += ligne.nombre_notes
+
+    return resultats
+
+
+def resultats_bulletins(etudiant_ids):
+    """Résultats à imprimer sur les bulletins, indexés par id
+
+    Un étudiant déjà délibéré a les résultats figés de sa dernière
+    délibération ; les autres ont leurs résultats calculés sur le cumul.
+    """
+    etudiant_ids = list(etudiant_ids)
+    resultats = resultats_deliberes(etudiant_ids)
+    resultats.update(resultats_etudiants([e for e in etudiant_ids if e not in resultats]))
+    return resultats
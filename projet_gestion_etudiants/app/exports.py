@@ -0,0 +1,82 @@
+from app import db
+from app.models import Note, Etudiant, Matiere, Classe
+from sqlalchemy import select
+from datetime import timedelta
+import csv
+import io
+
+COLONNES_NOTES = ('matricule', 'nom', 'prenom', 'classe', 'matiere', 'coefficient',
+                  'type_evaluation', 'valeur', 'date_ajout', 'commentaire')
+
+# Premiers caractères qui font d'une cellule une formule dans un tableur
+DEBUTS_FORMULE = ('=', '+', '-', '@', '\t', '\r')
+
+
+def cellule_texte(valeur):
+    """Texte saisi par un utilisateur, rendu inoffensif pour un tableur (injection CSV)
+
+    Une cellule qui commence comme une formule est préfixée d'une apostrophe :
+    Excel et LibreOffice l'affichent alors comme du texte.
+    """
+    if not valeur:
+        return ''
+    return f"'{valeur}" if valeur.startswith(DEBUTS_FORMULE) else valeur
+
+
+def filtrer_notes(requete, filtres):
+    """Restreindre une requête sur les notes aux filtres d'un FiltreNotesForm validé
+
+    La requête doit déjà joindre Etudiant (pour le filtre par classe).
+    """
+    if filtres.classe_id.data:
+        requete = requete.filter(Etudiant.classe_id == filtres.classe_id.data)
+    if filtres.matiere_id.data:
+        requete = requete.filter(Note.matiere_id == filtres.matiere_id.data)
+    if filtres.type_evaluation.data:
+        requete = requete.filter(Note.type_evaluation == filtres.type_evaluation.data)
+    if filtres.date_debut.data:
+        requete = requete.filter(Note.date_ajout >= filtres.date_debut.data)
+    if filtres.date_fin.data:
+        requete = requete.filter(Note.date_ajout < filtres.date_fin.data + timedelta(days=1))
+    return requete
+
+
+def requete_export_notes(filtres):
+    """Notes à exporter, dans l'ordre de l'index (date_ajout, id) : pas de tri avant la première ligne"""
+    requete = select(
+        Etudiant.matricule, Etudiant.nom, Etudiant.prenom, Classe.nom, Matiere.nom, Matiere.coefficient,
+        Note.type_evaluation, Note.valeur, Note.date_ajout, Note.commentaire
+    ).join(Etudiant, Note.etudiant_id == Etudiant.id).join(
+        Matiere, Note.matiere_id == Matiere.id
+    ).outerjoin(Classe, Etudiant.classe_id == Classe.id).order_by(Note.date_ajout, Note.id)
+    return filtrer_notes(requete, filtres)
+
+
+def exporter_notes_csv(requete, taille_lot=1000):
+    """Générer le fichier CSV des notes morceau par morceau
+
+    Les lignes sont lues par lots de `taille_lot` sur un curseur ouvert
+    (yield_per) et chaque lot est envoyé dès qu'il est écrit : la mémoire
+    utilisée et le délai avant le premier octet ne dépendent pas du nombre
+    de notes exportées. Séparateur ';' et BOM UTF-8 pour l'ouverture dans
+    un tableur ; les cellules de texte passent par cellule_texte.
+    """
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon, delimiter=';', lineterminator='\r\n')
+
+    tampon.write('\ufeff')
+    ecrivain.writerow(COLONNES_NOTES)
+    yield tampon.getvalue()
+
+    resultat = db.session.execute(requete.execution_options(yield_per=taille_lot))
+    for lot in resultat.partitions():
+        tampon.seek(0)
+        tampon.truncate()
+        for (matricule, nom, prenom, classe, matiere, coefficient,
+             type_evaluation, valeur, date_ajout, commentaire) in lot:
+            ecrivain.writerow((
+                cellule_texte(matricule), cellule_texte(nom), cellule_texte(prenom), cellule_texte(classe),
+                cellule_texte(matiere), coefficient, cellule_texte(type_evaluation), f'{valeur:g}',
+                date_ajout.strftime('%Y-%m-%d %H:%M') if date_ajout else '', cellule_texte(commentaire)
+            ))
+        yield tampon.getvalue()
@@ -1,6 +1,9 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, SelectField, FloatField, TextAreaField, DateField, IntegerField
 from wtforms.validators import DataRequired, Email, Length, NumberRange, Optional, ValidationError
+from wtforms.widgets import HiddenInput
+from app import db
 from app.models import Utilisateur, Etudiant
 
 class LoginForm(FlaskForm):
@@ -26,6 +29,11 @@ class EtudiantForm(FlaskForm):
             raise ValidationError('Ce matricule existe déjà.')
 
 
+class ImportEtudiantsForm(FlaskForm):
+    """Formulaire d'import d'étudiants depuis un fichier CSV"""
+    fichier = FileField('Fichier CSV', validators=[FileRequired(), FileAllowed(['csv'], 'Fichier CSV uniquement.')])
+
+
 class ClasseForm(FlaskForm):
     """Formulaire pour ajouter/modifier une classe"""
     nom = StringField('Nom de la classe', validators=[DataRequired(), Length(min=2, max=50)])
@@ -49,7 +57,8 @@ class FiliereForm(FlaskForm):
 
 class NoteForm(FlaskForm):
     """Formulaire pour saisir une note"""
-    etudiant_id = SelectField('Étudiant', coerce=int, validators=[DataRequired()])
+    # Id choisi par autocomplétion (/etudiants/recherche) : pas de liste de tous les étudiants
+    etudiant_id = IntegerField('Étudiant', widget=HiddenInput(), validators=[DataRequired(message='Choisir un étudiant.')])
     matiere_id = SelectField('Matière', coerce=int, validators=[DataRequired()])
     valeur = FloatField('Note', validators=[DataRequired(), NumberRange(min=0, max=20)])
     type_evaluation = SelectField('Type d\'évaluation', 
@@ -59,6 +68,73 @@ class NoteForm(FlaskForm):
                                           ('Projet', 'Projet')],
                                   validators=[Optional()])
     commentaire = TextAreaField('Commentaire', validators=[Optional()])
+    
+    etudiant = None
+    
+    def validate_etudiant_id(self, etudiant_id):
+        """Vérifier que l'étudiant existe (seul l'id envoyé est cherché)"""
+        self.etudiant = db.session.get(Etudiant, etudiant_id.data)
+        if self.etudiant is None:
+            raise ValidationError('Étudiant introuvable.')
+    
+    def etudiant_choisi(self):
+        """Étudiant désigné par le champ, pour afficher son nom (None si aucun)"""
+        if self.etudiant is None and self.etudiant_id.data:
+            self.etudiant = db.session.get(Etudiant, self.etudiant_id.data)
+        return self.etudiant
+
+
+class SaisieGrilleForm(FlaskForm):
+    """Choix de la classe, de la matière et du type d'évaluation pour la saisie groupée"""
+    classe_id = SelectField('Classe', coerce=int, validators=[DataRequired()])
+    matiere_id = SelectField('Matière', coerce=int, validators=[DataRequired()])
+    type_evaluation = SelectField('Type d\'évaluation', 
+                                  choices=[('Devoir', 'Devoir'), 
+                                          ('Examen', 'Examen'), 
+                                          ('TP', 'TP'), 
+                                          ('Projet', 'Projet')],
+                                  validators=[DataRequired()])
+
+
+class FiltreEtudiantsForm(FlaskForm):
+    """Filtres de la liste des étudiants (formulaire GET)"""
+    q = StringField('Recherche', validators=[Optional(), Length(max=100)])
+    classe_id = SelectField('Classe', coerce=int, default=0, validators=[Optional()])
+
+
+class FiltreNotesForm(FlaskForm):
+    """Filtres de la liste des notes (formulaire GET)"""
+    classe_id = SelectField('Classe', coerce=int, default=0, validators=[Optional()])
+    matiere_id = SelectField('Matière', coerce=int, default=0, validators=[Optional()])
+    type_evaluation = SelectField('Type d\'évaluation',
+                                  choices=[('', 'Tous les types'),
+                                           ('Devoir', 'Devoir'),
+                                           ('Examen', 'Examen'),
+                                           ('TP', 'TP'),
+                                           ('Projet', 'Projet')],
+                                  default='', validators=[Optional()])
+    date_debut = DateField('Du', validators=[Optional()], format='%Y-%m-%d')
+    date_fin = DateField('Au', validators=[Optional()], format='%Y-%m-%d')
+
+
+class FiltreStatistiquesForm(FlaskForm):
+    """Périmètre des statistiques (formulaire GET) : classe ou filière, et période"""
+    classe_id = SelectField('Classe', coerce=int, default=0, validators=[Optional()])
+    filiere_id = SelectField('Filière', coerce=int, default=0, validators=[Optional()])
+    date_debut = DateField('Du', validators=[Optional()], format='%Y-%m-%d')
+    date_fin = DateField('Au', validators=[Optional()], format='%Y-%m-%d')
+
+
+class DeliberationForm(FlaskForm):
+    """Lancer une délibération du jury sur une classe ou une filière"""
+    libelle = StringField('Libellé', validators=[Optional(), Length(max=100)])
+    classe_id = SelectField('Classe', coerce=int, default=0, validators=[Optional()])
+    filiere_id = SelectField('Filière', coerce=int, default=0, validators=[Optional()])
+    
+    def validate_filiere_id(self, filiere_id):
+        """Exactement un périmètre : une classe ou une filière"""
+        if bool(self.classe_id.data) == bool(filiere_id.data):
+            raise ValidationError('Choisir une classe ou une filière (pas les deux).')
 
 
 class UtilisateurForm(FlaskForm):
@@ -72,6 +148,17 @@ class UtilisateurForm(FlaskForm):
                               ('etudiant', 'Étudiant')],
                       validators=[DataRequired()])
     password = PasswordField('Mot de passe', validators=[DataRequired(), Length(min=6)])
+    matricule = StringField('Matricule de l\'étudiant', validators=[Optional(), Length(max=20)])
+    
+    def validate_matricule(self, matricule):
+        """Vérifier que le matricule désigne un étudiant sans compte"""
+        if self.role.data != 'etudiant' or not matricule.data:
+            return
+        etudiant = Etudiant.query.filter_by(matricule=matricule.data).first()
+        if not etudiant:
+            raise ValidationError('Aucun étudiant avec ce matricule.')
+        if etudiant.utilisateur:
+            raise ValidationError('Cet étudiant a déjà un compte.')
     
     def validate_login(self, login):
         """Vérifier que le login est unique"""
@@ -0,0 +1,200 @@
+from app import db
+from app.models import Utilisateur, Filiere, Classe, Etudiant, Matiere, Note
+from app.calculs import reconstruire_moyennes
+from app.compteurs import recalculer_compteurs, ajuster, VERSION_REFERENTIEL
+from app.hachage import hachage
+from sqlalchemy import func
+from werkzeug import security
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+import random
+import unicodedata
+
+FILIERES = [
+    ('Réseaux et Télécommunications', 'RT'),
+    ('Génie Logiciel', 'GL'),
+    ('Informatique de Gestion', 'IG'),
+    ('Marketing et Communication', 'MC'),
+    ('Finance et Comptabilité', 'FC'),
+    ('Gestion des Ressources Humaines', 'RH'),
+]
+NIVEAUX = ['L1', 'L2', 'L3']
+NOMS = ['Ndiaye', 'Diop', 'Fall', 'Sow', 'Ba', 'Gueye', 'Faye', 'Sarr', 'Diallo', 'Cissé', 'Mbaye', 'Kane',
+        'Ndour', 'Thiam', 'Seck', 'Niang', 'Touré', 'Camara', 'Sy', 'Dieng', 'Diouf', 'Mbengue', 'Sall', 'Lô']
+PRENOMS = ['Fatou', 'Awa', 'Mamadou', 'Ousmane', 'Aminata', 'Cheikh', 'Mariama', 'Ibrahima', 'Khady', 'Moussa',
+           'Aïssatou', 'Abdoulaye', 'Ndeye', 'Modou', 'Coumba', 'Pape', 'Astou', 'Babacar', 'Rokhaya', 'Serigne',
+           'Adama', 'Binta', 'Lamine', 'Sokhna', 'El Hadji', 'Dieynaba', 'Omar', 'Yacine']
+# Type d'évaluation et poids dans l'historique des notes
+TYPES_EVALUATION = [('Devoir', 5), ('Examen', 2), ('TP', 4), ('Projet', 1)]
+# Nombre de notes à partir duquel les index sont reconstruits après l'insertion
+SEUIL_RECONSTRUCTION_INDEX = 100000
+
+
+@contextmanager
+def _sel_impose(sel):
+    """Faire tirer à werkzeug le sel donné au lieu d'un sel aléatoire
+
+    generate_password_hash tire son sel avec security.gen_salt : il est
+    remplacé le temps du calcul du hash commun des comptes générés, pour
+    que la même graine donne le même hash. Réservé à la commande de
+    génération, qui tourne dans son propre processus.
+    """
+    tirage = security.gen_salt
+    security.gen_salt = lambda longueur: sel
+    try:
+        yield
+    finally:
+        security.gen_salt = tirage
+
+
+def _sans_accents(texte):
+    """Texte en minuscules ASCII, pour construire emails et identifiants"""
+    texte = unicodedata.normalize('NFKD', texte).encode('ascii', 'ignore').decode()
+    return texte.lower().replace(' ', '')
+
+
+def generer_donnees(etudiants=1000, notes=50000, taille_classe=40, graine=42, comptes=True,
+                    mot_de_passe='etudiant123', debut=date(2024, 10, 1), taille_lot=20000):
+    """Générer filières, classes, étudiants, comptes étudiants et historique de notes
+
+    Tout passe par des insertions groupées (Core, sans objet ORM) dans une
+    seule transaction. Le résultat ne dépend que des paramètres et de la
+    graine : les dates sont calculées à partir de `debut`, pas de l'heure
+    courante. Les comptes étudiants (login = matricule) partagent un seul
+    hash du mot de passe, calculé une fois avec un sel tiré de la graine.
+    Le cumul des moyennes et les compteurs du tableau de bord sont
+    recalculés à la fin.
+    """
+    aleatoire = random.Random(graine)
+    matieres = [m for (m,) in db.session.query(Matiere.id).order_by(Matiere.id)]
+    if not matieres:
+        raise ValueError('Aucune matière en base : les notes ne peuvent pas être générées.')
+
+    nombre_classes = max(1, -(-etudiants // taille_classe))
+    date_debut = datetime.combine(debut, datetime.min.time())
+
+    try:
+        # Filières : une par spécialité et par niveau, autant qu'il en faut pour les classes
+        specialites = [(nom, sigle, niveau) for nom, sigle in FILIERES for niveau in NIVEAUX]
+        specialites = specialites[:min(len(specialites), nombre_classes)]
+        dernier_id = db.session.query(func.max(Filiere.id)).scalar() or 0
+        db.session.execute(Filiere.__table__.insert(), [
+            {'nom': nom, 'niveau': niveau, 'annee': debut.year} for nom, _, niveau in specialites
+        ])
+        filieres = [f for (f,) in db.session.query(Filiere.id).filter(Filiere.id > dernier_id).order_by(Filiere.id)]
+
+        # Classes réparties sur les filières, par groupes A, B, C...
+        groupes = {}
+        lignes = []
+        for i in range(nombre_classes):
+            _, sigle, niveau = specialites[i % len(specialites)]
+            groupe = groupes[i % len(specialites)] = groupes.get(i % len(specialites), -1) + 1
+            lignes.append({
+                'nom': f"{niveau} {sigle} Groupe {chr(65 + groupe % 26)}{groupe // 26 or ''}",
+                'filiere_id': filieres[i % len(filieres)]
+            })
+        dernier_id = db.session.query(func.max(Classe.id)).scalar() or 0
+        db.session.execute(Classe.__table__.insert(), lignes)
+        classes = [c for (c,) in db.session.query(Classe.id).filter(Classe.id > dernier_id).order_by(Classe.id)]
+        # Insertions hors ORM : changer la version des référentiels à la main
+        ajuster({VERSION_REFERENTIEL: 1})
+
+        # Étudiants
+        dernier_id = db.session.query(func.max(Etudiant.id)).scalar() or 0
+        deja = db.session.query(func.count(Etudiant.id)).scalar()
+        niveaux_etudiants = []
+        for lot in range(0, etudiants, taille_lot):
+            lignes = []
+            for i in range(lot, min(lot + taille_lot, etudiants)):
+                nom, prenom = aleatoire.choice(NOMS), aleatoire.choice(PRENOMS)
+                matricule = f'{debut.year}{deja + i + 1:06d}'
+                lignes.append({
+                    'matricule': matricule,
+                    'nom': nom,
+                    'prenom': prenom,
+                    'date_naissance': date(debut.year - 18 - aleatoire.randrange(8), 1, 1)
+                    + timedelta(days=aleatoire.randrange(365)),
+                    'email': f'{_sans_accents(prenom)}.{_sans_accents(nom)}.{matricule}@estm.sn',
+                    'telephone': f"77{aleatoire.randrange(10 ** 7):07d}",
+                    'classe_id': classes[i // taille_classe],
+                    'date_inscription': date_debut - timedelta(days=aleatoire.randrange(30))
+                })
+                # Niveau propre à chaque étudiant : les moyennes sont dispersées, pas toutes à 10
+                niveaux_etudiants.append(aleatoire.gauss(11, 2.5))
+            db.session.execute(Etudiant.__table__.insert(), lignes)
+        fiches = db.session.query(Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom).filter(
+            Etudiant.id > dernier_id
+        ).order_by(Etudiant.id).all()
+
+        # Comptes étudiants reliés à leur fiche
+        if comptes:
+            # Générateur à part : les données tirées ensuite ne dépendent pas de la présence des comptes
+            sel = ''.join(random.Random(f'{graine}-sel').choices(security.SALT_CHARS, k=16))
+            with _sel_impose(sel):
+                hash_commun = hachage.hacher(mot_de_passe)
+            for lot in range(0, len(fiches), taille_lot):
+                db.session.execute(Utilisateur.__table__.insert(), [
+                    {
+                        'nom': fiche.nom,
+                        'prenom': fiche.prenom,
+                        'login': fiche.matricule,
+                        'role': 'etudiant',
+                        'motdepasse_hash': hash_commun,
+                        'date_creation': date_debut,
+                        'etudiant_id': fiche.id
+                    }
+                    for fiche in fiches[lot:lot + taille_lot]
+                ])
+
+        # Historique des notes sur le semestre (15 semaines), difficulté propre à chaque matière
+        difficultes = {m: aleatoire.gauss(0, 1.5) for m in matieres}
+        types, poids = zip(*TYPES_EVALUATION)
+        jours = [(debut + timedelta(days=d)).isoformat() for d in range(15 * 7)]
+        minutes = [f'{h:02d}:{m:02d}:00.000000' for h in range(24) for m in range(60)]
+        connexion = db.session.connection()
+        
+        # Gros volume : les index de la table sont reconstruits une fois à la fin plutôt que
+        # mis à jour à chaque ligne
+        index_notes = list(Note.__table__.indexes) if notes >= SEUIL_RECONSTRUCTION_INDEX else []
+        for index in index_notes:
+            index.drop(connexion)
+        
+        # Requête SQL directe avec des tuples (dates déjà au format SQLite) : pas de
+        # traitement des paramètres ligne à ligne par SQLAlchemy
+        requete = 'INSERT INTO note (etudiant_id, matiere_id, valeur, type_evaluation, date_ajout) VALUES (?, ?, ?, ?, ?)'
+        for lot in range(0, notes if fiches else 0, taille_lot):
+            taille = min(taille_lot, notes - lot)
+            matieres_lot = aleatoire.choices(matieres, k=taille)
+            types_lot = aleatoire.choices(types, poids, k=taille)
+            lignes = []
+            for k in range(taille):
+                j = (lot + k) % len(fiches)
+                matiere = matieres_lot[k]
+                valeur = aleatoire.gauss(niveaux_etudiants[j] + difficultes[matiere], 3)
+                jour, minute = divmod(int(aleatoire.random() * len(jours) * 1440), 1440)
+                lignes.append((
+                    fiches[j].id,
+                    matiere,
+                    round(min(20, max(0, valeur)) * 4) / 4,
+                    types_lot[k],
+                    f'{jours[jour]} {minutes[minute]}'
+                ))
+            connexion.exec_driver_sql(requete, lignes)
+        
+        for index in index_notes:
+            index.create(connexion)
+        
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    reconstruire_moyennes()
+    recalculer_compteurs()
+    return {
+        'filieres': len(filieres),
+        'classes': len(classes),
+        'etudiants': len(fiches),
+        'comptes': len(fiches) if comptes else 0,
+        'notes': notes if fiches else 0
+    }
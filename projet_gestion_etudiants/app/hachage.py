@@ -0,0 +1,120 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.metriques import duree_hachage, refus_hachage
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+
+class SaturationHachage(Exception):
+    """Trop de calculs de mots de passe en attente : la requête est refusée plutôt que mise en file"""
+
+
+class PoolHachage:
+    """Pool borné de fils qui hachent et vérifient les mots de passe hors du fil de la requête
+
+    scrypt et pbkdf2 (hashlib) libèrent le GIL : les fils du pool calculent
+    en parallèle, mais jamais plus de `fils` à la fois, ce qui laisse du
+    processeur aux autres requêtes pendant un pic de connexions. Au-delà de
+    `file_max` calculs en attente, SaturationHachage est levée aussitôt.
+    Par défaut le pool prend la moitié des cœurs.
+    """
+
+    def __init__(self, methode='scrypt:32768:8:1', fils=None, file_max=64):
+        self._pool = None
+        self.configurer(methode, fils, file_max)
+
+    def configurer(self, methode, fils=None, file_max=64):
+        """Changer l'algorithme, son coût et la taille du pool"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+        self.methode = methode
+        self.fils = fils or max(1, (os.cpu_count() or 2) // 2)
+        self._pool = ThreadPoolExecutor(max_workers=self.fils, thread_name_prefix='hachage')
+        self._places = threading.BoundedSemaphore(self.fils + file_max)
+        # Préfixe des hash produits avec ces réglages (« scrypt » devient « scrypt:32768:8:1 »)
+        self._prefixe = generate_password_hash('', method=methode).split('$', 1)[0]
+
+    def _executer(self, operation, fonction, *args):
+        """Exécuter un calcul dans le pool et attendre son résultat"""
+        if not self._places.acquire(blocking=False):
+            refus_hachage.incrementer()
+            raise SaturationHachage()
+        try:
+            with duree_hachage.mesurer(operation):
+                return self._pool.submit(fonction, *args).result()
+        finally:
+            self._places.release()
+
+    def hacher(self, mot_de_passe):
+        """Hash du mot de passe avec l'algorithme et le coût configurés"""
+        return self._executer('hacher', generate_password_hash, mot_de_passe, self.methode)
+
+    def verifier(self, hash_mot_de_passe, mot_de_passe):
+        """Vérifier un mot de passe contre son hash (quel que soit l'algorithme du hash)"""
+        return self._executer('verifier', check_password_hash, hash_mot_de_passe, mot_de_passe)
+
+    def a_mettre_a_jour(self, hash_mot_de_passe):
+        """Le hash a-t-il été produit avec un autre algorithme ou un autre coût ?"""
+        return hash_mot_de_passe.split('$', 1)[0] != self._prefixe
+
+
+# Hachage des mots de passe des utilisateurs
+hachage = PoolHachage()
+
+
+def mesurer_connexions(pool, connexions=200, clients=50):
+    """Mesurer le nombre de vérifications de mot de passe par seconde que le pool soutient
+
+    `clients` fils simulent des connexions simultanées (une vérification
+    chacune, comme auth.login). Renvoie le débit, les latences vues par un
+    client et le nombre de connexions refusées pour saturation.
+    """
+    hash_test = pool.hacher('mot-de-passe-de-test')
+    latences = []
+    refus = [0]
+    verrou = threading.Lock()
+    restantes = iter(range(connexions))
+
+    def client():
+        while True:
+            with verrou:
+                if next(restantes, None) is None:
+                    return
+            debut = time.perf_counter()
+            try:
+                pool.verifier(hash_test, 'mot-de-passe-de-test')
+            except SaturationHachage:
+                with verrou:
+                    refus[0] += 1
+                continue
+            with verrou:
+                latences.append(time.perf_counter() - debut)
+
+    debut = time.perf_counter()
+    fils = [threading.Thread(target=client) for _ in range(clients)]
+    for f in fils:
+        f.start()
+    for f in fils:
+        f.join()
+    duree = time.perf_counter() - debut
+
+    latences.sort()
+
+    def centile(p):
+        if not latences:
+            return None
+        return round(latences[min(len(latences) - 1, int(p * len(latences)))] * 1000, 1)
+
+    return {
+        'methode': pool.methode,
+        'fils': pool.fils,
+        'connexions': len(latences),
+        'refusees': refus[0],
+        'duree_s': round(duree, 2),
+        'connexions_par_seconde': round(len(latences) / duree, 1),
+        'latence_p50_ms': centile(0.50),
+        'latence_p95_ms': centile(0.95),
+        'latence_max_ms': centile(1.0)
+    }
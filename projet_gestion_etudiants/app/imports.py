@@ -0,0 +1,155 @@
+from app import db
+from app.models import Etudiant
+from app.compteurs import ajuster
+from app.referentiels import referentiels
+from email_validator import validate_email, EmailNotValidError
+from datetime import datetime
+import csv
+import io
+import itertools
+
+COLONNES_OBLIGATOIRES = ('matricule', 'nom', 'prenom')
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y')
+
+
+def lire_lignes_csv(flux):
+    """Générer (numéro de ligne, ligne) pour chaque ligne d'un fichier CSV binaire
+
+    Le fichier est lu au fil de l'eau : seule la ligne courante est en mémoire.
+    Le séparateur (',' ou ';') est déduit de la ligne d'en-tête.
+    """
+    texte = io.TextIOWrapper(flux, encoding='utf-8-sig', newline='')
+    try:
+        entete = texte.readline()
+        separateur = ';' if entete.count(';') > entete.count(',') else ','
+        lecteur = csv.DictReader(itertools.chain([entete], texte), delimiter=separateur)
+        lecteur.fieldnames = [(nom or '').strip().lower() for nom in lecteur.fieldnames or []]
+
+        manquantes = [c for c in COLONNES_OBLIGATOIRES if c not in lecteur.fieldnames]
+        if manquantes:
+            raise ValueError(f"Colonnes obligatoires manquantes : {', '.join(manquantes)}")
+
+        for ligne in lecteur:
+            yield lecteur.line_num, {cle: (valeur or '').strip() for cle, valeur in ligne.items() if cle}
+    finally:
+        # Ne pas fermer le fichier téléversé avec le TextIOWrapper
+        texte.detach()
+
+
+def _valider_ligne(ligne, matricules, emails, classes):
+    """Contrôler une ligne et renvoyer (valeurs à insérer, liste d'erreurs)"""
+    erreurs = []
+
+    matricule = ligne.get('matricule', '')
+    if not 3 <= len(matricule) <= 20:
+        erreurs.append('Matricule obligatoire (3 à 20 caractères).')
+    elif matricule in matricules:
+        erreurs.append(f'Le matricule {matricule} existe déjà.')
+
+    for champ, libelle in (('nom', 'Nom'), ('prenom', 'Prénom')):
+        if not 2 <= len(ligne.get(champ, '')) <= 100:
+            erreurs.append(f'{libelle} obligatoire (2 à 100 caractères).')
+
+    date_naissance = None
+    if ligne.get('date_naissance'):
+        for format_date in FORMATS_DATE:
+            try:
+                date_naissance = datetime.strptime(ligne['date_naissance'], format_date).date()
+                break
+            except ValueError:
+                continue
+        else:
+            erreurs.append(f"Date de naissance invalide : {ligne['date_naissance']}.")
+
+    email = ligne.get('email') or None
+    if email:
+        try:
+            validate_email(email, check_deliverability=False)
+        except EmailNotValidError:
+            erreurs.append(f'Email invalide : {email}.')
+        else:
+            if email.lower() in emails:
+                erreurs.append(f'L\'email {email} est déjà utilisé.')
+
+    telephone = ligne.get('telephone') or None
+    if telephone and len(telephone) > 20:
+        erreurs.append('Téléphone trop long (20 caractères maximum).')
+
+    classe_id = None
+    if ligne.get('classe'):
+        classe_id = classes.get(ligne['classe'])
+        if classe_id is None:
+            erreurs.append(f"Classe inconnue : {ligne['classe']}.")
+
+    valeurs = {
+        'matricule': matricule,
+        'nom': ligne.get('nom', ''),
+        'prenom': ligne.get('prenom', ''),
+        'date_naissance': date_naissance,
+        'email': email,
+        'telephone': telephone,
+        'classe_id': classe_id
+    }
+    return valeurs, erreurs
+
+
+def importer_etudiants(flux, taille_lot=500):
+    """Importer des étudiants depuis un fichier CSV et renvoyer le rapport d'import
+
+    L'unicité des matricules et des emails est contrôlée contre des ensembles
+    chargés une seule fois (base + lignes déjà acceptées). Les lignes valides
+    sont insérées par lots de `taille_lot` dans une seule transaction. Le
+    fichier est importé en entier ou pas du tout : si une ligne est rejetée
+    (ou si la base refuse un lot), la transaction est annulée et le rapport
+    liste toutes les lignes en erreur.
+    """
+    matricules = {m for (m,) in db.session.query(Etudiant.matricule)}
+    emails = {e.lower() for (e,) in db.session.query(Etudiant.email).filter(Etudiant.email.isnot(None))}
+    classes = {classe.nom: classe.id for classe in referentiels.lire().classes.values()}
+
+    rapport = {'lignes': 0, 'importes': 0, 'erreurs': []}
+    table = Etudiant.__table__
+    lot = []
+    sans_classe = 0
+
+    try:
+        for numero, ligne in lire_lignes_csv(flux):
+            rapport['lignes'] += 1
+            valeurs, erreurs = _valider_ligne(ligne, matricules, emails, classes)
+
+            if erreurs:
+                rapport['erreurs'].append((numero, erreurs))
+                continue
+            if rapport['erreurs']:
+                # Le fichier sera refusé : on ne fait plus que le contrôler
+                continue
+
+            matricules.add(valeurs['matricule'])
+            if valeurs['email']:
+                emails.add(valeurs['email'].lower())
+
+            lot.append(valeurs)
+            if valeurs['classe_id'] is None:
+                sans_classe += 1
+            if len(lot) >= taille_lot:
+                db.session.execute(table.insert(), lot)
+                rapport['importes'] += len(lot)
+                lot = []
+
+        if rapport['erreurs']:
+            db.session.rollback()
+            rapport['importes'] = 0
+            return rapport
+
+        if lot:
+            db.session.execute(table.insert(), lot)
+            rapport['importes'] += len(lot)
+
+        # Insertions hors ORM : les compteurs du tableau de bord sont ajustés à la main
+        ajuster({'etudiants': rapport['importes'], 'etudiants_sans_classe': sans_classe})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return rapport
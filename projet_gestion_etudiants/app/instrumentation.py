@@ -0,0 +1,59 @@
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from collections import Counter
+import time
+
+
+def _debut_requete_sql(connexion, curseur, instruction, parametres, contexte, executemany):
+    connexion.info.setdefault('debuts_sql', []).append(time.perf_counter())
+
+
+def _fin_requete_sql(connexion, curseur, instruction, parametres, contexte, executemany):
+    duree = (time.perf_counter() - connexion.info['debuts_sql'].pop()) * 1000
+    if not has_request_context() or 'sql' not in g:
+        return
+
+    g.sql['requetes'] += 1
+    g.sql['duree_ms'] += duree
+    g.sql['instructions'][instruction] += 1
+
+    if duree >= current_app.config['SQL_SEUIL_LENT_MS']:
+        current_app.logger.warning(
+            'Requête SQL lente (%.1f ms) sur %s : %s', duree, request.endpoint, ' '.join(instruction.split())[:500]
+        )
+
+
+def instrumenter(app, moteurs):
+    """Compter les requêtes SQL et leur durée pour chaque requête HTTP
+
+    Les totaux sont envoyés dans l'en-tête Server-Timing. Une instruction
+    exécutée au moins SQL_SEUIL_N_PLUS_UN fois dans la même requête HTTP
+    (même texte, paramètres différents) est signalée comme N+1 probable ;
+    les requêtes plus lentes que SQL_SEUIL_LENT_MS sont journalisées.
+    """
+    for moteur in moteurs:
+        event.listen(moteur, 'before_cursor_execute', _debut_requete_sql)
+        event.listen(moteur, 'after_cursor_execute', _fin_requete_sql)
+
+    @app.before_request
+    def _demarrer_mesure():
+        g.debut_requete = time.perf_counter()
+        g.sql = {'requetes': 0, 'duree_ms': 0.0, 'instructions': Counter()}
+
+    @app.after_request
+    def _publier_mesure(reponse):
+        if 'sql' not in g:
+            return reponse
+
+        total = (time.perf_counter() - g.debut_requete) * 1000
+        reponse.headers['Server-Timing'] = (
+            f'sql;desc="{g.sql["requetes"]} requetes";dur={g.sql["duree_ms"]:.1f}, total;dur={total:.1f}'
+        )
+
+        for instruction, nombre in g.sql['instructions'].items():
+            if nombre >= app.config['SQL_SEUIL_N_PLUS_UN']:
+                app.logger.warning(
+                    'N+1 probable sur %s : instruction exécutée %d fois : %s',
+                    request.endpoint, nombre, ' '.join(instruction.split())[:500]
+                )
+        return reponse
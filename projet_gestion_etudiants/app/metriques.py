@@ -0,0 +1,219 @@
+from flask import g, request
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+# Bornes (en secondes) des histogrammes de durée
+SEUILS_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _etiquettes(noms, valeurs):
+    """Étiquettes au format texte Prometheus : {nom="valeur",...}"""
+    if not noms:
+        return ''
+    paires = []
+    for nom, valeur in zip(noms, valeurs):
+        valeur = str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        paires.append(f'{nom}="{valeur}"')
+    return '{' + ','.join(paires) + '}'
+
+
+class Compteur:
+    """Compteur croissant, une valeur par combinaison d'étiquettes"""
+
+    type = 'counter'
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        # Sans étiquette, le compteur est exposé dès le départ (à 0)
+        self._valeurs = {} if self.etiquettes else {(): 0}
+        self._verrou = threading.Lock()
+
+    def incrementer(self, *valeurs, n=1):
+        with self._verrou:
+            self._valeurs[valeurs] = self._valeurs.get(valeurs, 0) + n
+
+    def lignes(self):
+        with self._verrou:
+            valeurs = sorted(self._valeurs.items())
+        for cle, valeur in valeurs:
+            yield f'{self.nom}{_etiquettes(self.etiquettes, cle)} {valeur}'
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._valeurs = {} if self.etiquettes else {(): 0}
+
+
+class Histogramme:
+    """Distribution de durées (en secondes) répartie sur des seuils fixes
+
+    Une observation coûte une recherche dichotomique dans les seuils et une
+    incrémentation sous verrou : les compteurs cumulés par seuil (`le`) ne
+    sont calculés qu'au moment de l'exposition.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, nom, aide, etiquettes=(), seuils=SEUILS_LATENCE):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.seuils = tuple(sorted(seuils))
+        # Par combinaison d'étiquettes : [effectif par seuil (+ dernier = au-delà), somme]
+        self._series = {}
+        self._verrou = threading.Lock()
+
+    def observer(self, duree, *valeurs):
+        indice = bisect_left(self.seuils, duree)
+        with self._verrou:
+            serie = self._series.get(valeurs)
+            if serie is None:
+                serie = self._series[valeurs] = [[0] * (len(self.seuils) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += duree
+
+    @contextmanager
+    def mesurer(self, *valeurs):
+        """Observer la durée du bloc `with`"""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observer(time.perf_counter() - debut, *valeurs)
+
+    def lignes(self):
+        with self._verrou:
+            series = sorted((cle, list(effectifs), somme) for cle, (effectifs, somme) in self._series.items())
+        noms = self.etiquettes + ('le',)
+        for cle, effectifs, somme in series:
+            cumul = 0
+            for seuil, effectif in zip(self.seuils, effectifs):
+                cumul += effectif
+                yield f'{self.nom}_bucket{_etiquettes(noms, cle + (repr(float(seuil)),))} {cumul}'
+            cumul += effectifs[-1]
+            yield f'{self.nom}_bucket{_etiquettes(noms, cle + ("+Inf",))} {cumul}'
+            yield f'{self.nom}_sum{_etiquettes(self.etiquettes, cle)} {somme:.6f}'
+            yield f'{self.nom}_count{_etiquettes(self.etiquettes, cle)} {cumul}'
+
+    def reinitialiser(self):
+        with self._verrou:
+            self._series.clear()
+
+
+class Jauge:
+    """Valeur instantanée lue au moment de l'exposition (occupation d'un pool...)
+
+    `lecture` renvoie une liste de (valeurs des étiquettes, valeur).
+    """
+
+    type = 'gauge'
+
+    def __init__(self, nom, aide, etiquettes, lecture):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = tuple(etiquettes)
+        self.lecture = lecture
+
+    def lignes(self):
+        for cle, valeur in self.lecture():
+            yield f'{self.nom}{_etiquettes(self.etiquettes, cle)} {valeur}'
+
+    def reinitialiser(self):
+        pass
+
+
+class Registre:
+    """Ensemble des métriques de ce processus
+
+    Comme les caches, les métriques sont propres à chaque processus
+    (worker) : le collecteur interroge chaque worker, ou additionne.
+    """
+
+    def __init__(self):
+        self._metriques = {}
+
+    def enregistrer(self, metrique):
+        self._metriques[metrique.nom] = metrique
+        return metrique
+
+    def exposer(self):
+        """Toutes les métriques au format texte d'exposition Prometheus (version 0.0.4)"""
+        lignes = []
+        for metrique in self._metriques.values():
+            lignes.append(f'# HELP {metrique.nom} {metrique.aide}')
+            lignes.append(f'# TYPE {metrique.nom} {metrique.type}')
+            lignes.extend(metrique.lignes())
+        return '\n'.join(lignes) + '\n'
+
+    def reinitialiser(self):
+        for metrique in self._metriques.values():
+            metrique.reinitialiser()
+
+
+registre = Registre()
+
+latence_requetes = registre.enregistrer(Histogramme(
+    'http_requete_duree_secondes', 'Durée de traitement des requêtes HTTP, par route.', ('endpoint', 'methode')
+))
+reponses = registre.enregistrer(Compteur(
+    'http_reponses_total', 'Réponses HTTP envoyées, par route et code de statut.', ('endpoint', 'statut')
+))
+duree_pdf = registre.enregistrer(Histogramme(
+    'bulletin_pdf_duree_secondes', 'Durée du rendu d\'un bulletin PDF.', ('mode',)
+))
+cache_bulletins = registre.enregistrer(Compteur(
+    'bulletin_cache_total', 'Demandes de bulletin PDF : servies par le cache, rendues, ou jointes à un rendu en cours.',
+    ('resultat',)
+))
+duree_hachage = registre.enregistrer(Histogramme(
+    'hachage_duree_secondes', 'Durée d\'un calcul de mot de passe, attente dans le pool comprise.', ('operation',),
+    seuils=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+))
+refus_hachage = registre.enregistrer(Compteur(
+    'hachage_refus_total', 'Calculs de mot de passe refusés pour saturation du pool.'
+))
+
+
+def _occupation_pools(moteurs):
+    """Connexions de chaque pool SQLAlchemy : ouvertes au repos, prêtées, au-delà de pool_size"""
+    def lecture():
+        valeurs = []
+        for nom, moteur in moteurs.items():
+            pool = moteur.pool
+            if not hasattr(pool, 'checkedout'):
+                continue
+            valeurs.append(((nom, 'repos'), pool.checkedin()))
+            valeurs.append(((nom, 'pretees'), pool.checkedout()))
+            # overflow() est négatif tant que le pool n'a pas atteint pool_size
+            valeurs.append(((nom, 'debordement'), max(0, pool.overflow())))
+        return valeurs
+    return lecture
+
+
+def installer_metriques(app, moteurs):
+    """Mesurer chaque requête HTTP et exposer l'occupation des pools de connexions
+
+    `moteurs` associe un nom (« ecriture », « lecture ») à chaque moteur.
+    La mesure se limite à deux lectures d'horloge et deux mises à jour sous
+    verrou par requête.
+    """
+    registre.enregistrer(Jauge(
+        'bdd_pool_connexions', 'Connexions des pools de la base de données, par état.',
+        ('moteur', 'etat'), _occupation_pools(moteurs)
+    ))
+
+    @app.before_request
+    def _demarrer_chrono():
+        g.debut_metriques = time.perf_counter()
+
+    @app.after_request
+    def _enregistrer_requete(reponse):
+        debut = g.pop('debut_metriques', None)
+        if debut is not None:
+            endpoint = request.endpoint or 'inconnu'
+            latence_requetes.observer(time.perf_counter() - debut, endpoint, request.method)
+            reponses.incrementer(endpoint, reponse.status_code)
+        return reponse
@@ -0,0 +1,217 @@
+from app import db
+from app.models import Utilisateur, Etudiant, Matiere, Note, MoyenneMatiere
+from sqlalchemy import text, func, inspect
+from sqlalchemy.schema import CreateTable
+from datetime import datetime
+
+# Migrations du schéma, dans l'ordre : (version, description, fonction)
+# Une migration déjà livrée ne doit plus être modifiée : ajouter une nouvelle version.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Enregistrer une fonction de migration du schéma"""
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        return f
+    return decorator
+
+
+def _creer_table_versions(connexion):
+    """Créer la table qui garde la trace des migrations appliquées"""
+    connexion.execute(text(
+        'CREATE TABLE IF NOT EXISTS migration_schema ('
+        'version INTEGER PRIMARY KEY, '
+        'description VARCHAR(200) NOT NULL, '
+        'date_application TIMESTAMP NOT NULL)'
+    ))
+
+
+def versions_appliquees():
+    """Versions de migration déjà appliquées à la base"""
+    with db.engine.begin() as connexion:
+        _creer_table_versions(connexion)
+        return {version for (version,) in connexion.execute(text('SELECT version FROM migration_schema'))}
+
+
+def appliquer_migrations():
+    """Appliquer les migrations manquantes, chacune dans sa propre transaction"""
+    deja_appliquees = versions_appliquees()
+    appliquees = []
+
+    for version, description, fonction in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in deja_appliquees:
+            continue
+
+        with db.engine.begin() as connexion:
+            fonction(connexion)
+            connexion.execute(
+                text('INSERT INTO migration_schema (version, description, date_application) VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': datetime.utcnow()}
+            )
+        appliquees.append((version, description))
+
+    return appliquees
+
+
+# ========== MIGRATIONS ==========
+
+@migration(1, 'Index des chemins de requêtes fréquents')
+def _index_chemins_chauds(connexion):
+    index = [
+        ('ix_note_etudiant_matiere', 'note', 'etudiant_id, matiere_id'),
+        ('ix_note_matiere_date', 'note', 'matiere_id, date_ajout'),
+        ('ix_note_date_ajout', 'note', 'date_ajout, id'),
+        ('ix_etudiant_nom_prenom', 'etudiant', 'nom, prenom, id'),
+        ('ix_etudiant_classe_nom', 'etudiant', 'classe_id, nom, prenom, id'),
+        ('ix_classe_filiere_id', 'classe', 'filiere_id'),
+        ('ix_moyenne_matiere_matiere_id', 'moyenne_matiere', 'matiere_id'),
+    ]
+    for nom, table, colonnes in index:
+        connexion.execute(text(f'CREATE INDEX IF NOT EXISTS {nom} ON {table} ({colonnes})'))
+
+
+@migration(2, 'Lien entre un compte utilisateur et sa fiche étudiant')
+def _lien_utilisateur_etudiant(connexion):
+    colonnes = [c['name'] for c in inspect(connexion).get_columns('utilisateur')]
+    if 'etudiant_id' not in colonnes:
+        connexion.execute(text('ALTER TABLE utilisateur ADD COLUMN etudiant_id INTEGER REFERENCES etudiant (id)'))
+    connexion.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_utilisateur_etudiant_id ON utilisateur (etudiant_id)'
+    ))
+
+
+@migration(3, 'Version des données de chaque étudiant (ETag des pages de notes)')
+def _version_etudiant(connexion):
+    colonnes = [c['name'] for c in inspect(connexion).get_columns('etudiant')]
+    if 'version' not in colonnes:
+        connexion.execute(text('ALTER TABLE etudiant ADD COLUMN version INTEGER NOT NULL DEFAULT 0'))
+
+
+@migration(4, 'Résultats des délibérations non modifiables')
+def _deliberations_figees(connexion):
+    # Les tables sont créées par create_all ; la base refuse ensuite toute
+    # modification ou suppression d'un résultat enregistré
+    for table in ('deliberation', 'resultat_deliberation', 'resultat_matiere_deliberation'):
+        for operation in ('UPDATE', 'DELETE'):
+            connexion.execute(text(
+                f'CREATE TRIGGER IF NOT EXISTS {table}_sans_{operation.lower()} '
+                f'BEFORE {operation} ON {table} '
+                f"BEGIN SELECT RAISE(ABORT, 'Les résultats d''une délibération ne sont pas modifiables'); END"
+            ))
+
+
+@migration(5, 'Index plein texte des étudiants (FTS5) et déclencheurs de mise à jour')
+def _recherche_etudiants(connexion):
+    if connexion.dialect.name != 'sqlite':
+        return
+    # Table à contenu externe : le texte reste dans etudiant, seul l'index est stocké.
+    # Sans accents (remove_diacritics), index des préfixes de 2 à 4 caractères.
+    connexion.execute(text(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS etudiant_recherche USING fts5('
+        "matricule, nom, prenom, email, content='etudiant', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+    ))
+    nouveau = "INSERT INTO etudiant_recherche (rowid, matricule, nom, prenom, email) " \
+              "VALUES (new.id, new.matricule, new.nom, new.prenom, new.email);"
+    ancien = "INSERT INTO etudiant_recherche (etudiant_recherche, rowid, matricule, nom, prenom, email) " \
+             "VALUES ('delete', old.id, old.matricule, old.nom, old.prenom, old.email);"
+    declencheurs = [
+        ('etudiant_recherche_ajout', 'AFTER INSERT ON etudiant', nouveau),
+        ('etudiant_recherche_suppression', 'AFTER DELETE ON etudiant', ancien),
+        # Seulement si une colonne indexée change : pas à chaque incrément de version
+        ('etudiant_recherche_modification', 'AFTER UPDATE OF matricule, nom, prenom, email ON etudiant',
+         ancien + ' ' + nouveau),
+    ]
+    for nom, evenement, corps in declencheurs:
+        connexion.execute(text(f'CREATE TRIGGER IF NOT EXISTS {nom} {evenement} BEGIN {corps} END'))
+    connexion.execute(text("INSERT INTO etudiant_recherche (etudiant_recherche) VALUES ('rebuild')"))
+
+
+@migration(6, 'Identifiants des étudiants jamais réutilisés (AUTOINCREMENT)')
+def _etudiant_autoincrement(connexion):
+    if connexion.dialect.name != 'sqlite':
+        return
+    definition = connexion.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'etudiant'"
+    )).scalar()
+    if 'AUTOINCREMENT' in definition.upper():
+        return
+
+    # SQLite ne sait pas ajouter AUTOINCREMENT à une table existante : la table est
+    # reconstruite (mêmes lignes, mêmes id), puis ses index et déclencheurs recréés
+    dependances = [sql for (sql,) in connexion.execute(text(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'etudiant' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL"
+    ))]
+    existantes = {c['name'] for c in inspect(connexion).get_columns('etudiant')}
+    colonnes = ', '.join(c.name for c in Etudiant.__table__.columns if c.name in existantes)
+
+    creation = str(CreateTable(Etudiant.__table__).compile(connexion))
+    connexion.execute(text(creation.replace('CREATE TABLE etudiant ', 'CREATE TABLE etudiant_reconstruction ', 1)))
+    connexion.execute(text(f'INSERT INTO etudiant_reconstruction ({colonnes}) SELECT {colonnes} FROM etudiant'))
+    connexion.execute(text('DROP TABLE etudiant'))
+    connexion.execute(text('ALTER TABLE etudiant_reconstruction RENAME TO etudiant'))
+    for sql in dependances:
+        connexion.execute(text(sql))
+
+    # Les id déjà supprimés mais encore cités par une délibération ne sont pas redonnés
+    connexion.execute(text("DELETE FROM sqlite_sequence WHERE name = 'etudiant'"))
+    connexion.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'etudiant', max("
+        "coalesce((SELECT max(id) FROM etudiant), 0), "
+        "coalesce((SELECT max(etudiant_id) FROM resultat_deliberation), 0))"
+    ))
+
+
+# ========== CONTRÔLE DES PLANS D'EXÉCUTION ==========
+
+def requetes_chaudes():
+    """Requêtes représentatives des pages les plus consultées : (libellé, requête)"""
+    return [
+        ('Notes d\'un étudiant',
+         db.session.query(Note).filter(Note.etudiant_id == 1).order_by(Note.date_ajout)),
+        ('Cumul des moyennes d\'un étudiant',
+         db.session.query(MoyenneMatiere.moyenne, Matiere.nom).join(
+             Matiere, MoyenneMatiere.matiere_id == Matiere.id
+         ).filter(MoyenneMatiere.etudiant_id == 1)),
+        ('Page de la liste des notes',
+         db.session.query(Note.id, Etudiant.nom, Matiere.nom).join(
+             Etudiant, Note.etudiant_id == Etudiant.id
+         ).join(Matiere, Note.matiere_id == Matiere.id).order_by(
+             Note.date_ajout.desc(), Note.id.desc()
+         ).limit(51)),
+        ('Notes d\'une matière par date',
+         db.session.query(Note.id).filter(Note.matiere_id == 1).order_by(Note.date_ajout.desc()).limit(51)),
+        ('Page de la liste des étudiants',
+         db.session.query(Etudiant.id, Etudiant.nom).order_by(Etudiant.nom, Etudiant.prenom, Etudiant.id).limit(51)),
+        ('Étudiants d\'une classe',
+         db.session.query(Etudiant.id).filter(Etudiant.classe_id == 1).order_by(
+             Etudiant.nom, Etudiant.prenom, Etudiant.id
+         )),
+        ('Étudiant par nom et prénom',
+         db.session.query(Etudiant.id).filter(Etudiant.nom == 'Ndiaye', Etudiant.prenom == 'Fatou')),
+        ('Compte lié à un étudiant',
+         db.session.query(Utilisateur.id).filter(Utilisateur.etudiant_id == 1)),
+        ('Reconstruction du cumul',
+         db.session.query(Note.etudiant_id, Note.matiere_id, func.count(Note.id)).group_by(
+             Note.etudiant_id, Note.matiere_id
+         )),
+    ]
+
+
+def parcours_complets():
+    """Exécuter EXPLAIN QUERY PLAN sur les requêtes chaudes (SQLite)
+
+    Renvoie la liste (libellé, détail du plan) des requêtes qui parcourent
+    une table entière au lieu d'utiliser un index.
+    """
+    problemes = []
+    for libelle, requete in requetes_chaudes():
+        sql = str(requete.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        for ligne in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')):
+            detail = ligne[-1]
+            # « SCAN table » sans index = lecture de toute la table
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                problemes.append((libelle, detail))
+    return problemes
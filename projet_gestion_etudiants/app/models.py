@@ -1,16 +1,47 @@
 from app import db, login_manager
+from app.cache import cache_utilisateurs
+from app.hachage import hachage
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from datetime import datetime
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Charger un utilisateur pour Flask-Login"""
-    return Utilisateur.query.get(int(user_id))
+    """Charger un utilisateur pour Flask-Login (depuis le cache si possible)"""
+    user_id = int(user_id)
+    utilisateur = cache_utilisateurs.lire(user_id)
+    
+    if utilisateur is None:
+        compte = db.session.get(Utilisateur, user_id)
+        if compte is None:
+            return None
+        utilisateur = UtilisateurSession(compte)
+        cache_utilisateurs.ecrire(user_id, utilisateur)
+    
+    return utilisateur
+
+
+class UtilisateurSession(UserMixin):
+    """Copie légère et détachée d'un utilisateur, gardée en cache entre les requêtes"""
+    
+    def __init__(self, compte):
+        self.id = compte.id
+        self.nom = compte.nom
+        self.prenom = compte.prenom
+        self.login = compte.login
+        self.role = compte.role
+        self.etudiant_id = compte.etudiant_id
+    
+    def __repr__(self):
+        return f'<UtilisateurSession {self.login} - {self.role}>'
 
 class Utilisateur(UserMixin, db.Model):
     """Modèle pour les utilisateurs (Admin, Enseignant, Étudiant)"""
     __tablename__ = 'utilisateur'
+    __table_args__ = (
+        db.Index('ix_utilisateur_etudiant_id', 'etudiant_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(100), nullable=False)
@@ -19,19 +50,50 @@ class Utilisateur(UserMixin, db.Model):
     role = db.Column(db.String(20), nullable=False)  # admin, enseignant, etudiant
     motdepasse_hash = db.Column(db.String(200), nullable=False)
     date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+    etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), nullable=True)  # comptes étudiants
+    
+    # Relations
+    etudiant = db.relationship('Etudiant', backref=db.backref('utilisateur', uselist=False))
     
     def set_password(self, password):
-        """Hasher le mot de passe"""
-        self.motdepasse_hash = generate_password_hash(password)
+        """Hasher le mot de passe (pool de hachage, algorithme de la configuration)"""
+        self.motdepasse_hash = hachage.hacher(password)
     
     def check_password(self, password):
         """Vérifier le mot de passe"""
-        return check_password_hash(self.motdepasse_hash, password)
+        return hachage.verifier(self.motdepasse_hash, password)
     
     def __repr__(self):
         return f'<Utilisateur {self.login} - {self.role}>'
 
 
+@event.listens_for(Utilisateur, 'after_insert')
+@event.listens_for(Utilisateur, 'after_update')
+@event.listens_for(Utilisateur, 'after_delete')
+def _invalider_cache_utilisateur(mapper, connection, utilisateur):
+    """Retirer du cache un utilisateur créé, modifié (mot de passe, rôle...) ou supprimé
+
+    L'entrée est retirée au flush puis de nouveau après le commit : entre
+    les deux, une requête concurrente peut relire l'ancienne ligne (pool de
+    lecture) et la remettre en cache pour toute la durée de vie.
+    """
+    cache_utilisateurs.invalider(utilisateur.id)
+    session = object_session(utilisateur)
+    if session is not None:
+        session.info.setdefault('utilisateurs_modifies', set()).add(utilisateur.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalider_cache_apres_commit(session):
+    for utilisateur_id in session.info.pop('utilisateurs_modifies', ()):
+        cache_utilisateurs.invalider(utilisateur_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _oublier_utilisateurs_modifies(session):
+    session.info.pop('utilisateurs_modifies', None)
+
+
 class Filiere(db.Model):
     """Modèle pour les filières (L1, L2, L3)"""
     __tablename__ = 'filiere'
@@ -51,6 +113,9 @@ class Filiere(db.Model):
 class Classe(db.Model):
     """Modèle pour les classes"""
     __tablename__ = 'classe'
+    __table_args__ = (
+        db.Index('ix_classe_filiere_id', 'filiere_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nom = db.Column(db.String(50), nullable=False)
@@ -66,6 +131,13 @@ class Classe(db.Model):
 class Etudiant(db.Model):
     """Modèle pour les étudiants"""
     __tablename__ = 'etudiant'
+    __table_args__ = (
+        db.Index('ix_etudiant_nom_prenom', 'nom', 'prenom', 'id'),
+        db.Index('ix_etudiant_classe_nom', 'classe_id', 'nom', 'prenom', 'id'),
+        # Id jamais réutilisé après une suppression : les résultats figés des
+        # délibérations désignent l'étudiant par son id (migration 6)
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     matricule = db.Column(db.String(20), unique=True, nullable=False)
@@ -76,56 +148,23 @@ class Etudiant(db.Model):
     telephone = db.Column(db.String(20), nullable=True)
     classe_id = db.Column(db.Integer, db.ForeignKey('classe.id'), nullable=True)
     date_inscription = db.Column(db.DateTime, default=datetime.utcnow)
+    # Version des données de l'étudiant (fiche et notes), pour l'ETag de ses pages
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0',
+                        onupdate=db.literal_column('version + 1'))
     
     # Relations
     notes = db.relationship('Note', backref='etudiant', lazy=True, cascade='all, delete-orphan')
+    moyennes = db.relationship('MoyenneMatiere', lazy=True, cascade='all, delete-orphan')
     
     def calculer_moyenne_generale(self):
         """Calculer la moyenne générale pondérée"""
-        if not self.notes:
-            return None
-        
-        total_notes = 0
-        total_coefficients = 0
-        
-        # Grouper les notes par matière
-        notes_par_matiere = {}
-        for note in self.notes:
-            if note.matiere_id not in notes_par_matiere:
-                notes_par_matiere[note.matiere_id] = []
-            notes_par_matiere[note.matiere_id].append(note.valeur)
-        
-        # Calculer la moyenne par matière puis la moyenne générale
-        for matiere_id, valeurs in notes_par_matiere.items():
-            matiere = Matiere.query.get(matiere_id)
-            moyenne_matiere = sum(valeurs) / len(valeurs)
-            total_notes += moyenne_matiere * matiere.coefficient
-            total_coefficients += matiere.coefficient
-        
-        if total_coefficients == 0:
-            return None
-        
-        return round(total_notes / total_coefficients, 2)
+        from app.calculs import resultats_etudiant
+        return resultats_etudiant(self)['moyenne_generale']
     
     def calculer_credits_valides(self):
         """Calculer le total des crédits validés (note >= 10)"""
-        credits_valides = 0
-        
-        # Grouper les notes par matière
-        notes_par_matiere = {}
-        for note in self.notes:
-            if note.matiere_id not in notes_par_matiere:
-                notes_par_matiere[note.matiere_id] = []
-            notes_par_matiere[note.matiere_id].append(note.valeur)
-        
-        # Vérifier si la moyenne de chaque matière >= 10
-        for matiere_id, valeurs in notes_par_matiere.items():
-            moyenne_matiere = sum(valeurs) / len(valeurs)
-            if moyenne_matiere >= 10:
-                matiere = Matiere.query.get(matiere_id)
-                credits_valides += matiere.credit
-        
-        return credits_valides
+        from app.calculs import resultats_etudiant
+        return resultats_etudiant(self)['credits_valides']
     
     def __repr__(self):
         return f'<Etudiant {self.matricule} - {self.prenom} {self.nom}>'
@@ -143,6 +182,7 @@ class Matiere(db.Model):
     
     # Relations
     notes = db.relationship('Note', backref='matiere', lazy=True, cascade='all, delete-orphan')
+    moyennes = db.relationship('MoyenneMatiere', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Matiere {self.nom}>'
@@ -151,6 +191,11 @@ class Matiere(db.Model):
 class Note(db.Model):
     """Modèle pour les notes"""
     __tablename__ = 'note'
+    __table_args__ = (
+        db.Index('ix_note_etudiant_matiere', 'etudiant_id', 'matiere_id'),
+        db.Index('ix_note_matiere_date', 'matiere_id', 'date_ajout'),
+        db.Index('ix_note_date_ajout', 'date_ajout', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), nullable=False)
@@ -168,3 +213,97 @@ class Note(db.Model):
     
     def __repr__(self):
         return f'<Note {self.valeur}/20 - Étudiant {self.etudiant_id} - Matière {self.matiere_id}>'
+
+
+class MoyenneMatiere(db.Model):
+    """Cumul des notes par étudiant et par matière, mis à jour à chaque écriture de note"""
+    __tablename__ = 'moyenne_matiere'
+    __table_args__ = (
+        db.Index('ix_moyenne_matiere_matiere_id', 'matiere_id'),
+    )
+    
+    etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), primary_key=True)
+    matiere_id = db.Column(db.Integer, db.ForeignKey('matiere.id'), primary_key=True)
+    somme = db.Column(db.Float, nullable=False, default=0)
+    nombre = db.Column(db.Integer, nullable=False, default=0)
+    moyenne = db.Column(db.Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<MoyenneMatiere Étudiant {self.etudiant_id} - Matière {self.matiere_id} : {self.moyenne}>'
+
+
+class Deliberation(db.Model):
+    """Délibération du jury sur une classe ou une filière
+
+    Les résultats sont figés au moment de la délibération (tables
+    resultat_deliberation et resultat_matiere_deliberation) : ils ne sont
+    plus jamais modifiés, une nouvelle délibération les remplace.
+    """
+    __tablename__ = 'deliberation'
+
+    id = db.Column(db.Integer, primary_key=True)
+    libelle = db.Column(db.String(100), nullable=False)
+    classe_id = db.Column(db.Integer, db.ForeignKey('classe.id'), nullable=True)
+    filiere_id = db.Column(db.Integer, db.ForeignKey('filiere.id'), nullable=True)
+    perimetre = db.Column(db.String(150), nullable=False)  # nom de la classe ou de la filière à la date
+    regles = db.Column(db.Text, nullable=False)  # règles appliquées (JSON)
+    date_creation = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Deliberation {self.id} - {self.perimetre}>'
+
+
+class ResultatDeliberation(db.Model):
+    """Résultat figé d'un étudiant à une délibération (décision du jury)"""
+    __tablename__ = 'resultat_deliberation'
+    __table_args__ = (
+        db.Index('ix_resultat_deliberation_etudiant', 'etudiant_id', 'deliberation_id'),
+    )
+
+    deliberation_id = db.Column(db.Integer, db.ForeignKey('deliberation.id'), primary_key=True)
+    etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), primary_key=True)
+    # Identité recopiée : le résultat reste lisible si la fiche change ou disparaît
+    matricule = db.Column(db.String(20), nullable=False)
+    nom = db.Column(db.String(100), nullable=False)
+    prenom = db.Column(db.String(100), nullable=False)
+    classe_nom = db.Column(db.String(50), nullable=True)
+    moyenne_generale = db.Column(db.Float, nullable=True)
+    note_minimale = db.Column(db.Float, nullable=True)  # plus basse moyenne de matière
+    credits_notes = db.Column(db.Integer, nullable=False, default=0)  # crédits des matières notées
+    credits_valides = db.Column(db.Integer, nullable=False, default=0)  # moyenne ≥ seuil
+    credits_obtenus = db.Column(db.Integer, nullable=False, default=0)  # après compensation
+    statut = db.Column(db.String(20), nullable=False)  # valide, compense, ajourne
+    rang = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<ResultatDeliberation {self.deliberation_id} - Étudiant {self.etudiant_id} : {self.statut}>'
+
+
+class ResultatMatiereDeliberation(db.Model):
+    """Moyenne figée d'un étudiant dans une matière à une délibération"""
+    __tablename__ = 'resultat_matiere_deliberation'
+
+    deliberation_id = db.Column(db.Integer, db.ForeignKey('deliberation.id'), primary_key=True)
+    etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), primary_key=True)
+    matiere_id = db.Column(db.Integer, db.ForeignKey('matiere.id'), primary_key=True)
+    matiere_nom = db.Column(db.String(100), nullable=False)
+    coefficient = db.Column(db.Integer, nullable=False)
+    credit = db.Column(db.Integer, nullable=False)
+    moyenne = db.Column(db.Float, nullable=False)
+    nombre_notes = db.Column(db.Integer, nullable=False)
+    valide = db.Column(db.Boolean, nullable=False)
+    compense = db.Column(db.Boolean, nullable=False)
+
+    def __repr__(self):
+        return f'<ResultatMatiereDeliberation {self.deliberation_id} - Étudiant {self.etudiant_id} - Matière {self.matiere_id}>'
+
+
+class Compteur(db.Model):
+    """Compteurs du tableau de bord, tenus à jour à chaque écriture"""
+    __tablename__ = 'compteur'
+    
+    cle = db.Column(db.String(50), primary_key=True)
+    valeur = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<Compteur {self.cle} = {self.valeur}>'
@@ -0,0 +1,162 @@
+from flask import g, current_app, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text, select, insert, func
+from sqlalchemy.exc import OperationalError
+import os
+import random
+import tempfile
+import threading
+import time
+
+# Pragmas qu'une connexion en lecture seule ne peut pas (ou n'a pas à) changer
+PRAGMAS_ECRITURE = ('journal_mode', 'synchronous')
+
+
+class SessionRoutee(Session):
+    """Session qui envoie les requêtes des pages en lecture seule vers le pool de lecture"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('lecture_seule'):
+            moteur = current_app.extensions.get('moteur_lecture')
+            if moteur is not None:
+                return moteur
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def ecriture(f):
+    """Marquer une route GET qui écrit en base : elle utilise le pool d'écriture"""
+    f.ecriture = True
+    return f
+
+
+def appliquer_pragmas(moteur, pragmas):
+    """Exécuter les pragmas SQLite sur chaque nouvelle connexion du moteur"""
+    @event.listens_for(moteur, 'connect')
+    def _pragmas(connexion_dbapi, _):
+        curseur = connexion_dbapi.cursor()
+        for nom, valeur in pragmas.items():
+            curseur.execute(f'PRAGMA {nom} = {valeur}')
+        curseur.close()
+
+
+def creer_moteur_lecture(chemin, pragmas, taille_pool=5):
+    """Moteur SQLite ouvert en lecture seule (mode=ro) sur le même fichier"""
+    moteur = create_engine(
+        f'sqlite:///file:{chemin}?mode=ro&uri=true',
+        pool_size=taille_pool,
+        max_overflow=taille_pool
+    )
+    appliquer_pragmas(moteur, {nom: valeur for nom, valeur in pragmas.items() if nom not in PRAGMAS_ECRITURE})
+    return moteur
+
+
+def configurer_moteur(app, db):
+    """Appliquer le profil SQLite de la configuration et ouvrir le pool de lecture
+
+    Le mode WAL permet aux lectures de continuer pendant une écriture, et
+    busy_timeout fait attendre un écrivain au lieu d'échouer aussitôt avec
+    « database is locked ». Les requêtes GET et HEAD passent par un second
+    pool de connexions en lecture seule, sauf les routes marquées @ecriture.
+    """
+    moteur = db.engine
+    chemin = moteur.url.database
+    if moteur.dialect.name != 'sqlite' or not chemin or chemin == ':memory:':
+        return
+
+    pragmas = app.config['SQLITE_PRAGMAS']
+    appliquer_pragmas(moteur, pragmas)
+    # Les connexions déjà ouvertes n'ont pas reçu les pragmas
+    moteur.dispose()
+
+    if app.config['SQLITE_POOL_LECTURE']:
+        app.extensions['moteur_lecture'] = creer_moteur_lecture(chemin, pragmas, app.config['SQLITE_POOL_LECTURE'])
+
+        @app.before_request
+        def _choisir_pool():
+            vue = app.view_functions.get(request.endpoint)
+            g.lecture_seule = request.method in ('GET', 'HEAD') and not getattr(vue, 'ecriture', False)
+
+
+# ========== TEST DE CONCURRENCE ==========
+
+def tester_concurrence(metadata, pragmas=None, lecteurs=8, ecrivains=2, duree=5.0, etudiants=200):
+    """Faire tourner lectures et écritures en parallèle sur une base temporaire
+
+    Avec `pragmas` (profil de la configuration), les lecteurs utilisent un pool
+    en lecture seule ; sans, la base garde les réglages SQLite par défaut
+    (journal en mode DELETE). Renvoie le nombre d'opérations réussies et
+    d'erreurs « database is locked » par type de tâche.
+    """
+    dossier = tempfile.mkdtemp()
+    chemin = os.path.join(dossier, 'concurrence.db')
+    moteur = create_engine(f'sqlite:///{chemin}', pool_size=ecrivains, max_overflow=0)
+    if pragmas:
+        appliquer_pragmas(moteur, pragmas)
+
+    metadata.create_all(moteur)
+    etudiant, matiere, note = (metadata.tables[nom] for nom in ('etudiant', 'matiere', 'note'))
+    with moteur.begin() as connexion:
+        connexion.execute(insert(matiere), [{'nom': f'Matière {i}', 'coefficient': 1, 'credit': 3} for i in range(10)])
+        connexion.execute(insert(etudiant), [
+            {'matricule': f'T{i:06d}', 'nom': f'Nom{i}', 'prenom': 'Test'} for i in range(etudiants)
+        ])
+        connexion.execute(insert(note), [
+            {'etudiant_id': e, 'matiere_id': m, 'valeur': random.uniform(0, 20)}
+            for e in range(1, etudiants + 1) for m in range(1, 11) for _ in range(5)
+        ])
+
+    lecture = creer_moteur_lecture(chemin, pragmas, lecteurs) if pragmas else \
+        create_engine(f'sqlite:///{chemin}', pool_size=lecteurs, max_overflow=0)
+
+    bilan = {tache: {'operations': 0, 'verrous': 0} for tache in ('lectures', 'ecritures')}
+    verrou_bilan = threading.Lock()
+    fin = time.monotonic() + duree
+
+    # Page de résultats : moyenne de chaque étudiant sur toutes ses notes
+    requete_lecture = select(note.c.etudiant_id, func.avg(note.c.valeur)).group_by(note.c.etudiant_id)
+
+    def compter(tache, cle):
+        with verrou_bilan:
+            bilan[tache][cle] += 1
+
+    def lire():
+        while time.monotonic() < fin:
+            try:
+                with lecture.connect() as connexion:
+                    connexion.execute(requete_lecture).all()
+                compter('lectures', 'operations')
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                compter('lectures', 'verrous')
+
+    def ecrire():
+        while time.monotonic() < fin:
+            try:
+                with moteur.begin() as connexion:
+                    connexion.execute(insert(note), [
+                        {'etudiant_id': random.randint(1, etudiants), 'matiere_id': random.randint(1, 10),
+                         'valeur': random.uniform(0, 20)} for _ in range(20)
+                    ])
+                compter('ecritures', 'operations')
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                compter('ecritures', 'verrous')
+
+    taches = [threading.Thread(target=lire) for _ in range(lecteurs)] + \
+        [threading.Thread(target=ecrire) for _ in range(ecrivains)]
+    for tache in taches:
+        tache.start()
+    for tache in taches:
+        tache.join()
+
+    with moteur.connect() as connexion:
+        bilan['journal_mode'] = connexion.execute(text('PRAGMA journal_mode')).scalar()
+
+    lecture.dispose()
+    moteur.dispose()
+    for fichier in os.listdir(dossier):
+        os.remove(os.path.join(dossier, fichier))
+    os.rmdir(dossier)
+    return bilan
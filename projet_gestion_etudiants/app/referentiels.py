@@ -0,0 +1,127 @@
+from flask import g
+from app import db
+from app.models import Classe, Matiere, Filiere
+from app.compteurs import lire_version_referentiel
+from collections import namedtuple
+import threading
+
+# Copies en lecture seule des lignes, partagées par toutes les requêtes du processus
+ClasseRef = namedtuple('ClasseRef', 'id nom filiere_id')
+MatiereRef = namedtuple('MatiereRef', 'id nom coefficient credit description')
+FiliereRef = namedtuple('FiliereRef', 'id nom niveau annee')
+
+
+class Referentiel:
+    """Classes, matières et filières telles qu'à une version donnée
+
+    Les lignes sont indexées par id (dans l'ordre des id) et les listes de
+    choix des formulaires, triées par nom, sont calculées une fois au
+    chargement.
+    """
+
+    def __init__(self, version, classes, matieres, filieres):
+        self.version = version
+        self.classes = {c.id: c for c in classes}
+        self.matieres = {m.id: m for m in matieres}
+        self.filieres = {f.id: f for f in filieres}
+        self._choix_classes = sorted(((c.id, c.nom) for c in classes), key=lambda c: c[1])
+        self._choix_matieres = sorted(((m.id, m.nom) for m in matieres), key=lambda m: m[1])
+        self._choix_filieres = [
+            (f.id, f'{f.nom} - {f.niveau} ({f.annee})')
+            for f in sorted(filieres, key=lambda f: (f.nom, f.niveau, f.annee))
+        ]
+        self.total_credits = sum(m.credit for m in matieres)
+
+    def choix_classes(self, *premiers):
+        """Choix d'un SelectField : les `premiers` (ex. (0, 'Toutes les classes')) puis les classes par nom"""
+        return list(premiers) + self._choix_classes
+
+    def choix_matieres(self, *premiers):
+        return list(premiers) + self._choix_matieres
+
+    def choix_filieres(self, *premiers):
+        return list(premiers) + self._choix_filieres
+
+    def nom_classe(self, classe_id):
+        classe = self.classes.get(classe_id)
+        return classe.nom if classe else None
+
+
+class CacheReferentiels:
+    """Référentiels (classes, matières, filières) gardés en mémoire du processus
+
+    Toute écriture d'une classe, d'une matière ou d'une filière incrémente le
+    compteur `version_referentiel` dans sa transaction (app.compteurs). Une
+    requête qui a besoin des référentiels lit seulement ce compteur (une
+    ligne, par clé primaire, une fois par requête) et ne recharge les trois
+    tables que si la version a changé : chaque processus (worker) voit les
+    modifications des autres dès la requête suivante, sans délai d'expiration.
+    Un référentiel est gardé par base de données (plusieurs applications
+    peuvent tourner dans le même processus, comme dans les benchmarks).
+    """
+
+    def __init__(self):
+        self._referentiels = {}
+        self._verrou = threading.Lock()
+        self.verifications = 0
+        self.chargements = 0
+
+    def version(self):
+        """Version des référentiels, lue une fois par requête (ou par contexte d'application)"""
+        if 'version_referentiel' not in g:
+            g.version_referentiel = lire_version_referentiel()
+            with self._verrou:
+                self.verifications += 1
+        return g.version_referentiel
+
+    def lire(self, relire=False):
+        """Référentiel à jour, rechargé seulement si la version a changé
+
+        `relire` : relire la version même si elle a déjà été lue dans cette
+        requête, pour des données lues après elle.
+        """
+        if relire:
+            g.pop('version_referentiel', None)
+        version = self.version()
+        if g.get('referentiel_modifie'):
+            # Écriture en cours dans cette requête : lu pour elle seule, la transaction peut encore échouer
+            return self._charger(version)
+        base = str(db.engine.url)
+        referentiel = self._referentiels.get(base)
+        if referentiel is None or referentiel.version != version:
+            with self._verrou:
+                referentiel = self._referentiels.get(base)
+                if referentiel is None or referentiel.version != version:
+                    referentiel = self._referentiels[base] = self._charger(version)
+                    self.chargements += 1
+        return referentiel
+
+    def _charger(self, version):
+        # Lu dans la même transaction que la version : les lignes correspondent à cette version
+        return Referentiel(
+            version,
+            [ClasseRef(*ligne) for ligne in db.session.query(Classe.id, Classe.nom, Classe.filiere_id).order_by(Classe.id)],
+            [MatiereRef(*ligne) for ligne in db.session.query(
+                Matiere.id, Matiere.nom, Matiere.coefficient, Matiere.credit, Matiere.description
+            ).order_by(Matiere.id)],
+            [FiliereRef(*ligne) for ligne in db.session.query(
+                Filiere.id, Filiere.nom, Filiere.niveau, Filiere.annee
+            ).order_by(Filiere.id)]
+        )
+
+    def statistiques(self):
+        """Vérifications de version, rechargements et contenu du référentiel de l'application courante"""
+        referentiel = self._referentiels.get(str(db.engine.url))
+        with self._verrou:
+            return {
+                'version': referentiel.version if referentiel else None,
+                'verifications': self.verifications,
+                'chargements': self.chargements,
+                'classes': len(referentiel.classes) if referentiel else 0,
+                'matieres': len(referentiel.matieres) if referentiel else 0,
+                'filieres': len(referentiel.filieres) if referentiel else 0
+            }
+
+
+# Référentiels partagés par les formulaires, les pages et le calcul des moyennes
+referentiels = CacheReferentiels()
@@ -1,9 +1,23 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response, stream_with_context, current_app, jsonify
 from flask_login import login_required
 from app import db
-from app.models import Etudiant, Classe, Matiere, Filiere, Utilisateur
-from app.forms import EtudiantForm, ClasseForm, MatiereForm, FiliereForm, UtilisateurForm
-from app.utils import role_required, generer_matricule
+from app.models import Etudiant, Classe, Matiere, Filiere, Utilisateur, Deliberation
+from sqlalchemy import func
+from app.forms import EtudiantForm, ImportEtudiantsForm, FiltreEtudiantsForm, FiltreNotesForm, ClasseForm, MatiereForm, FiliereForm, DeliberationForm, UtilisateurForm
+from app.moteur import ecriture
+from app.utils import role_required, generer_matricule, paginer
+from app.bulletins import donnees_bulletins_classe, generer_zip_bulletins
+from app.imports import importer_etudiants
+from app.exports import requete_export_notes, exporter_notes_csv
+from app.recherche import ids_correspondants
+from app.deliberations import deliberer, regles_deliberation, effectifs_deliberations, resultats_deliberation, STATUTS
+from app.cache import cache_utilisateurs
+from app.hachage import SaturationHachage
+from app.referentiels import referentiels
+from app.metriques import registre
+import csv
+import json
+from datetime import date
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -13,9 +27,27 @@ bp = Blueprint('admin', __name__, url_prefix='/admin')
 @login_required
 @role_required('admin')
 def liste_etudiants():
-    """Liste de tous les étudiants"""
-    etudiants = Etudiant.query.all()
-    return render_template('admin/etudiants.html', etudiants=etudiants)
+    """Liste des étudiants, paginée par curseur"""
+    filtres = FiltreEtudiantsForm(request.args, meta={'csrf': False})
+    filtres.classe_id.choices = referentiels.lire().choix_classes((0, 'Toutes les classes'))
+    
+    # Seules les colonnes affichées sont chargées, avec la classe en jointure
+    requete = db.session.query(
+        Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom, Etudiant.email,
+        Classe.nom.label('classe_nom')
+    ).outerjoin(Classe, Etudiant.classe_id == Classe.id)
+    
+    if filtres.validate():
+        if filtres.classe_id.data:
+            requete = requete.filter(Etudiant.classe_id == filtres.classe_id.data)
+        if filtres.q.data:
+            # Index plein texte : matricule, nom, prénom ou email, par préfixe et sans accents
+            requete = requete.filter(Etudiant.id.in_(ids_correspondants(filtres.q.data)))
+    
+    etudiants, suivant = paginer(requete, [Etudiant.nom, Etudiant.prenom, Etudiant.id],
+                                 request.args.get('apres'), current_app.config['TAILLE_PAGE'])
+    
+    return render_template('admin/etudiants.html', etudiants=etudiants, filtres=filtres, suivant=suivant)
 
 
 @bp.route('/etudiant/ajouter', methods=['GET', 'POST'])
@@ -26,7 +58,7 @@ def ajouter_etudiant():
     form = EtudiantForm()
     
     # Charger les classes pour le SelectField
-    form.classe_id.choices = [(0, 'Aucune')] + [(c.id, c.nom) for c in Classe.query.all()]
+    form.classe_id.choices = referentiels.lire().choix_classes((0, 'Aucune'))
     
     if form.validate_on_submit():
         etudiant = Etudiant(
@@ -48,6 +80,28 @@ def ajouter_etudiant():
     return render_template('admin/etudiant_form.html', form=form, titre='Ajouter un étudiant')
 
 
+@bp.route('/etudiants/importer', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def importer_etudiants_csv():
+    """Importer des étudiants en masse depuis un fichier CSV"""
+    form = ImportEtudiantsForm()
+    rapport = None
+    
+    if form.validate_on_submit():
+        try:
+            rapport = importer_etudiants(form.fichier.data.stream, current_app.config['IMPORT_TAILLE_LOT'])
+        except (ValueError, csv.Error) as e:
+            flash(f'Fichier illisible : {e}', 'danger')
+        else:
+            if rapport['erreurs']:
+                flash(f"Fichier refusé : {len(rapport['erreurs'])} ligne(s) en erreur, aucun étudiant importé.", 'danger')
+            else:
+                flash(f"{rapport['importes']} étudiant(s) importé(s) sur {rapport['lignes']} ligne(s).", 'success')
+    
+    return render_template('admin/import_etudiants.html', form=form, rapport=rapport)
+
+
 @bp.route('/etudiant/modifier/<int:id>', methods=['GET', 'POST'])
 @login_required
 @role_required('admin')
@@ -57,7 +111,7 @@ def modifier_etudiant(id):
     form = EtudiantForm(obj=etudiant)
     
     # Charger les classes pour le SelectField
-    form.classe_id.choices = [(0, 'Aucune')] + [(c.id, c.nom) for c in Classe.query.all()]
+    form.classe_id.choices = referentiels.lire().choix_classes((0, 'Aucune'))
     
     if form.validate_on_submit():
         etudiant.matricule = form.matricule.data
@@ -77,6 +131,7 @@ def modifier_etudiant(id):
 
 
 @bp.route('/etudiant/supprimer/<int:id>')
+@ecriture
 @login_required
 @role_required('admin')
 def supprimer_etudiant(id):
@@ -97,8 +152,16 @@ def supprimer_etudiant(id):
 @login_required
 @role_required('admin')
 def liste_classes():
-    """Liste de toutes les classes"""
-    classes = Classe.query.all()
+    """Liste de toutes les classes, avec filière et effectif (une seule requête)"""
+    nombre_etudiants = db.session.query(func.count(Etudiant.id)).filter(
+        Etudiant.classe_id == Classe.id
+    ).scalar_subquery()
+    
+    classes = db.session.query(
+        Classe.id, Classe.nom,
+        Filiere.nom.label('filiere_nom'), Filiere.niveau.label('filiere_niveau'),
+        nombre_etudiants.label('nombre_etudiants')
+    ).outerjoin(Filiere, Classe.filiere_id == Filiere.id).order_by(Classe.id).all()
     return render_template('admin/classes.html', classes=classes)
 
 
@@ -110,7 +173,7 @@ def ajouter_classe():
     form = ClasseForm()
     
     # Charger les filières
-    form.filiere_id.choices = [(0, 'Aucune')] + [(f.id, f'{f.nom} - {f.niveau}') for f in Filiere.query.all()]
+    form.filiere_id.choices = referentiels.lire().choix_filieres((0, 'Aucune'))
     
     if form.validate_on_submit():
         classe = Classe(
@@ -128,6 +191,7 @@ def ajouter_classe():
 
 
 @bp.route('/classe/supprimer/<int:id>')
+@ecriture
 @login_required
 @role_required('admin')
 def supprimer_classe(id):
@@ -142,6 +206,24 @@ def supprimer_classe(id):
     return redirect(url_for('admin.liste_classes'))
 
 
+@bp.route('/classe/<int:id>/bulletins')
+@login_required
+@role_required('admin')
+def bulletins_classe(id):
+    """Télécharger les bulletins PDF de toute une classe dans une archive ZIP"""
+    classe = Classe.query.get_or_404(id)
+    
+    # L'archive est envoyée au fur et à mesure que les PDF sont rendus
+    donnees = donnees_bulletins_classe(classe, current_app.config['BULLETINS_TAILLE_LOT'])
+    flux = generer_zip_bulletins(donnees)
+    
+    return Response(
+        stream_with_context(flux),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=bulletins_classe_{classe.id}.zip'}
+    )
+
+
 # ========== GESTION DES MATIÈRES ==========
 
 @bp.route('/matieres')
@@ -149,9 +231,9 @@ def supprimer_classe(id):
 @role_required('admin')
 def liste_matieres():
     """Liste de toutes les matières"""
-    matieres = Matiere.query.all()
-    total_credits = sum(m.credit for m in matieres)
-    return render_template('admin/matieres.html', matieres=matieres, total_credits=total_credits)
+    referentiel = referentiels.lire()
+    return render_template('admin/matieres.html', matieres=list(referentiel.matieres.values()),
+                           total_credits=referentiel.total_credits)
 
 
 @bp.route('/matiere/ajouter', methods=['GET', 'POST'])
@@ -201,6 +283,7 @@ def modifier_matiere(id):
 
 
 @bp.route('/matiere/supprimer/<int:id>')
+@ecriture
 @login_required
 @role_required('admin')
 def supprimer_matiere(id):
@@ -222,7 +305,7 @@ def supprimer_matiere(id):
 @role_required('admin')
 def liste_filieres():
     """Liste de toutes les filières"""
-    filieres = Filiere.query.all()
+    filieres = list(referentiels.lire().filieres.values())
     return render_template('admin/filieres.html', filieres=filieres)
 
 
@@ -249,6 +332,86 @@ def ajouter_filiere():
     return render_template('admin/filiere_form.html', form=form, titre='Ajouter une filière')
 
 
+# ========== DÉLIBÉRATIONS ==========
+
+@bp.route('/deliberations', methods=['GET', 'POST'])
+@login_required
+@role_required('admin')
+def liste_deliberations():
+    """Délibérations enregistrées et lancement d'une nouvelle délibération"""
+    form = DeliberationForm()
+    referentiel = referentiels.lire()
+    form.classe_id.choices = referentiel.choix_classes((0, 'Aucune'))
+    form.filiere_id.choices = referentiel.choix_filieres((0, 'Aucune'))
+    
+    if form.validate_on_submit():
+        try:
+            deliberation = deliberer(
+                regles_deliberation(current_app.config),
+                classe_id=form.classe_id.data, filiere_id=form.filiere_id.data, libelle=form.libelle.data
+            )
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            flash(f'{deliberation.libelle} enregistrée.', 'success')
+            return redirect(url_for('admin.voir_deliberation', id=deliberation.id))
+    
+    deliberations = Deliberation.query.order_by(Deliberation.id.desc()).all()
+    effectifs = effectifs_deliberations([d.id for d in deliberations])
+    return render_template('admin/deliberations.html', form=form, deliberations=deliberations,
+                           effectifs=effectifs, statuts=STATUTS)
+
+
+@bp.route('/deliberation/<int:id>')
+@login_required
+@role_required('admin')
+def voir_deliberation(id):
+    """Résultats figés d'une délibération (lus tels qu'enregistrés, sans recalcul)"""
+    deliberation = Deliberation.query.get_or_404(id)
+    resultats = resultats_deliberation(deliberation.id)
+    effectifs = effectifs_deliberations([deliberation.id])[deliberation.id]
+    return render_template('admin/deliberation.html', deliberation=deliberation, resultats=resultats,
+                           effectifs=effectifs, regles=json.loads(deliberation.regles), statuts=STATUTS)
+
+
+# ========== EXPORT DES NOTES ==========
+
+def _filtres_export():
+    """Formulaire des filtres de l'export, rempli depuis l'URL"""
+    filtres = FiltreNotesForm(request.args, meta={'csrf': False})
+    referentiel = referentiels.lire()
+    filtres.classe_id.choices = referentiel.choix_classes((0, 'Toutes les classes'))
+    filtres.matiere_id.choices = referentiel.choix_matieres((0, 'Toutes les matières'))
+    return filtres
+
+
+@bp.route('/notes/export')
+@login_required
+@role_required('admin')
+def export_notes():
+    """Choisir les filtres de l'export CSV des notes"""
+    return render_template('admin/export_notes.html', filtres=_filtres_export())
+
+
+@bp.route('/notes/export.csv')
+@login_required
+@role_required('admin')
+def export_notes_csv():
+    """Télécharger les notes filtrées au format CSV, envoyé au fil de la lecture"""
+    filtres = _filtres_export()
+    if not filtres.validate():
+        flash('Filtres de l\'export invalides.', 'danger')
+        return redirect(url_for('admin.export_notes', **request.args))
+    
+    flux = exporter_notes_csv(requete_export_notes(filtres), current_app.config['EXPORT_TAILLE_LOT'])
+    
+    return Response(
+        stream_with_context(flux),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=notes_{date.today():%Y%m%d}.csv'}
+    )
+
+
 # ========== GESTION DES UTILISATEURS ==========
 
 @bp.route('/utilisateurs')
@@ -274,7 +437,15 @@ def ajouter_utilisateur():
             login=form.login.data,
             role=form.role.data
         )
-        utilisateur.set_password(form.password.data)
+        try:
+            utilisateur.set_password(form.password.data)
+        except SaturationHachage:
+            flash('Trop de calculs de mots de passe en cours, veuillez réessayer dans quelques secondes.', 'warning')
+            return render_template('admin/utilisateur_form.html', form=form, titre='Ajouter un utilisateur'), 503
+        
+        # Lier le compte étudiant à sa fiche
+        if form.role.data == 'etudiant' and form.matricule.data:
+            utilisateur.etudiant = Etudiant.query.filter_by(matricule=form.matricule.data).first()
         
         db.session.add(utilisateur)
         db.session.commit()
@@ -283,3 +454,22 @@ def ajouter_utilisateur():
         return redirect(url_for('admin.liste_utilisateurs'))
     
     return render_template('admin/utilisateur_form.html', form=form, titre='Ajouter un utilisateur')
+
+
+@bp.route('/cache')
+@login_required
+@role_required('admin')
+def statistiques_cache():
+    """Statistiques des caches en mémoire de ce processus (JSON)"""
+    return jsonify({
+        'utilisateurs': cache_utilisateurs.statistiques(),
+        'referentiels': referentiels.statistiques()
+    })
+
+
+@bp.route('/metriques')
+@login_required
+@role_required('admin')
+def metriques():
+    """Métriques de ce processus au format texte Prometheus"""
+    return Response(registre.exposer(), content_type='text/plain; version=0.0.4; charset=utf-8')
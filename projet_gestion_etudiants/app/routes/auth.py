@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_user, logout_user, current_user
 from app import db
 from app.models import Utilisateur
 from app.forms import LoginForm
+from app.hachage import hachage, SaturationHachage
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -17,8 +18,24 @@ def login():
     if form.validate_on_submit():
         utilisateur = Utilisateur.query.filter_by(login=form.login.data).first()
         
-        if utilisateur and utilisateur.check_password(form.password.data):
+        try:
+            valide = utilisateur is not None and utilisateur.check_password(form.password.data)
+        except SaturationHachage:
+            flash('Trop de connexions en cours, veuillez réessayer dans quelques secondes.', 'warning')
+            return render_template('login.html', form=form), 503
+        
+        # Hash d'un ancien algorithme ou d'un coût différent : le refaire avec les réglages actuels.
+        # Pool saturé : la mise à jour attendra la connexion suivante, l'utilisateur est tout de même connecté.
+        if valide and hachage.a_mettre_a_jour(utilisateur.motdepasse_hash):
+            try:
+                utilisateur.set_password(form.password.data)
+                db.session.commit()
+            except SaturationHachage:
+                db.session.rollback()
+        
+        if valide:
             login_user(utilisateur)
+            session['etudiant_id'] = utilisateur.etudiant_id
             flash(f'Bienvenue {utilisateur.prenom} {utilisateur.nom} !', 'success')
             
             # Rediriger vers la page demandée ou dashboard
@@ -37,5 +54,6 @@ def login():
 def logout():
     """Déconnexion"""
     logout_user()
+    session.pop('etudiant_id', None)
     flash('Vous avez été déconnecté.', 'info')
     return redirect(url_for('auth.login'))
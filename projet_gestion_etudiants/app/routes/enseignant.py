@@ -1,9 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required
 from app import db
-from app.models import Note, Etudiant, Matiere, Classe
-from app.forms import NoteForm
-from app.utils import role_required
+from app.models import Note, Etudiant, Matiere, Classe, MoyenneMatiere
+from app.forms import NoteForm, SaisieGrilleForm, FiltreEtudiantsForm, FiltreNotesForm
+from flask_wtf import FlaskForm
+from sqlalchemy import func, bindparam
+from app.exports import filtrer_notes
+from app.moteur import ecriture
+from app.utils import role_required, paginer
+from app.calculs import enregistrer_notes, classement_classe
+from app.compteurs import ajuster_notes_ajoutees
+from app.referentiels import referentiels
 
 bp = Blueprint('enseignant', __name__, url_prefix='/enseignant')
 
@@ -11,9 +18,26 @@ bp = Blueprint('enseignant', __name__, url_prefix='/enseignant')
 @login_required
 @role_required('enseignant')
 def liste_notes():
-    """Liste de toutes les notes"""
-    notes = Note.query.order_by(Note.date_ajout.desc()).all()
-    return render_template('enseignant/notes.html', notes=notes)
+    """Liste des notes, de la plus récente à la plus ancienne, paginée par curseur"""
+    filtres = FiltreNotesForm(request.args, meta={'csrf': False})
+    referentiel = referentiels.lire()
+    filtres.classe_id.choices = referentiel.choix_classes((0, 'Toutes les classes'))
+    filtres.matiere_id.choices = referentiel.choix_matieres((0, 'Toutes les matières'))
+    
+    # Une seule requête par page : colonnes affichées et jointures explicites
+    requete = db.session.query(
+        Note.id, Note.valeur, Note.type_evaluation, Note.date_ajout,
+        Etudiant.nom.label('etudiant_nom'), Etudiant.prenom.label('etudiant_prenom'),
+        Matiere.nom.label('matiere_nom')
+    ).join(Etudiant, Note.etudiant_id == Etudiant.id).join(Matiere, Note.matiere_id == Matiere.id)
+    
+    if filtres.validate():
+        requete = filtrer_notes(requete, filtres)
+    
+    notes, suivant = paginer(requete, [Note.date_ajout, Note.id], request.args.get('apres'),
+                             current_app.config['TAILLE_PAGE'], descendant=True)
+    
+    return render_template('enseignant/notes.html', notes=notes, filtres=filtres, suivant=suivant)
 
 
 @bp.route('/note/ajouter', methods=['GET', 'POST'])
@@ -23,9 +47,8 @@ def ajouter_note():
     """Ajouter une nouvelle note"""
     form = NoteForm()
     
-    # Charger les étudiants et matières pour les SelectField
-    form.etudiant_id.choices = [(e.id, f'{e.matricule} - {e.prenom} {e.nom}') for e in Etudiant.query.all()]
-    form.matiere_id.choices = [(m.id, m.nom) for m in Matiere.query.all()]
+    # Seules les matières sont proposées en liste ; l'étudiant est cherché par autocomplétion
+    form.matiere_id.choices = referentiels.lire().choix_matieres()
     
     if form.validate_on_submit():
         try:
@@ -38,10 +61,11 @@ def ajouter_note():
             )
             
             db.session.add(note)
+            enregistrer_notes(ajouts=[(note.etudiant_id, note.matiere_id, note.valeur)])
             db.session.commit()
             
-            etudiant = Etudiant.query.get(form.etudiant_id.data)
-            matiere = Matiere.query.get(form.matiere_id.data)
+            etudiant = form.etudiant  # chargé par la validation du formulaire
+            matiere = referentiels.lire().matieres[form.matiere_id.data]
             
             flash(f'Note de {note.valeur}/20 ajoutée pour {etudiant.prenom} {etudiant.nom} en {matiere.nom}', 'success')
             return redirect(url_for('enseignant.liste_notes'))
@@ -52,6 +76,114 @@ def ajouter_note():
     return render_template('enseignant/note_form.html', form=form, titre='Ajouter une note')
 
 
+@bp.route('/notes/saisie-classe', methods=['GET', 'POST'])
+@login_required
+@role_required('enseignant')
+def saisie_notes_classe():
+    """Saisir en une fois les notes de toute une classe pour une évaluation
+
+    La grille est préremplie avec les notes déjà saisies pour cette matière
+    et ce type d'évaluation : les soumettre de nouveau modifie ces notes au
+    lieu d'en ajouter une seconde.
+    """
+    # Le choix de la classe et de la matière passe par l'URL (formulaire GET)
+    selection = SaisieGrilleForm(request.args, meta={'csrf': False})
+    referentiel = referentiels.lire()
+    selection.classe_id.choices = referentiel.choix_classes()
+    selection.matiere_id.choices = referentiel.choix_matieres()
+    
+    if 'classe_id' not in request.args or not selection.validate():
+        return render_template('enseignant/saisie_notes.html', selection=selection, etudiants=None)
+    
+    etudiants = db.session.query(
+        Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom
+    ).filter_by(classe_id=selection.classe_id.data).order_by(Etudiant.nom, Etudiant.prenom).all()
+    
+    # Note existante de chaque étudiant pour cette évaluation (la plus récente s'il y en a plusieurs)
+    existantes = {
+        etudiant_id: (note_id, valeur)
+        for note_id, etudiant_id, valeur in db.session.query(Note.id, Note.etudiant_id, Note.valeur).join(
+            Etudiant, Note.etudiant_id == Etudiant.id
+        ).filter(
+            Etudiant.classe_id == selection.classe_id.data,
+            Note.matiere_id == selection.matiere_id.data,
+            Note.type_evaluation == selection.type_evaluation.data
+        ).order_by(Note.id)
+    }
+    
+    grille = FlaskForm()
+    valeurs = {etudiant_id: f'{valeur:g}' for etudiant_id, (_, valeur) in existantes.items()}
+    erreurs = {}
+    
+    if grille.validate_on_submit():
+        notes = []
+        modifications = []
+        for etudiant in etudiants:
+            saisie = request.form.get(f'note_{etudiant.id}', '').strip().replace(',', '.')
+            valeurs[etudiant.id] = saisie
+            
+            # Case vide : pas de note pour cet étudiant
+            if not saisie:
+                continue
+            
+            try:
+                valeur = float(saisie)
+            except ValueError:
+                erreurs[etudiant.id] = 'Nombre attendu'
+                continue
+            
+            if not 0 <= valeur <= 20:
+                erreurs[etudiant.id] = 'La note doit être entre 0 et 20'
+                continue
+            
+            if etudiant.id in existantes:
+                note_id, ancienne = existantes[etudiant.id]
+                if valeur != ancienne:
+                    modifications.append({'note_id': note_id, 'etudiant_id': etudiant.id,
+                                          'ancienne': ancienne, 'nouvelle': valeur})
+                continue
+            
+            notes.append({
+                'etudiant_id': etudiant.id,
+                'matiere_id': selection.matiere_id.data,
+                'valeur': valeur,
+                'type_evaluation': selection.type_evaluation.data
+            })
+        
+        if erreurs:
+            flash(f'{len(erreurs)} note(s) invalide(s) : aucune note n\'a été enregistrée.', 'danger')
+        elif not notes and not modifications:
+            flash('Aucune note saisie ou modifiée.', 'warning')
+        else:
+            # Une mise à jour groupée, une insertion groupée et une seule transaction pour toute la grille
+            matiere_id = selection.matiere_id.data
+            if modifications:
+                table = Note.__table__
+                db.session.execute(
+                    table.update().where(table.c.id == bindparam('note_id')).values(valeur=bindparam('nouvelle')),
+                    modifications
+                )
+            if notes:
+                db.session.execute(Note.__table__.insert(), notes)
+            enregistrer_notes(
+                ajouts=[(n['etudiant_id'], matiere_id, n['valeur']) for n in notes] +
+                       [(m['etudiant_id'], matiere_id, m['nouvelle']) for m in modifications],
+                retraits=[(m['etudiant_id'], matiere_id, m['ancienne']) for m in modifications]
+            )
+            ajuster_notes_ajoutees(len(notes))
+            db.session.commit()
+            
+            flash(f'{len(notes)} note(s) ajoutée(s) et {len(modifications)} modifiée(s) pour la classe.', 'success')
+            return redirect(url_for('enseignant.liste_notes'))
+    
+    return render_template('enseignant/saisie_notes.html',
+                         selection=selection,
+                         grille=grille,
+                         etudiants=etudiants,
+                         valeurs=valeurs,
+                         erreurs=erreurs)
+
+
 @bp.route('/note/modifier/<int:id>', methods=['GET', 'POST'])
 @login_required
 @role_required('enseignant')
@@ -60,12 +192,13 @@ def modifier_note(id):
     note = Note.query.get_or_404(id)
     form = NoteForm(obj=note)
     
-    # Charger les étudiants et matières
-    form.etudiant_id.choices = [(e.id, f'{e.matricule} - {e.prenom} {e.nom}') for e in Etudiant.query.all()]
-    form.matiere_id.choices = [(m.id, m.nom) for m in Matiere.query.all()]
+    # Seules les matières sont proposées en liste ; l'étudiant est cherché par autocomplétion
+    form.matiere_id.choices = referentiels.lire().choix_matieres()
     
     if form.validate_on_submit():
         try:
+            ancienne = (note.etudiant_id, note.matiere_id, note.valeur)
+            
             note.etudiant_id = form.etudiant_id.data
             note.matiere_id = form.matiere_id.data
             note.valeur = form.valeur.data
@@ -76,6 +209,7 @@ def modifier_note(id):
             if note.valeur < 0 or note.valeur > 20:
                 raise ValueError("La note doit être entre 0 et 20")
             
+            enregistrer_notes(ajouts=[(note.etudiant_id, note.matiere_id, note.valeur)], retraits=[ancienne])
             db.session.commit()
             
             flash('Note modifiée avec succès !', 'success')
@@ -88,12 +222,14 @@ def modifier_note(id):
 
 
 @bp.route('/note/supprimer/<int:id>')
+@ecriture
 @login_required
 @role_required('enseignant')
 def supprimer_note(id):
     """Supprimer une note"""
     note = Note.query.get_or_404(id)
     
+    enregistrer_notes(retraits=[(note.etudiant_id, note.matiere_id, note.valeur)])
     db.session.delete(note)
     db.session.commit()
     
@@ -105,17 +241,45 @@ def supprimer_note(id):
 @login_required
 @role_required('enseignant')
 def notes_par_classe(classe_id):
-    """Afficher les notes d'une classe"""
+    """Résultats et classement des étudiants d'une classe"""
     classe = Classe.query.get_or_404(classe_id)
-    etudiants = classe.etudiants
+    classement = classement_classe(classe.id)
+    matieres = sorted({nom for entree in classement for nom in entree['matieres']})
     
-    return render_template('enseignant/notes_classe.html', classe=classe, etudiants=etudiants)
+    return render_template('enseignant/notes_classe.html', classe=classe, classement=classement, matieres=matieres)
+
+
+@bp.route('/classe/<int:classe_id>/classement')
+@login_required
+@role_required('enseignant')
+def classement_json(classe_id):
+    """Classement d'une classe (JSON)"""
+    classe = Classe.query.get_or_404(classe_id)
+    return jsonify({'classe': {'id': classe.id, 'nom': classe.nom}, 'classement': classement_classe(classe.id)})
 
 
 @bp.route('/etudiants')
 @login_required
 @role_required('enseignant')
 def liste_etudiants():
-    """Liste des étudiants pour l'enseignant"""
-    etudiants = Etudiant.query.all()
-    return render_template('enseignant/etudiants.html', etudiants=etudiants)
+    """Liste des étudiants pour l'enseignant, paginée par curseur"""
+    filtres = FiltreEtudiantsForm(request.args, meta={'csrf': False})
+    filtres.classe_id.choices = referentiels.lire().choix_classes((0, 'Toutes les classes'))
+    
+    # Nombre de notes lu dans le cumul par matière, uniquement pour les lignes de la page
+    nombre_notes = db.session.query(func.coalesce(func.sum(MoyenneMatiere.nombre), 0)).filter(
+        MoyenneMatiere.etudiant_id == Etudiant.id
+    ).scalar_subquery()
+    
+    requete = db.session.query(
+        Etudiant.id, Etudiant.matricule, Etudiant.nom, Etudiant.prenom,
+        Classe.nom.label('classe_nom'), nombre_notes.label('nombre_notes')
+    ).outerjoin(Classe, Etudiant.classe_id == Classe.id)
+    
+    if filtres.validate() and filtres.classe_id.data:
+        requete = requete.filter(Etudiant.classe_id == filtres.classe_id.data)
+    
+    etudiants, suivant = paginer(requete, [Etudiant.nom, Etudiant.prenom, Etudiant.id],
+                                 request.args.get('apres'), current_app.config['TAILLE_PAGE'])
+    
+    return render_template('enseignant/etudiants.html', etudiants=etudiants, filtres=filtres, suivant=suivant)
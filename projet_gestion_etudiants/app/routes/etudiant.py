@@ -1,13 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, redirect, url_for, flash, send_file, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Etudiant, Note, Matiere
-from app.utils import role_required
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-import io
-from datetime import datetime
+from app.utils import role_required, etudiant_courant, etag_etudiant, reponse_si_inchangee, avec_etag
+from app.calculs import resultats_etudiant, ajouter_detail_notes
+from app.deliberations import resultats_bulletins
+from app.bulletins import donnees_bulletin, file_bulletins
+from app.referentiels import referentiels
+from concurrent.futures import TimeoutError
 
 bp = Blueprint('etudiant', __name__, url_prefix='/etudiant')
 
@@ -16,40 +16,27 @@ bp = Blueprint('etudiant', __name__, url_prefix='/etudiant')
 @role_required('etudiant')
 def mes_notes():
     """Afficher les notes de l'étudiant connecté"""
-    # Trouver l'étudiant correspondant à l'utilisateur
-    etudiant = Etudiant.query.filter_by(
-        nom=current_user.nom,
-        prenom=current_user.prenom
-    ).first()
+    # Fiche étudiant liée au compte
+    etudiant = etudiant_courant()
     
     if not etudiant:
         flash('Aucun profil étudiant trouvé pour cet utilisateur.', 'warning')
         return redirect(url_for('main.dashboard'))
     
-    # Grouper les notes par matière
-    notes_par_matiere = {}
-    for note in etudiant.notes:
-        if note.matiere.nom not in notes_par_matiere:
-            notes_par_matiere[note.matiere.nom] = {
-                'matiere': note.matiere,
-                'notes': [],
-                'moyenne': 0
-            }
-        notes_par_matiere[note.matiere.nom]['notes'].append(note)
+    # Rien n'a changé depuis le dernier affichage : 304 sans calculer les moyennes
+    etag = etag_etudiant(etudiant)
+    reponse = reponse_si_inchangee(etag)
+    if reponse:
+        return reponse
     
-    # Calculer les moyennes par matière
-    for matiere_nom, data in notes_par_matiere.items():
-        notes_valeurs = [n.valeur for n in data['notes']]
-        data['moyenne'] = round(sum(notes_valeurs) / len(notes_valeurs), 2) if notes_valeurs else 0
+    # Moyennes et crédits calculés en une requête, puis détail des notes
+    resultat = ajouter_detail_notes(etudiant, resultats_etudiant(etudiant))
     
-    moyenne_generale = etudiant.calculer_moyenne_generale()
-    credits_valides = etudiant.calculer_credits_valides()
-    
-    return render_template('etudiant/mes_notes.html',
-                         etudiant=etudiant,
-                         notes_par_matiere=notes_par_matiere,
-                         moyenne_generale=moyenne_generale,
-                         credits_valides=credits_valides)
+    return avec_etag(render_template('etudiant/mes_notes.html',
+                                     etudiant=etudiant,
+                                     notes_par_matiere=resultat['matieres'],
+                                     moyenne_generale=resultat['moyenne_generale'],
+                                     credits_valides=resultat['credits_valides']), etag)
 
 
 @bp.route('/bulletin')
@@ -57,147 +44,51 @@ def mes_notes():
 @role_required('etudiant')
 def bulletin():
     """Afficher le bulletin de l'étudiant"""
-    # Trouver l'étudiant correspondant
-    etudiant = Etudiant.query.filter_by(
-        nom=current_user.nom,
-        prenom=current_user.prenom
-    ).first()
+    etudiant = etudiant_courant()
     
     if not etudiant:
         flash('Aucun profil étudiant trouvé.', 'warning')
         return redirect(url_for('main.dashboard'))
     
-    # Grouper les notes par matière
-    notes_par_matiere = {}
-    for note in etudiant.notes:
-        if note.matiere.nom not in notes_par_matiere:
-            notes_par_matiere[note.matiere.nom] = {
-                'matiere': note.matiere,
-                'notes': [],
-                'moyenne': 0,
-                'valide': False
-            }
-        notes_par_matiere[note.matiere.nom]['notes'].append(note)
-    
-    # Calculer les moyennes et validation
-    for matiere_nom, data in notes_par_matiere.items():
-        notes_valeurs = [n.valeur for n in data['notes']]
-        moyenne = sum(notes_valeurs) / len(notes_valeurs) if notes_valeurs else 0
-        data['moyenne'] = round(moyenne, 2)
-        data['valide'] = moyenne >= 10
-    
-    moyenne_generale = etudiant.calculer_moyenne_generale()
-    credits_valides = etudiant.calculer_credits_valides()
-    
-    return render_template('etudiant/bulletin.html',
-                         etudiant=etudiant,
-                         notes_par_matiere=notes_par_matiere,
-                         moyenne_generale=moyenne_generale,
-                         credits_valides=credits_valides)
+    etag = etag_etudiant(etudiant)
+    reponse = reponse_si_inchangee(etag)
+    if reponse:
+        return reponse
+    
+    # Résultats figés de la dernière délibération, ou calculés si l'étudiant n'a pas été délibéré
+    resultat = resultats_bulletins([etudiant.id])[etudiant.id]
+    
+    return avec_etag(render_template('etudiant/bulletin.html',
+                                     etudiant=etudiant,
+                                     notes_par_matiere=resultat['matieres'],
+                                     moyenne_generale=resultat['moyenne_generale'],
+                                     credits_valides=resultat['credits_valides'],
+                                     decision=resultat.get('decision'),
+                                     deliberation=resultat.get('deliberation')), etag)
 
 
 @bp.route('/bulletin/pdf')
 @login_required
 @role_required('etudiant')
 def bulletin_pdf():
-    """Générer et télécharger le bulletin en PDF"""
-    # Trouver l'étudiant
-    etudiant = Etudiant.query.filter_by(
-        nom=current_user.nom,
-        prenom=current_user.prenom
-    ).first()
+    """Télécharger le bulletin en PDF (rendu en arrière-plan, servi depuis le cache s'il est à jour)"""
+    etudiant = etudiant_courant()
     
     if not etudiant:
         flash('Aucun profil étudiant trouvé.', 'warning')
         return redirect(url_for('main.dashboard'))
     
-    # Créer le PDF en mémoire
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    
-    # En-tête
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width/2, height - 2*cm, "BULLETIN DE NOTES")
-    
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(width/2, height - 3*cm, "Année Universitaire 2024-2025")
-    
-    # Informations étudiant
-    y = height - 5*cm
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(2*cm, y, "Informations de l'étudiant")
-    
-    y -= 1*cm
-    c.setFont("Helvetica", 12)
-    c.drawString(2*cm, y, f"Nom: {etudiant.nom}")
-    y -= 0.7*cm
-    c.drawString(2*cm, y, f"Prénom: {etudiant.prenom}")
-    y -= 0.7*cm
-    c.drawString(2*cm, y, f"Matricule: {etudiant.matricule}")
-    y -= 0.7*cm
-    if etudiant.classe:
-        c.drawString(2*cm, y, f"Classe: {etudiant.classe.nom}")
-        y -= 0.7*cm
-    
-    # Notes par matière
-    y -= 1*cm
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(2*cm, y, "Notes par matière")
-    
-    y -= 1*cm
-    c.setFont("Helvetica", 10)
-    
-    # Grouper les notes
-    notes_par_matiere = {}
-    for note in etudiant.notes:
-        if note.matiere.nom not in notes_par_matiere:
-            notes_par_matiere[note.matiere.nom] = {
-                'matiere': note.matiere,
-                'notes': []
-            }
-        notes_par_matiere[note.matiere.nom]['notes'].append(note.valeur)
-    
-    # Afficher chaque matière
-    for matiere_nom, data in sorted(notes_par_matiere.items()):
-        moyenne = sum(data['notes']) / len(data['notes'])
-        matiere = data['matiere']
-        
-        c.drawString(2*cm, y, f"{matiere_nom}")
-        c.drawString(10*cm, y, f"Coef: {matiere.coefficient}")
-        c.drawString(13*cm, y, f"Moyenne: {moyenne:.2f}/20")
-        c.drawString(17*cm, y, f"Crédits: {matiere.credit if moyenne >= 10 else 0}/{matiere.credit}")
-        
-        y -= 0.7*cm
-        
-        if y < 3*cm:  # Nouvelle page si nécessaire
-            c.showPage()
-            y = height - 2*cm
-            c.setFont("Helvetica", 10)
-    
-    # Résumé
-    y -= 1*cm
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(2*cm, y, "Résumé")
-    
-    y -= 1*cm
-    c.setFont("Helvetica", 12)
-    moyenne_generale = etudiant.calculer_moyenne_generale()
-    credits_valides = etudiant.calculer_credits_valides()
-    
-    c.drawString(2*cm, y, f"Moyenne générale: {moyenne_generale if moyenne_generale else 'N/A'}/20")
-    y -= 0.8*cm
-    c.drawString(2*cm, y, f"Crédits validés: {credits_valides}/60")
-    
-    # Pied de page
-    c.setFont("Helvetica", 10)
-    c.drawString(2*cm, 2*cm, f"Édité le {datetime.now().strftime('%d/%m/%Y à %H:%M')}")
+    resultat = resultats_bulletins([etudiant.id])[etudiant.id]
+    donnees = donnees_bulletin(etudiant, resultat, referentiels.lire().nom_classe(etudiant.classe_id))
     
-    c.save()
+    try:
+        chemin = file_bulletins.demander(etudiant.id, donnees).result(timeout=current_app.config['BULLETINS_ATTENTE'])
+    except TimeoutError:
+        # Le rendu continue : la page se recharge et le PDF sera servi depuis le cache
+        return render_template('etudiant/bulletin_attente.html'), 202
     
-    buffer.seek(0)
     return send_file(
-        buffer,
+        chemin,
         mimetype='application/pdf',
         as_attachment=True,
         download_name=f'bulletin_{etudiant.matricule}.pdf'
@@ -1,6 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from app.models import Etudiant, Classe, Matiere, Note
+from app.forms import FiltreStatistiquesForm
+from app.statistiques import statistiques_matieres
+from app.recherche import rechercher_etudiants
+from app.calculs import resultats_etudiant
+from app.compteurs import lire_compteurs
+from app.referentiels import referentiels
+from app.utils import role_required, etudiant_courant, etag_etudiant, reponse_si_inchangee, avec_etag
 
 bp = Blueprint('main', __name__)
 
@@ -17,44 +23,92 @@ def index():
 def dashboard():
     """Dashboard personnalisé selon le rôle"""
     
-    if current_user.role == 'admin':
-        # Statistiques pour l'admin
-        total_etudiants = Etudiant.query.count()
-        total_classes = Classe.query.count()
-        total_matieres = Matiere.query.count()
-        total_notes = Note.query.count()
-        
-        return render_template('dashboard.html',
-                             total_etudiants=total_etudiants,
-                             total_classes=total_classes,
-                             total_matieres=total_matieres,
-                             total_notes=total_notes)
-    
-    elif current_user.role == 'enseignant':
-        # Statistiques pour l'enseignant
-        total_etudiants = Etudiant.query.count()
-        total_notes = Note.query.count()
-        
-        return render_template('dashboard.html',
-                             total_etudiants=total_etudiants,
-                             total_notes=total_notes)
+    if current_user.role in ('admin', 'enseignant'):
+        # Statistiques lues dans la table des compteurs (une seule requête)
+        return render_template('dashboard.html', compteurs=lire_compteurs())
     
     elif current_user.role == 'etudiant':
         # Informations pour l'étudiant
-        # Trouver l'étudiant correspondant
-        etudiant = Etudiant.query.filter_by(nom=current_user.nom, prenom=current_user.prenom).first()
+        # Fiche étudiant liée au compte
+        etudiant = etudiant_courant()
         
         if etudiant:
-            moyenne_generale = etudiant.calculer_moyenne_generale()
-            credits_valides = etudiant.calculer_credits_valides()
-            total_notes = len(etudiant.notes)
+            etag = etag_etudiant(etudiant)
+            reponse = reponse_si_inchangee(etag)
+            if reponse:
+                return reponse
             
-            return render_template('dashboard.html',
-                                 etudiant=etudiant,
-                                 moyenne_generale=moyenne_generale,
-                                 credits_valides=credits_valides,
-                                 total_notes=total_notes)
+            resultat = resultats_etudiant(etudiant)
+            
+            return avec_etag(render_template('dashboard.html',
+                                             etudiant=etudiant,
+                                             moyenne_generale=resultat['moyenne_generale'],
+                                             credits_valides=resultat['credits_valides'],
+                                             total_notes=resultat['total_notes']), etag)
         
         return render_template('dashboard.html')
     
     return render_template('dashboard.html')
+
+
+# ========== STATISTIQUES ==========
+
+def _filtres_statistiques():
+    """Formulaire du périmètre des statistiques, rempli depuis l'URL"""
+    filtres = FiltreStatistiquesForm(request.args, meta={'csrf': False})
+    referentiel = referentiels.lire()
+    filtres.classe_id.choices = referentiel.choix_classes((0, 'Toutes les classes'))
+    filtres.filiere_id.choices = referentiel.choix_filieres((0, 'Toutes les filières'))
+    return filtres
+
+
+def _perimetre(filtres):
+    """Arguments de statistiques_matieres tirés des filtres validés"""
+    return {
+        'classe_id': filtres.classe_id.data or None,
+        'filiere_id': filtres.filiere_id.data or None,
+        'date_debut': filtres.date_debut.data,
+        'date_fin': filtres.date_fin.data
+    }
+
+
+@bp.route('/statistiques')
+@login_required
+@role_required('admin', 'enseignant')
+def statistiques():
+    """Statistiques par matière : distribution des moyennes, réussite et corrélations"""
+    filtres = _filtres_statistiques()
+    perimetre = {}
+    if request.args:
+        if filtres.validate():
+            perimetre = _perimetre(filtres)
+        else:
+            flash('Filtres invalides : statistiques de tous les étudiants.', 'warning')
+    
+    return render_template('statistiques.html', filtres=filtres, statistiques=statistiques_matieres(**perimetre))
+
+
+@bp.route('/statistiques/donnees')
+@login_required
+@role_required('admin', 'enseignant')
+def statistiques_json():
+    """Statistiques par matière (JSON)"""
+    filtres = _filtres_statistiques()
+    if not filtres.validate():
+        return jsonify({'erreurs': filtres.errors}), 400
+    
+    return jsonify(statistiques_matieres(**_perimetre(filtres)))
+
+
+# ========== RECHERCHE ==========
+
+@bp.route('/etudiants/recherche')
+@login_required
+@role_required('admin', 'enseignant')
+def recherche_etudiants():
+    """Étudiants correspondant à une saisie, les plus pertinents d'abord (JSON, autocomplétion)"""
+    limite = request.args.get('limite', current_app.config['RECHERCHE_LIMITE'], type=int)
+    limite = max(1, min(limite, current_app.config['RECHERCHE_LIMITE_MAX']))
+    return jsonify({'etudiants': rechercher_etudiants(
+        request.args.get('q', ''), limite, current_app.config['RECHERCHE_CANDIDATS']
+    )})
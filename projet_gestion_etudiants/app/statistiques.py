@@ -0,0 +1,144 @@
+from app import db
+from app.models import Etudiant, Classe, Note, MoyenneMatiere
+from app.calculs import SEUIL_VALIDATION
+from app.referentiels import referentiels
+from sqlalchemy import func, select
+from datetime import timedelta
+import itertools
+import numpy as np
+
+CENTILES = (10, 25, 50, 75, 90)
+# Histogramme des moyennes : tranches de 2 points de 0 à 20 (20 compte dans la dernière)
+BORNES_HISTOGRAMME = np.arange(0, 21, 2)
+
+
+def _requete_moyennes(classe_id=None, filiere_id=None, date_debut=None, date_fin=None):
+    """Moyenne de chaque étudiant dans chaque matière : (etudiant_id, matiere_id, moyenne)
+
+    Sans période, les moyennes sont lues dans le cumul par matière (une
+    ligne par étudiant et par matière, sans parcourir les notes). Avec une
+    période, elles sont calculées par la base sur les notes de la période.
+    """
+    if date_debut or date_fin:
+        requete = select(Note.etudiant_id, Note.matiere_id, func.avg(Note.valeur)).join(
+            Etudiant, Note.etudiant_id == Etudiant.id
+        )
+        if date_debut:
+            requete = requete.where(Note.date_ajout >= date_debut)
+        if date_fin:
+            requete = requete.where(Note.date_ajout < date_fin + timedelta(days=1))
+        requete = requete.group_by(Note.etudiant_id, Note.matiere_id)
+    else:
+        requete = select(MoyenneMatiere.etudiant_id, MoyenneMatiere.matiere_id, MoyenneMatiere.moyenne).join(
+            Etudiant, MoyenneMatiere.etudiant_id == Etudiant.id
+        )
+
+    if classe_id:
+        requete = requete.where(Etudiant.classe_id == classe_id)
+    if filiere_id:
+        requete = requete.where(Etudiant.classe_id.in_(select(Classe.id).where(Classe.filiere_id == filiere_id)))
+    return requete
+
+
+def charger_moyennes(**filtres):
+    """Charger les moyennes en une requête dans un tableau NumPy (n, 3)
+
+    Les lignes passent directement du curseur au tableau (np.fromiter) :
+    aucun objet ni dictionnaire Python par ligne.
+    """
+    resultat = db.session.execute(_requete_moyennes(**filtres))
+    valeurs = np.fromiter(itertools.chain.from_iterable(resultat), dtype=np.float64)
+    return valeurs.reshape(-1, 3)
+
+
+def _correlations(matrice):
+    """Corrélation de Pearson entre les colonnes, sur les lignes où les deux valeurs existent
+
+    Toutes les sommes par paire de matières sont obtenues par produits
+    matriciels ; une corrélation sur moins de 3 étudiants vaut NaN.
+    """
+    presence = (~np.isnan(matrice)).astype(np.float64)
+    x = np.nan_to_num(matrice)
+
+    n = presence.T @ presence
+    somme_x = x.T @ presence
+    somme_y = somme_x.T
+    somme_xx = (x * x).T @ presence
+    somme_yy = somme_xx.T
+    somme_xy = x.T @ x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = n * somme_xy - somme_x * somme_y
+        variance = (n * somme_xx - somme_x ** 2) * (n * somme_yy - somme_y ** 2)
+        correlations = covariance / np.sqrt(variance)
+    correlations[(n < 3) | ~(variance > 0)] = np.nan
+    return correlations
+
+
+def _arrondi(valeur, chiffres=2):
+    """Nombre JSON : None pour NaN"""
+    return None if np.isnan(valeur) else round(float(valeur), chiffres)
+
+
+def statistiques_matieres(classe_id=None, filiere_id=None, date_debut=None, date_fin=None):
+    """Statistiques par matière des moyennes des étudiants d'une classe, d'une filière ou de tous
+
+    Moyenne, médiane, écart type, centiles, taux de réussite (moyenne ≥
+    SEUIL_VALIDATION) et histogramme de chaque matière, et corrélation des
+    moyennes entre matières. Tous les calculs sont vectoriels : le coût en
+    Python ne dépend que du nombre de matières.
+    """
+    lignes = charger_moyennes(classe_id=classe_id, filiere_id=filiere_id, date_debut=date_debut, date_fin=date_fin)
+    statistiques = {
+        'etudiants': 0,
+        'seuil_validation': SEUIL_VALIDATION,
+        'bornes_histogramme': BORNES_HISTOGRAMME.tolist(),
+        'matieres': [],
+        'correlations': []
+    }
+    if not len(lignes):
+        return statistiques
+
+    # Matrice étudiants x matières, NaN pour une matière sans note
+    etudiant_ids, lignes_etudiants = np.unique(lignes[:, 0], return_inverse=True)
+    matiere_ids, colonnes = np.unique(lignes[:, 1].astype(np.int64), return_inverse=True)
+    moyennes = lignes[:, 2]
+    matrice = np.full((len(etudiant_ids), len(matiere_ids)), np.nan)
+    matrice[lignes_etudiants, colonnes] = moyennes
+
+    # Effectif, réussites et histogramme : comptages sur les lignes, sans passer par la matrice
+    effectifs = np.bincount(colonnes, minlength=len(matiere_ids))
+    reussites = np.bincount(colonnes, weights=moyennes >= SEUIL_VALIDATION, minlength=len(matiere_ids))
+    tranches = np.clip(np.searchsorted(BORNES_HISTOGRAMME, moyennes, side='right') - 1, 0, len(BORNES_HISTOGRAMME) - 2)
+    histogrammes = np.bincount(
+        colonnes * (len(BORNES_HISTOGRAMME) - 1) + tranches,
+        minlength=len(matiere_ids) * (len(BORNES_HISTOGRAMME) - 1)
+    ).reshape(len(matiere_ids), -1)
+
+    # Chaque colonne a au moins une valeur : pas de tranche vide pour les fonctions nan*
+    moyenne = np.nanmean(matrice, axis=0)
+    ecart_type = np.nanstd(matrice, axis=0)
+    centiles = np.nanpercentile(matrice, CENTILES, axis=0)
+    minimum = np.nanmin(matrice, axis=0)
+    maximum = np.nanmax(matrice, axis=0)
+    correlations = _correlations(matrice)
+
+    noms = {matiere.id: matiere.nom for matiere in referentiels.lire().matieres.values()}
+    for j, matiere_id in enumerate(matiere_ids.tolist()):
+        statistiques['matieres'].append({
+            'id': matiere_id,
+            'nom': noms.get(matiere_id, str(matiere_id)),
+            'effectif': int(effectifs[j]),
+            'moyenne': _arrondi(moyenne[j]),
+            'mediane': _arrondi(centiles[CENTILES.index(50), j]),
+            'ecart_type': _arrondi(ecart_type[j]),
+            'minimum': _arrondi(minimum[j]),
+            'maximum': _arrondi(maximum[j]),
+            'centiles': {str(p): _arrondi(centiles[i, j]) for i, p in enumerate(CENTILES)},
+            'taux_reussite': _arrondi(reussites[j] / effectifs[j], 4),
+            'histogramme': histogrammes[j].tolist()
+        })
+
+    statistiques['etudiants'] = len(etudiant_ids)
+    statistiques['correlations'] = [[_arrondi(c) for c in ligne] for ligne in correlations.tolist()]
+    return statistiques
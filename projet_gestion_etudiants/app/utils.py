@@ -1,8 +1,12 @@
 from app import db
 from app.models import Utilisateur, Matiere, Filiere, Classe
 from functools import wraps
-from flask import flash, redirect, url_for
+from flask import flash, redirect, url_for, session, request, current_app, make_response
 from flask_login import current_user
+from sqlalchemy import tuple_, func, DateTime
+from datetime import datetime
+import base64
+import json
 
 def init_data():
     """Initialiser la base de données avec des données de base"""
@@ -84,8 +88,8 @@ def init_data():
     print("Base de données initialisée avec succès!")
 
 
-def role_required(role):
-    """Décorateur pour vérifier le rôle de l'utilisateur"""
+def role_required(*roles):
+    """Décorateur pour vérifier le rôle de l'utilisateur (un des rôles donnés)"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
@@ -93,7 +97,7 @@ def role_required(role):
                 flash('Veuillez vous connecter.', 'danger')
                 return redirect(url_for('auth.login'))
             
-            if current_user.role != role:
+            if current_user.role not in roles:
                 flash('Vous n\'avez pas accès à cette page.', 'danger')
                 return redirect(url_for('main.dashboard'))
             
@@ -102,6 +106,85 @@ def role_required(role):
     return decorator
 
 
+def etudiant_courant():
+    """Fiche étudiant de l'utilisateur connecté (recherche par clé primaire) ou None"""
+    from app.models import Etudiant
+    
+    # Identifiant résolu à la connexion et gardé dans la session
+    etudiant_id = session.get('etudiant_id') or current_user.etudiant_id
+    if not etudiant_id:
+        return None
+    return db.session.get(Etudiant, etudiant_id)
+
+
+def etag_etudiant(etudiant):
+    """ETag des pages de notes d'un étudiant
+    
+    Il change quand la fiche ou les notes de l'étudiant changent (colonne
+    version) et quand une classe, une matière ou une filière est modifiée.
+    """
+    from app.referentiels import referentiels
+    
+    return f'e{etudiant.id}-v{etudiant.version}-r{referentiels.version()}-u{current_user.id}'
+
+
+def reponse_si_inchangee(etag):
+    """Réponse 304 si le client a déjà cette version de la page, sinon None
+    
+    À appeler avant tout calcul de moyennes. Pas de 304 quand des messages
+    flash attendent d'être affichés : la page n'est plus la même.
+    """
+    if '_flashes' in session or not request.if_none_match.contains(etag):
+        return None
+    return avec_etag(current_app.response_class(status=304), etag)
+
+
+def avec_etag(reponse, etag):
+    """Ajouter l'ETag à la réponse ; le navigateur revalide la page à chaque affichage"""
+    reponse = make_response(reponse)
+    reponse.set_etag(etag)
+    reponse.headers['Cache-Control'] = 'private, no-cache'
+    return reponse
+
+
+def lier_comptes_etudiants():
+    """Relier les comptes étudiants sans fiche à l'étudiant de même nom et prénom
+    
+    Un compte n'est relié que si un seul étudiant porte ce nom et ce prénom et
+    que cet étudiant n'a pas déjà de compte. Renvoie (nombre de comptes reliés,
+    comptes ambigus, comptes sans étudiant correspondant).
+    """
+    from app.models import Etudiant
+    
+    # Homonymes exclus : une seule fiche par (nom, prénom)
+    fiches_uniques = {
+        (nom, prenom): etudiant_id
+        for nom, prenom, etudiant_id in db.session.query(
+            Etudiant.nom, Etudiant.prenom, func.min(Etudiant.id)
+        ).group_by(Etudiant.nom, Etudiant.prenom).having(func.count(Etudiant.id) == 1)
+    }
+    homonymes = set(db.session.query(Etudiant.nom, Etudiant.prenom).group_by(
+        Etudiant.nom, Etudiant.prenom
+    ).having(func.count(Etudiant.id) > 1).all())
+    deja_lies = {e for (e,) in db.session.query(Utilisateur.etudiant_id).filter(Utilisateur.etudiant_id.isnot(None))}
+    
+    lies, ambigus, introuvables = 0, [], []
+    comptes = Utilisateur.query.filter(Utilisateur.role == 'etudiant', Utilisateur.etudiant_id.is_(None)).all()
+    for compte in comptes:
+        etudiant_id = fiches_uniques.get((compte.nom, compte.prenom))
+        if etudiant_id and etudiant_id not in deja_lies:
+            compte.etudiant_id = etudiant_id
+            deja_lies.add(etudiant_id)
+            lies += 1
+        elif etudiant_id or (compte.nom, compte.prenom) in homonymes:
+            ambigus.append(compte.login)
+        else:
+            introuvables.append(compte.login)
+    
+    db.session.commit()
+    return lies, ambigus, introuvables
+
+
 def generer_matricule():
     """Générer un matricule unique pour un étudiant"""
     from app.models import Etudiant
@@ -117,3 +200,50 @@ def generer_matricule():
         # Vérifier l'unicité
         if not Etudiant.query.filter_by(matricule=matricule).first():
             return matricule
+
+
+def encoder_curseur(valeurs):
+    """Encoder la clé de la dernière ligne d'une page en curseur opaque pour l'URL"""
+    valeurs = [v.isoformat() if isinstance(v, datetime) else v for v in valeurs]
+    return base64.urlsafe_b64encode(json.dumps(valeurs).encode()).decode()
+
+
+def decoder_curseur(curseur, colonnes):
+    """Décoder un curseur ; renvoie None s'il est absent ou invalide"""
+    if not curseur:
+        return None
+    
+    try:
+        valeurs = json.loads(base64.urlsafe_b64decode(curseur.encode()))
+        if len(valeurs) != len(colonnes):
+            return None
+        return [
+            datetime.fromisoformat(v) if isinstance(colonne.type, DateTime) else v
+            for colonne, v in zip(colonnes, valeurs)
+        ]
+    except (ValueError, TypeError):
+        return None
+
+
+def paginer(requete, colonnes, curseur, taille, descendant=False):
+    """Pagination par curseur (keyset) sur une clé de tri unique
+    
+    `colonnes` est la clé de tri, qui doit se terminer par une colonne unique
+    (l'id). La page suivante reprend après la dernière clé vue : le coût d'une
+    page ne dépend pas de sa position dans la table. Renvoie (lignes, curseur
+    de la page suivante ou None).
+    """
+    valeurs = decoder_curseur(curseur, colonnes)
+    if valeurs is not None:
+        cle = tuple_(*colonnes)
+        requete = requete.filter(cle < tuple_(*valeurs) if descendant else cle > tuple_(*valeurs))
+    
+    ordre = [c.desc() for c in colonnes] if descendant else colonnes
+    lignes = requete.order_by(*ordre).limit(taille + 1).all()
+    
+    suivant = None
+    if len(lignes) > taille:
+        lignes = lignes[:taille]
+        suivant = encoder_curseur([getattr(lignes[-1], c.key) for c in colonnes])
+    
+    return lignes, suivant
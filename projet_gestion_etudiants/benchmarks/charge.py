@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Routes mesurées pour chaque rôle : (libellé stable entre deux commits, URL) pour un GET,
+# (libellé, URL, données) pour un POST, où données construit le formulaire à partir des identifiants
+ROUTES = {
+    'anonyme': [
+        ('GET /', '/'),
+        ('GET /auth/login', '/auth/login'),
+    ],
+    'admin': [
+        ('GET /dashboard', '/dashboard'),
+        ('GET /admin/etudiants', '/admin/etudiants'),
+        ('GET /admin/etudiants?classe_id', '/admin/etudiants?classe_id={classe}'),
+        ('GET /admin/etudiant/modifier/<id>', '/admin/etudiant/modifier/{etudiant}'),
+        ('GET /admin/classes', '/admin/classes'),
+        ('GET /admin/matieres', '/admin/matieres'),
+        ('GET /admin/filieres', '/admin/filieres'),
+        ('GET /admin/utilisateurs', '/admin/utilisateurs'),
+        ('GET /admin/cache', '/admin/cache'),
+        ('GET /statistiques', '/statistiques'),
+        ('GET /statistiques/donnees', '/statistiques/donnees'),
+        ('GET /admin/notes/export', '/admin/notes/export'),
+        ('GET /admin/notes/export.csv?classe_id', '/admin/notes/export.csv?classe_id={classe}'),
+        ('GET /admin/deliberations', '/admin/deliberations'),
+        ('GET /etudiants/recherche', '/etudiants/recherche?q={recherche}'),
+        ('GET /admin/etudiants?q', '/admin/etudiants?q={recherche}'),
+    ],
+    'enseignant': [
+        ('GET /dashboard', '/dashboard'),
+        ('GET /enseignant/notes', '/enseignant/notes'),
+        ('GET /enseignant/notes?classe_id', '/enseignant/notes?classe_id={classe}'),
+        ('GET /enseignant/note/ajouter', '/enseignant/note/ajouter'),
+        ('GET /enseignant/note/modifier/<id>', '/enseignant/note/modifier/{note}'),
+        ('GET /enseignant/notes/saisie-classe',
+         '/enseignant/notes/saisie-classe?classe_id={classe}&matiere_id={matiere}&type_evaluation=Examen'),
+        ('GET /enseignant/etudiants', '/enseignant/etudiants'),
+        ('GET /enseignant/classe/<id>/notes', '/enseignant/classe/{classe}/notes'),
+        ('GET /enseignant/classe/<id>/classement', '/enseignant/classe/{classe}/classement'),
+        ('GET /statistiques?classe_id', '/statistiques?classe_id={classe}'),
+        ('GET /etudiants/recherche', '/etudiants/recherche?q={recherche}'),
+        ('POST /enseignant/note/ajouter', '/enseignant/note/ajouter', lambda ids: {
+            'etudiant_id': ids['etudiant'], 'matiere_id': ids['matiere'], 'valeur': 12, 'type_evaluation': 'Examen'
+        }),
+        ('POST /enseignant/notes/saisie-classe',
+         '/enseignant/notes/saisie-classe?classe_id={classe}&matiere_id={matiere}&type_evaluation=Examen',
+         lambda ids: {f'note_{etudiant_id}': '12' for etudiant_id in ids['etudiants_classe']}),
+    ],
+    'etudiant': [
+        ('GET /dashboard', '/dashboard'),
+        ('GET /etudiant/mes-notes', '/etudiant/mes-notes'),
+        ('GET /etudiant/bulletin', '/etudiant/bulletin'),
+        ('GET /etudiant/bulletin/pdf', '/etudiant/bulletin/pdf'),
+    ],
+}
+
+# Comptes créés par init_data ; le compte étudiant est celui du premier étudiant généré
+COMPTES = {
+    'admin': ('admin', 'admin123'),
+    'enseignant': ('enseignant', 'enseignant123'),
+}
+MOT_DE_PASSE_ETUDIANTS = 'etudiant123'
+
+
+def centile(valeurs, p):
+    """Centile p (0-100) d'une liste triée, par la méthode du rang le plus proche"""
+    if not valeurs:
+        return None
+    rang = max(0, min(len(valeurs) - 1, int(round(p / 100 * len(valeurs))) - 1))
+    return valeurs[rang]
+
+
+def creer_application(dossier, **reglages):
+    """Créer l'application sur une base SQLite temporaire (`reglages` remplace des clés de Config)"""
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    from config import Config
+    from app import create_app
+
+    # L'URI est posée sur la classe : Config a pu être importée avant avec la vraie base
+    class ConfigBenchmark(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(dossier, 'benchmark.db')
+        BULLETINS_CACHE_DOSSIER = os.path.join(dossier, 'bulletins')
+        WTF_CSRF_ENABLED = False
+        DEBUG = False
+
+    for cle, valeur in reglages.items():
+        setattr(ConfigBenchmark, cle, valeur)
+    return create_app(ConfigBenchmark)
+
+
+def compter_requetes_sql(app):
+    """Compter les requêtes SQL exécutées par chaque fil, sur tous les moteurs"""
+    from sqlalchemy import event
+    from app import db
+
+    compteur = threading.local()
+
+    def _compter(*args):
+        compteur.valeur = getattr(compteur, 'valeur', 0) + 1
+
+    with app.app_context():
+        moteurs = [db.engine]
+    if app.extensions.get('moteur_lecture') is not None:
+        moteurs.append(app.extensions['moteur_lecture'])
+    for moteur in moteurs:
+        event.listen(moteur, 'before_cursor_execute', _compter)
+    return compteur
+
+
+def identifiants(app):
+    """Identifiants réels à substituer dans les URL"""
+    from app import db
+    from app.models import Etudiant, Matiere, Note, Utilisateur
+    from sqlalchemy import func
+
+    with app.app_context():
+        etudiant = db.session.query(Etudiant).join(
+            Utilisateur, Utilisateur.etudiant_id == Etudiant.id
+        ).order_by(Etudiant.id).first()
+        return {
+            'etudiant': etudiant.id,
+            'matricule': etudiant.matricule,
+            'recherche': etudiant.nom[:3],
+            'classe': etudiant.classe_id,
+            'etudiants_classe': [e for (e,) in db.session.query(Etudiant.id).filter_by(classe_id=etudiant.classe_id)],
+            'matiere': db.session.query(func.min(Matiere.id)).scalar(),
+            'note': db.session.query(func.max(Note.id)).scalar(),
+        }
+
+
+def client_connecte(app, comptes, role):
+    """Client de test connecté avec le compte du rôle"""
+    client = app.test_client()
+    if role in comptes:
+        login, mot_de_passe = comptes[role]
+        reponse = client.post('/auth/login', data={'login': login, 'password': mot_de_passe})
+        if reponse.status_code != 302:
+            raise RuntimeError(f'Connexion impossible pour le rôle {role} ({reponse.status_code})')
+    return client
+
+
+def mesurer_route(app, compteur, comptes, role, url, requetes, clients, echauffement, donnees=None):
+    """Appeler une route `requetes` fois depuis chaque client et mesurer latence et débit
+
+    Avec `donnees`, la route est appelée en POST avec ce formulaire (chaque
+    appel écrit en base).
+    """
+    latences = []
+    requetes_sql = []
+    statuts = {}
+    verrou = threading.Lock()
+    depart = threading.Barrier(clients)
+
+    def client():
+        c = client_connecte(app, comptes, role)
+        appeler = (lambda: c.post(url, data=donnees)) if donnees is not None else (lambda: c.get(url))
+        for _ in range(echauffement):
+            appeler()
+        depart.wait()
+        for _ in range(requetes):
+            compteur.valeur = 0
+            debut = time.perf_counter()
+            reponse = appeler()
+            reponse.get_data()
+            duree = time.perf_counter() - debut
+            with verrou:
+                latences.append(duree * 1000)
+                requetes_sql.append(compteur.valeur)
+                statuts[reponse.status_code] = statuts.get(reponse.status_code, 0) + 1
+
+    fils = [threading.Thread(target=client) for _ in range(clients)]
+    debut = time.perf_counter()
+    for f in fils:
+        f.start()
+    for f in fils:
+        f.join()
+    duree = time.perf_counter() - debut
+
+    latences.sort()
+    requetes_sql.sort()
+    return {
+        'p50_ms': round(centile(latences, 50), 2),
+        'p95_ms': round(centile(latences, 95), 2),
+        'p99_ms': round(centile(latences, 99), 2),
+        'max_ms': round(latences[-1], 2),
+        'requetes_par_s': round(len(latences) / duree, 1),
+        'requetes_sql': centile(requetes_sql, 50),
+        'statuts': {str(code): nombre for code, nombre in sorted(statuts.items())},
+    }
+
+
+def comparer(reference, resultats, seuil):
+    """Lister les routes plus lentes (p95) ou plus bavardes (requêtes SQL) que la référence"""
+    regressions = []
+    for cle, mesure in resultats['routes'].items():
+        avant = reference.get('routes', {}).get(cle)
+        if not avant:
+            continue
+        if mesure['p95_ms'] > avant['p95_ms'] * (1 + seuil):
+            regressions.append(f"{cle} : p95 {avant['p95_ms']} ms -> {mesure['p95_ms']} ms")
+        if mesure['requetes_sql'] > avant['requetes_sql']:
+            regressions.append(f"{cle} : {avant['requetes_sql']} -> {mesure['requetes_sql']} requêtes SQL")
+    return regressions
+
+
+def version_code():
+    """Commit courant, pour comparer les résultats entre deux versions"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Mesurer latence, débit et requêtes SQL de chaque route.')
+    parser.add_argument('--etudiants', type=int, default=2000, help='Nombre d\'étudiants générés.')
+    parser.add_argument('--notes', type=int, default=200000, help='Nombre de notes générées.')
+    parser.add_argument('--graine', type=int, default=42, help='Graine du générateur de données.')
+    parser.add_argument('--requetes', type=int, default=30, help='Appels mesurés par route et par client.')
+    parser.add_argument('--clients', type=int, default=1, help='Clients simultanés par route.')
+    parser.add_argument('--echauffement', type=int, default=2, help='Appels non mesurés avant la mesure.')
+    parser.add_argument('--routes', default='', help='Ne mesurer que les routes contenant ce texte.')
+    parser.add_argument('--sortie', help='Fichier JSON des résultats (sinon sortie standard).')
+    parser.add_argument('--comparer', help='Résultats de référence (JSON) : échoue en cas de régression.')
+    parser.add_argument('--seuil', type=float, default=0.2, help='Hausse du p95 tolérée (0.2 = 20 %%).')
+    options = parser.parse_args(arguments)
+
+    dossier = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        app = creer_application(dossier)
+
+        from app.generation import generer_donnees
+        debut = time.perf_counter()
+        with app.app_context():
+            volumes = generer_donnees(options.etudiants, options.notes, graine=options.graine,
+                                      mot_de_passe=MOT_DE_PASSE_ETUDIANTS)
+        print(f"Base peuplée en {time.perf_counter() - debut:.1f} s : {volumes}", file=sys.stderr)
+
+        compteur = compter_requetes_sql(app)
+        ids = identifiants(app)
+        comptes = dict(COMPTES, etudiant=(ids['matricule'], MOT_DE_PASSE_ETUDIANTS))
+
+        resultats = {
+            'meta': {
+                'commit': version_code(),
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'volumes': volumes,
+                'requetes': options.requetes,
+                'clients': options.clients,
+            },
+            'routes': {},
+        }
+
+        for role, routes in ROUTES.items():
+            for libelle, modele, *formulaire in routes:
+                cle = f'{role} {libelle}'
+                if options.routes not in cle:
+                    continue
+                donnees = formulaire[0](ids) if formulaire else None
+                mesure = mesurer_route(app, compteur, comptes, role, modele.format(**ids),
+                                       options.requetes, options.clients, options.echauffement, donnees)
+                resultats['routes'][cle] = mesure
+                print(f"{cle:<55} p50 {mesure['p50_ms']:8.2f}  p95 {mesure['p95_ms']:8.2f}  "
+                      f"p99 {mesure['p99_ms']:8.2f} ms  {mesure['requetes_par_s']:7.1f} req/s  "
+                      f"{mesure['requetes_sql']:3d} SQL  {mesure['statuts']}", file=sys.stderr)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    texte = json.dumps(resultats, indent=2, ensure_ascii=False)
+    if options.sortie:
+        with open(options.sortie, 'w', encoding='utf-8') as f:
+            f.write(texte + '\n')
+    else:
+        print(texte)
+
+    if options.comparer:
+        with open(options.comparer, encoding='utf-8') as f:
+            regressions = comparer(json.load(f), resultats, options.seuil)
+        for regression in regressions:
+            print(f'RÉGRESSION {regression}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.charge import creer_application, client_connecte, COMPTES
+
+
+def cout_observation(iterations):
+    """Coût (en microsecondes) de ce que les métriques ajoutent à chaque requête HTTP"""
+    from app.metriques import Histogramme, Compteur
+
+    latence = Histogramme('essai_duree_secondes', 'essai', ('endpoint', 'methode'))
+    statuts = Compteur('essai_total', 'essai', ('endpoint', 'statut'))
+    debut = time.perf_counter()
+    for i in range(iterations):
+        depart = time.perf_counter()
+        latence.observer(time.perf_counter() - depart, 'admin.liste_classes', 'GET')
+        statuts.incrementer('admin.liste_classes', 200)
+    return (time.perf_counter() - debut) / iterations * 1e6
+
+
+def latence_route(client, url, requetes):
+    """Latence médiane (en microsecondes) d'une route appelée `requetes` fois"""
+    latences = []
+    for _ in range(requetes):
+        debut = time.perf_counter()
+        client.get(url).get_data()
+        latences.append(time.perf_counter() - debut)
+    return statistics.median(latences) * 1e6
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Mesurer le surcoût des métriques par requête HTTP.')
+    parser.add_argument('--iterations', type=int, default=200000, help='Observations pour le coût unitaire.')
+    parser.add_argument('--requetes', type=int, default=300, help='Appels par série et par application.')
+    parser.add_argument('--series', type=int, default=5, help='Séries alternées avec et sans métriques.')
+    parser.add_argument('--url', default='/dashboard', help='Route appelée (compte administrateur).')
+    options = parser.parse_args(arguments)
+
+    dossier = tempfile.mkdtemp(prefix='benchmark_')
+    try:
+        # Deux applications sur la même base : seules les métriques diffèrent
+        applications = {
+            'avec': creer_application(dossier, METRIQUES=True, INSTRUMENTATION_SQL=False),
+            'sans': creer_application(dossier, METRIQUES=False, INSTRUMENTATION_SQL=False),
+        }
+        clients = {nom: client_connecte(app, COMPTES, 'admin') for nom, app in applications.items()}
+        for client in clients.values():
+            latence_route(client, options.url, 20)
+
+        # Séries alternées : une dérive de la machine pèse autant sur les deux applications
+        mesures = {nom: [] for nom in clients}
+        for _ in range(options.series):
+            for nom, client in clients.items():
+                mesures[nom].append(latence_route(client, options.url, options.requetes))
+
+        unitaire = cout_observation(options.iterations)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    avec, sans = min(mesures['avec']), min(mesures['sans'])
+    print(f'Coût des métriques par requête (observation seule) : {unitaire:.2f} µs')
+    print(f'GET {options.url} sans métriques : {sans:8.1f} µs (médiane, meilleure série)')
+    print(f'GET {options.url} avec métriques : {avec:8.1f} µs (médiane, meilleure série)')
+    print(f'Surcoût mesuré : {avec - sans:+.1f} µs ({(avec - sans) / sans:+.1%})')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,8 +14,81 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gestion_etudiants.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Profil du moteur SQLite : pragmas exécutés à l'ouverture de chaque connexion
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',       # les lectures ne bloquent plus les écritures
+        'synchronous': 'NORMAL',     # sûr en mode WAL, évite un fsync par transaction
+        'cache_size': -64000,        # 64 Mo de cache de pages par connexion
+        'mmap_size': 268435456,      # 256 Mo lus par projection mémoire
+        'busy_timeout': 5000         # attendre le verrou 5 s au lieu d'échouer
+    }
+    # Connexions du pool en lecture seule utilisé par les requêtes GET (0 = pas de pool séparé)
+    SQLITE_POOL_LECTURE = int(os.environ.get('SQLITE_POOL_LECTURE', 10))
+    
+    # Cache des utilisateurs connectés (par processus)
+    CACHE_UTILISATEURS_TAILLE = 1024
+    CACHE_UTILISATEURS_TTL = 300  # secondes
+    
+    # Hachage des mots de passe : algorithme et coût au format werkzeug
+    # (ex. 'scrypt:32768:8:1' ou 'pbkdf2:sha256:600000'). Les hash d'un autre
+    # format sont refaits à la connexion suivante.
+    HACHAGE_METHODE = os.environ.get('HACHAGE_METHODE', 'scrypt:32768:8:1')
+    # Fils de calcul du pool : la moitié des cœurs par défaut (au moins un), pour
+    # qu'un pic de connexions laisse du processeur aux autres requêtes
+    HACHAGE_FILS = int(os.environ.get('HACHAGE_FILS', 0)) or None  # None = max(1, cœurs // 2)
+    HACHAGE_FILE_MAX = 64  # calculs en attente au-delà desquels une connexion est refusée
+    
+    # Instrumentation SQL : nombre et durée des requêtes par page (en-tête Server-Timing),
+    # journal des requêtes lentes et des N+1 probables
+    INSTRUMENTATION_SQL = os.environ.get('INSTRUMENTATION_SQL', '1') == '1'
+    SQL_SEUIL_LENT_MS = 100
+    SQL_SEUIL_N_PLUS_UN = 5  # même instruction répétée dans une seule requête HTTP
+    
+    # Métriques au format Prometheus (latence par route, statuts, pools, PDF, hachage),
+    # exposées aux administrateurs sur /admin/metriques
+    METRIQUES = os.environ.get('METRIQUES', '1') == '1'
+    
     # Configuration pour les uploads de fichiers
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max
     
+    # Nombre de lignes par page dans les listes (pagination par curseur)
+    TAILLE_PAGE = 50
+    
+    # Recherche des étudiants (autocomplétion) : résultats par défaut et maximum,
+    # correspondances classées par pertinence au plus (coût borné des saisies courtes)
+    RECHERCHE_LIMITE = 10
+    RECHERCHE_LIMITE_MAX = 50
+    RECHERCHE_CANDIDATS = 500
+    
+    # Import CSV des étudiants : nombre de lignes insérées par requête
+    IMPORT_TAILLE_LOT = 500
+    
+    # Export CSV des notes : lignes lues par lot sur le curseur de la base
+    EXPORT_TAILLE_LOT = 1000
+    
+    # Génération des bulletins par classe (None = un processus par cœur)
+    BULLETINS_PROCESSUS = int(os.environ.get('BULLETINS_PROCESSUS', 0)) or None
+    BULLETINS_TAILLE_LOT = 100
+    
+    # Bulletins PDF des étudiants : cache sur disque (None = dossier instance/bulletins),
+    # rendus simultanés en arrière-plan et attente maximale dans la requête (secondes)
+    # avant de répondre « en préparation »
+    BULLETINS_CACHE_DOSSIER = os.environ.get('BULLETINS_CACHE_DOSSIER')
+    BULLETINS_FILE_FILS = 2
+    BULLETINS_ATTENTE = 3
+    
+    # Crédits à obtenir sur l'année
+    CREDITS_CIBLE = 60
+
+    # Délibérations du jury : admission par compensation d'un étudiant qui n'a pas
+    # validé tous ses crédits, si sa moyenne générale atteint COMPENSATION_MOYENNE,
+    # qu'aucune moyenne de matière n'est sous la note éliminatoire et qu'il a déjà
+    # validé COMPENSATION_CREDITS_MIN crédits. Il doit avoir été noté dans des
+    # matières totalisant au moins CREDITS_CIBLE crédits.
+    COMPENSATION = True
+    COMPENSATION_MOYENNE = 10
+    COMPENSATION_NOTE_ELIMINATOIRE = 7
+    COMPENSATION_CREDITS_MIN = 40
+
     # Configuration pour le développement
     DEBUG = True
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('SECRET_KEY', 'tests')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from app.cache import cache_utilisateurs
+from app.models import Classe, Etudiant, Utilisateur
+
+
+def creer_application(dossier, **reglages):
+    """Application sur une base SQLite temporaire, schéma créé et migrations appliquées"""
+    class ConfigTests(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(dossier, 'tests.db')
+        BULLETINS_CACHE_DOSSIER = os.path.join(dossier, 'bulletins')
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+        DEBUG = False
+
+    for cle, valeur in reglages.items():
+        setattr(ConfigTests, cle, valeur)
+    return create_app(ConfigTests)
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Caches du processus : une entrée d'un test précédent désignerait une autre base
+    cache_utilisateurs.invalider()
+    application = creer_application(str(tmp_path))
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    if 'moteur_lecture' in application.extensions:
+        application.extensions['moteur_lecture'].dispose()
+
+
+def connecter(app, login, mot_de_passe):
+    """Client de test connecté"""
+    client = app.test_client()
+    reponse = client.post('/auth/login', data={'login': login, 'password': mot_de_passe})
+    assert reponse.status_code == 302, f'connexion impossible pour {login}'
+    return client
+
+
+@pytest.fixture
+def admin(app):
+    return connecter(app, 'admin', 'admin123')
+
+
+@pytest.fixture
+def enseignant(app):
+    return connecter(app, 'enseignant', 'enseignant123')
+
+
+def ajouter_etudiants(noms, classe_id=None):
+    """Créer des étudiants (liste de (nom, prénom)) dans une classe, la première par défaut ; renvoie leurs id"""
+    if classe_id is None:
+        classe_id = Classe.query.first().id
+    etudiants = [Etudiant(matricule=f'2024E{i:04d}', nom=nom, prenom=prenom, classe_id=classe_id)
+                 for i, (nom, prenom) in enumerate(noms, start=Etudiant.query.count() + 1)]
+    db.session.add_all(etudiants)
+    db.session.commit()
+    return [e.id for e in etudiants]
+
+
+def ajouter_compte_etudiant(etudiant_id, mot_de_passe='etudiant123'):
+    """Créer le compte (login = matricule) relié à une fiche étudiant ; renvoie le login"""
+    etudiant = db.session.get(Etudiant, etudiant_id)
+    compte = Utilisateur(nom=etudiant.nom, prenom=etudiant.prenom, login=etudiant.matricule,
+                         role='etudiant', etudiant_id=etudiant.id)
+    compte.set_password(mot_de_passe)
+    db.session.add(compte)
+    db.session.commit()
+    return compte.login
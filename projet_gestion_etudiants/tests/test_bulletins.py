@@ -0,0 +1,43 @@
+import io
+import zipfile
+
+from app import db
+from app.models import Classe, Etudiant, Matiere, Note
+from app.calculs import reconstruire_moyennes
+from conftest import ajouter_etudiants
+
+
+def _classe_notee(app):
+    with app.app_context():
+        classe_id = Classe.query.first().id
+        ids = ajouter_etudiants([('Ndiaye', 'Fatou'), ('Sow', 'Awa'), ('Fall', 'Moussa')], classe_id)
+        matiere_id = Matiere.query.first().id
+        db.session.add_all([Note(etudiant_id=i, matiere_id=matiere_id, valeur=12) for i in ids])
+        db.session.commit()
+        reconstruire_moyennes()
+        matricules = {e.matricule for e in Etudiant.query.filter_by(classe_id=classe_id)}
+    return classe_id, matricules
+
+
+def _pdf_par_etudiant(contenu, matricules):
+    with zipfile.ZipFile(io.BytesIO(contenu)) as archive:
+        assert archive.testzip() is None
+        noms = archive.namelist()
+        assert sorted(noms) == sorted(f'bulletin_{m}.pdf' for m in matricules)
+        assert all(archive.read(nom).startswith(b'%PDF') for nom in noms)
+
+
+def test_zip_de_la_classe(app, admin):
+    classe_id, matricules = _classe_notee(app)
+    reponse = admin.get(f'/admin/classe/{classe_id}/bulletins')
+    assert reponse.status_code == 200
+    assert reponse.mimetype == 'application/zip'
+    _pdf_par_etudiant(reponse.get_data(), matricules)
+
+
+def test_zip_en_ligne_de_commande(app, tmp_path):
+    classe_id, matricules = _classe_notee(app)
+    sortie = tmp_path / 'classe.zip'
+    resultat = app.test_cli_runner().invoke(args=['bulletins', 'classe', str(classe_id), '--sortie', str(sortie)])
+    assert resultat.exit_code == 0, resultat.output
+    _pdf_par_etudiant(sortie.read_bytes(), matricules)
@@ -0,0 +1,54 @@
+import os
+
+from app.models import Matiere
+from conftest import ajouter_etudiants, ajouter_compte_etudiant, connecter
+
+
+def _fichiers(app):
+    """Bulletins en cache : nom de fichier -> date de modification"""
+    dossier = app.config['BULLETINS_CACHE_DOSSIER']
+    if not os.path.isdir(dossier):
+        return {}
+    return {nom: os.stat(os.path.join(dossier, nom)).st_mtime_ns
+            for nom in os.listdir(dossier) if nom.endswith('.pdf')}
+
+
+def _ajouter_note(client, etudiant_id, matiere_id, valeur):
+    reponse = client.post('/enseignant/note/ajouter', data={
+        'etudiant_id': etudiant_id, 'matiere_id': matiere_id, 'valeur': valeur, 'type_evaluation': 'Devoir'
+    })
+    assert reponse.status_code == 302
+
+
+def test_bulletin_servi_du_cache_et_invalide_pour_un_seul_etudiant(app, enseignant):
+    with app.app_context():
+        premier, second = ajouter_etudiants([('Ndiaye', 'Fatou'), ('Sow', 'Awa')])
+        comptes = [ajouter_compte_etudiant(premier), ajouter_compte_etudiant(second)]
+        matiere_id = Matiere.query.first().id
+    _ajouter_note(enseignant, premier, matiere_id, 12)
+    _ajouter_note(enseignant, second, matiere_id, 14)
+    etudiants = [connecter(app, login, 'etudiant123') for login in comptes]
+
+    # Afficher le bulletin ne rend aucun PDF
+    assert etudiants[0].get('/etudiant/bulletin').status_code == 200
+    assert _fichiers(app) == {}
+
+    for client in etudiants:
+        assert client.get('/etudiant/bulletin/pdf').status_code == 200
+    rendus = _fichiers(app)
+    assert sorted(nom.split('_')[0] for nom in rendus) == sorted([str(premier), str(second)])
+
+    # Bulletin inchangé : même fichier, pas de nouveau rendu
+    reponse = etudiants[0].get('/etudiant/bulletin/pdf')
+    assert reponse.status_code == 200 and reponse.data.startswith(b'%PDF')
+    assert _fichiers(app) == rendus
+
+    # Nouvelle note du premier : seul son bulletin est rendu de nouveau
+    _ajouter_note(enseignant, premier, matiere_id, 18)
+    assert etudiants[0].get('/etudiant/bulletin/pdf').status_code == 200
+    apres = _fichiers(app)
+    ancien_premier = next(nom for nom in rendus if nom.startswith(f'{premier}_'))
+    bulletin_second = next(nom for nom in rendus if nom.startswith(f'{second}_'))
+    assert ancien_premier not in apres
+    assert len([nom for nom in apres if nom.startswith(f'{premier}_')]) == 1
+    assert apres[bulletin_second] == rendus[bulletin_second]
@@ -0,0 +1,26 @@
+import threading
+
+from app import db
+from app.cache import cache_utilisateurs
+from app.models import Utilisateur, load_user
+
+
+def test_utilisateur_relu_avant_commit_retire_apres_commit(app):
+    """Une version relue entre le flush et le commit ne reste pas en cache"""
+    with app.app_context():
+        compte = Utilisateur.query.filter_by(login='enseignant').first()
+        compte.role = 'admin'
+        db.session.flush()
+
+        # Requête concurrente : relit l'ancienne ligne (non validée) et la met en cache
+        def relire():
+            with app.app_context():
+                load_user(compte.id)
+        fil = threading.Thread(target=relire)
+        fil.start()
+        fil.join()
+        assert cache_utilisateurs.lire(compte.id).role == 'enseignant'
+
+        db.session.commit()
+        assert cache_utilisateurs.lire(compte.id) is None
+        assert load_user(compte.id).role == 'admin'
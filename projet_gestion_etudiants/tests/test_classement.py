@@ -0,0 +1,30 @@
+from app import db
+from app.models import Classe, Matiere
+from conftest import ajouter_etudiants
+
+
+def test_egalites_partagent_le_rang_et_sans_note_en_dernier(app, enseignant):
+    with app.app_context():
+        classe = Classe(nom='L3 Classement')
+        db.session.add(classe)
+        db.session.commit()
+        classe_id = classe.id
+        ba, diallo, sow, sy = ajouter_etudiants(
+            [('Ba', 'Moussa'), ('Diallo', 'Aminata'), ('Sow', 'Awa'), ('Sy', 'Ibrahima')], classe_id
+        )
+        matiere = Matiere.query.first()
+        matiere_id, matiere_nom = matiere.id, matiere.nom
+
+    # Ba et Sow à égalité, Diallo derrière, Sy sans aucune note
+    reponse = enseignant.post(
+        f'/enseignant/notes/saisie-classe?classe_id={classe_id}&matiere_id={matiere_id}&type_evaluation=Examen',
+        data={f'note_{ba}': '14', f'note_{diallo}': '10', f'note_{sow}': '14'}
+    )
+    assert reponse.status_code == 302
+
+    classement = enseignant.get(f'/enseignant/classe/{classe_id}/classement').get_json()['classement']
+    assert [(e['etudiant']['id'], e['rang'], e['moyenne_generale']) for e in classement] == [
+        (ba, 1, 14), (sow, 1, 14), (diallo, 3, 10), (sy, None, None)
+    ]
+    assert [e['matieres'].get(matiere_nom, {}).get('rang') for e in classement] == [1, 1, 3, None]
+    assert classement[-1]['matieres'] == {} and classement[-1]['credits_valides'] == 0
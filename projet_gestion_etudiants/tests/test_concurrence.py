@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Classe, Etudiant, Matiere, Note
+from app import moteur
+from app.moteur import ecriture
+from conftest import connecter
+
+
+def test_profil_wal_sans_erreur_de_verrou(app):
+    """Lecteurs (pool en lecture seule) et écrivains simultanés : aucun « database is locked »"""
+    bilan = moteur.tester_concurrence(db.metadata, app.config['SQLITE_PRAGMAS'], lecteurs=4, ecrivains=2, duree=2.0)
+    assert bilan['journal_mode'] == 'wal'
+    assert bilan['lectures']['operations'] > 0 and bilan['ecritures']['operations'] > 0
+    assert bilan['lectures']['verrous'] == 0
+    assert bilan['ecritures']['verrous'] == 0
+
+
+def test_pages_et_saisies_simultanees(app):
+    """Pages en lecture et ajouts de notes en parallèle dans l'application : aucune erreur"""
+    with app.app_context():
+        classe_id = Classe.query.first().id
+        etudiants = [Etudiant(matricule=f'T{i:04d}', nom=f'Nom{i}', prenom='Test', classe_id=classe_id)
+                     for i in range(20)]
+        db.session.add_all(etudiants)
+        db.session.commit()
+        etudiant_ids = [e.id for e in etudiants]
+        matiere_ids = [m.id for m in Matiere.query.all()]
+        notes_avant = Note.query.count()
+
+    statuts = []
+    verrou = threading.Lock()
+    fin = time.monotonic() + 2.0
+
+    def lecteur():
+        client = connecter(app, 'enseignant', 'enseignant123')
+        while time.monotonic() < fin:
+            for url in ('/enseignant/notes', f'/enseignant/classe/{classe_id}/classement', '/dashboard'):
+                with verrou:
+                    statuts.append(client.get(url).status_code)
+
+    ajouts = []
+
+    def ecrivain(numero):
+        client = connecter(app, 'enseignant', 'enseignant123')
+        i = 0
+        while time.monotonic() < fin:
+            reponse = client.post('/enseignant/note/ajouter', data={
+                'etudiant_id': etudiant_ids[(numero + i) % len(etudiant_ids)],
+                'matiere_id': matiere_ids[i % len(matiere_ids)],
+                'valeur': 12, 'type_evaluation': 'Examen'
+            })
+            with verrou:
+                statuts.append(reponse.status_code)
+                ajouts.append(reponse.status_code == 302)
+            i += 1
+
+    fils = [threading.Thread(target=lecteur) for _ in range(3)] + \
+        [threading.Thread(target=ecrivain, args=(n,)) for n in range(2)]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+
+    assert set(statuts) <= {200, 302}
+    assert all(ajouts)
+    with app.app_context():
+        assert Note.query.count() == notes_avant + len(ajouts)
+
+
+def test_route_get_ne_peut_pas_ecrire(app):
+    """Une route GET sans @ecriture passe par le pool en lecture seule : toute écriture échoue"""
+    def ecrire():
+        db.session.add(Classe(nom='Écrite en GET'))
+        db.session.commit()
+        return 'ok'
+
+    @ecriture
+    def ecrire_autorise():
+        return ecrire()
+
+    app.add_url_rule('/test/ecrire', 'ecrire_en_get', ecrire)
+    app.add_url_rule('/test/ecrire-autorise', 'ecrire_autorise', ecrire_autorise)
+    client = app.test_client()
+
+    with pytest.raises(OperationalError, match='readonly'):
+        client.get('/test/ecrire')
+    assert client.get('/test/ecrire-autorise').status_code == 200
+    with app.app_context():
+        assert Classe.query.filter_by(nom='Écrite en GET').count() == 1
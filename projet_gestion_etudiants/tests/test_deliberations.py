@@ -0,0 +1,95 @@
+from sqlalchemy import text
+
+from app import db
+from app.calculs import enregistrer_notes
+from app.deliberations import deliberer, regles_deliberation, resultats_bulletins
+from app.migrations import appliquer_migrations
+from app.models import Classe, Etudiant, Matiere, Note
+
+
+def _classe_deliberee(app):
+    """Une classe de deux étudiants notés 12 partout, délibérée"""
+    classe_id = Classe.query.first().id
+    etudiants = [Etudiant(matricule=f'2024T000{i}', nom=f'Nom{i}', prenom='Test', classe_id=classe_id)
+                 for i in range(2)]
+    db.session.add_all(etudiants)
+    db.session.flush()
+    notes = [Note(etudiant_id=e.id, matiere_id=m.id, valeur=12) for e in etudiants for m in Matiere.query.all()]
+    db.session.add_all(notes)
+    enregistrer_notes(ajouts=[(n.etudiant_id, n.matiere_id, n.valeur) for n in notes])
+    db.session.commit()
+    deliberer(regles_deliberation(app.config), classe_id=classe_id)
+    return classe_id, max(e.id for e in etudiants)
+
+
+def test_resultat_delibere_pas_repris_par_un_nouvel_etudiant(app, admin):
+    """Supprimer le dernier étudiant délibéré puis en créer un : le nouveau n'hérite de rien"""
+    with app.app_context():
+        classe_id, dernier_id = _classe_deliberee(app)
+        assert resultats_bulletins([dernier_id])[dernier_id]['decision'] == 'Admis'
+
+    assert admin.get(f'/admin/etudiant/supprimer/{dernier_id}').status_code == 302
+    reponse = admin.post('/admin/etudiant/ajouter', data={
+        'matricule': '2024N0001', 'nom': 'Nouveau', 'prenom': 'Etudiant', 'classe_id': classe_id
+    })
+    assert reponse.status_code == 302
+
+    with app.app_context():
+        nouveau = Etudiant.query.filter_by(matricule='2024N0001').one()
+        assert nouveau.id != dernier_id
+        resultat = resultats_bulletins([nouveau.id])[nouveau.id]
+        assert 'decision' not in resultat
+        assert resultat['moyenne_generale'] is None
+
+
+def test_resultat_ignore_si_id_repris(app):
+    """Même si un id est repris (base non migrée), le matricule copié doit correspondre"""
+    with app.app_context():
+        _, dernier_id = _classe_deliberee(app)
+        db.session.execute(text('DELETE FROM etudiant WHERE id = :id'), {'id': dernier_id})
+        db.session.add(Etudiant(id=dernier_id, matricule='2024N0002', nom='Autre', prenom='Etudiant'))
+        db.session.commit()
+        assert 'decision' not in resultats_bulletins([dernier_id])[dernier_id]
+
+
+def test_migration_autoincrement(app):
+    """Une table etudiant sans AUTOINCREMENT est reconstruite sans perte"""
+    with app.app_context():
+        _, dernier_id = _classe_deliberee(app)
+        # Revenir au schéma d'avant la migration 6, id délibéré supprimé
+        definition, = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'etudiant'")).one()
+        dependances = [sql for (sql,) in db.session.execute(text(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'etudiant' AND type IN ('index', 'trigger') "
+            "AND sql IS NOT NULL"
+        ))]
+        db.session.execute(text('DELETE FROM etudiant WHERE id = :id'), {'id': dernier_id})
+        db.session.execute(text('ALTER TABLE etudiant RENAME TO etudiant_ancien'))
+        db.session.execute(text(definition.replace(' AUTOINCREMENT', '')))
+        db.session.execute(text('INSERT INTO etudiant SELECT * FROM etudiant_ancien'))
+        db.session.execute(text('DROP TABLE etudiant_ancien'))
+        for sql in dependances:
+            db.session.execute(text(sql))
+        db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'etudiant'"))
+        db.session.execute(text('DELETE FROM migration_schema WHERE version = 6'))
+        db.session.commit()
+        avant = db.session.query(Etudiant.id, Etudiant.matricule).order_by(Etudiant.id).all()
+
+        assert [version for version, _ in appliquer_migrations()] == [6]
+
+        db.session.expire_all()
+        definition, = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'etudiant'")).one()
+        assert 'AUTOINCREMENT' in definition
+        assert db.session.query(Etudiant.id, Etudiant.matricule).order_by(Etudiant.id).all() == avant
+        noms = {nom for (nom,) in db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'etudiant' AND type IN ('index', 'trigger')"
+        ))}
+        assert {'ix_etudiant_nom_prenom', 'ix_etudiant_classe_nom', 'etudiant_recherche_ajout'} <= noms
+
+        nouveau = Etudiant(matricule='2024N0003', nom='Apres', prenom='Migration')
+        db.session.add(nouveau)
+        db.session.commit()
+        assert nouveau.id > dernier_id
+        # L'index de recherche suit toujours la table
+        assert db.session.execute(text(
+            "SELECT rowid FROM etudiant_recherche WHERE etudiant_recherche MATCH 'apres'"
+        )).scalar() == nouveau.id
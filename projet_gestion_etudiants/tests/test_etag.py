@@ -0,0 +1,62 @@
+import pytest
+
+from app.deliberations import deliberer, regles_deliberation
+from app.models import Classe, Matiere
+from conftest import ajouter_etudiants, ajouter_compte_etudiant, connecter
+
+PAGES = ['/dashboard', '/etudiant/mes-notes', '/etudiant/bulletin']
+
+
+@pytest.fixture
+def etudiant(app, enseignant):
+    """(client, etudiant_id, matiere_id) d'un étudiant noté dans une matière, messages de connexion déjà affichés"""
+    with app.app_context():
+        etudiant_id, = ajouter_etudiants([('Ndiaye', 'Fatou')])
+        login = ajouter_compte_etudiant(etudiant_id)
+        matiere_id = Matiere.query.first().id
+    _ajouter_note(enseignant, etudiant_id, matiere_id, 12)
+    client = connecter(app, login, 'etudiant123')
+    assert client.get('/dashboard').status_code == 200
+    return client, etudiant_id, matiere_id
+
+
+def _ajouter_note(client, etudiant_id, matiere_id, valeur):
+    reponse = client.post('/enseignant/note/ajouter', data={
+        'etudiant_id': etudiant_id, 'matiere_id': matiere_id, 'valeur': valeur, 'type_evaluation': 'Devoir'
+    })
+    assert reponse.status_code == 302
+
+
+def _etags(client):
+    etags = {}
+    for page in PAGES:
+        reponse = client.get(page)
+        assert reponse.status_code == 200 and reponse.headers['ETag']
+        etags[page] = reponse.headers['ETag']
+    return etags
+
+
+def test_page_inchangee_repond_304(etudiant):
+    client, _, _ = etudiant
+    for page, etag in _etags(client).items():
+        reponse = client.get(page, headers={'If-None-Match': etag})
+        assert reponse.status_code == 304
+        assert reponse.headers['ETag'] == etag and reponse.data == b''
+
+
+def test_note_et_deliberation_changent_l_etag(app, etudiant, enseignant):
+    client, etudiant_id, matiere_id = etudiant
+    avant = _etags(client)
+
+    _ajouter_note(enseignant, etudiant_id, matiere_id, 16)
+    apres_note = _etags(client)
+    for page in PAGES:
+        assert apres_note[page] != avant[page]
+        assert client.get(page, headers={'If-None-Match': avant[page]}).status_code == 200
+
+    with app.app_context():
+        deliberer(regles_deliberation(app.config), classe_id=Classe.query.first().id)
+    apres_deliberation = _etags(client)
+    for page in PAGES:
+        assert apres_deliberation[page] != apres_note[page]
+        assert client.get(page, headers={'If-None-Match': apres_note[page]}).status_code == 200
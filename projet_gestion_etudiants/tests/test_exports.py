@@ -0,0 +1,34 @@
+import csv
+import io
+
+from app import db
+from app.exports import cellule_texte
+from app.models import Classe, Etudiant, Matiere, Note
+
+
+def test_cellule_texte():
+    for dangereux in ('=1+1', '+33 6', '-2', '@SUM(A1)', '\tx', '\rx'):
+        assert cellule_texte(dangereux) == "'" + dangereux
+    assert cellule_texte('Très bien') == 'Très bien'
+    assert cellule_texte(None) == ''
+
+
+def test_export_neutralise_les_formules(app, admin):
+    with app.app_context():
+        etudiant = Etudiant(matricule='2024000001', nom='=HYPERLINK("http://x")', prenom='-Awa',
+                            classe_id=Classe.query.first().id)
+        db.session.add(etudiant)
+        db.session.flush()
+        db.session.add(Note(etudiant_id=etudiant.id, matiere_id=Matiere.query.first().id, valeur=12.5,
+                            type_evaluation='Examen', commentaire='=cmd|" /C calc"!A0'))
+        db.session.commit()
+
+    reponse = admin.get('/admin/notes/export.csv')
+    assert reponse.status_code == 200
+    lignes = list(csv.reader(io.StringIO(reponse.get_data(as_text=True).lstrip('\ufeff')), delimiter=';'))
+    ligne = dict(zip(lignes[0], lignes[1]))
+    assert ligne['nom'] == '\'=HYPERLINK("http://x")'
+    assert ligne['prenom'] == "'-Awa"
+    assert ligne['commentaire'] == '\'=cmd|" /C calc"!A0'
+    assert ligne['matricule'] == '2024000001'
+    assert ligne['valeur'] == '12.5'
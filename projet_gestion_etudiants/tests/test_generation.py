@@ -0,0 +1,37 @@
+from app import db
+from app.generation import generer_donnees
+from app.models import Utilisateur, Etudiant, Note
+from conftest import creer_application
+
+
+def _contenu(dossier):
+    dossier.mkdir()
+    app = creer_application(str(dossier), HACHAGE_METHODE='pbkdf2:sha256:1000')
+    with app.app_context():
+        generer_donnees(60, 600, graine=7)
+        contenu = (
+            # Comptes générés seulement : ceux de init_data ont leur propre sel
+            db.session.query(Utilisateur.login, Utilisateur.motdepasse_hash).filter(
+                Utilisateur.etudiant_id.isnot(None), Utilisateur.login != 'etudiant'
+            ).order_by(Utilisateur.id).all(),
+            db.session.query(Etudiant.matricule, Etudiant.nom, Etudiant.prenom).order_by(Etudiant.id).all(),
+            db.session.query(Note.etudiant_id, Note.matiere_id, Note.valeur, Note.date_ajout).order_by(Note.id).all()
+        )
+        db.engine.dispose()
+    return contenu
+
+
+def test_meme_graine_memes_donnees(tmp_path):
+    """Deux générations avec la même graine sont identiques, hash des mots de passe compris"""
+    premiere = _contenu(tmp_path / 'a')
+    seconde = _contenu(tmp_path / 'b')
+    assert premiere[0] and premiere[2]
+    assert premiere == seconde
+
+
+def test_hash_genere_verifiable(app):
+    with app.app_context():
+        generer_donnees(5, 20, mot_de_passe='secret')
+        compte = Utilisateur.query.filter(Utilisateur.role == 'etudiant', Utilisateur.login != 'etudiant').first()
+        assert compte.check_password('secret')
+        assert not compte.check_password('autre')
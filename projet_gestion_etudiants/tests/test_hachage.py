@@ -0,0 +1,57 @@
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.hachage import hachage, SaturationHachage
+from app.models import Utilisateur
+
+
+def _hash_de(app, login):
+    with app.app_context():
+        return Utilisateur.query.filter_by(login=login).one().motdepasse_hash
+
+
+def _remplacer_hash(app, login, motdepasse_hash):
+    with app.app_context():
+        Utilisateur.query.filter_by(login=login).one().motdepasse_hash = motdepasse_hash
+        db.session.commit()
+
+
+def test_ancien_hash_refait_a_la_connexion(app):
+    _remplacer_hash(app, 'enseignant', generate_password_hash('enseignant123', method='pbkdf2:sha256:1000'))
+
+    reponse = app.test_client().post('/auth/login', data={'login': 'enseignant', 'password': 'enseignant123'})
+    assert reponse.status_code == 302
+    assert _hash_de(app, 'enseignant').startswith(app.config['HACHAGE_METHODE'] + '$')
+
+
+def test_mise_a_jour_du_hash_reportee_si_pool_sature(app, monkeypatch):
+    ancien = generate_password_hash('enseignant123', method='pbkdf2:sha256:1000')
+    _remplacer_hash(app, 'enseignant', ancien)
+
+    def sature(mot_de_passe):
+        raise SaturationHachage()
+    monkeypatch.setattr(hachage, 'hacher', sature)
+
+    reponse = app.test_client().post('/auth/login', data={'login': 'enseignant', 'password': 'enseignant123'})
+    assert reponse.status_code == 302
+    assert _hash_de(app, 'enseignant') == ancien
+
+
+def test_pool_sature_repond_503(app, admin):
+    # Un seul calcul à la fois et aucune attente : la place est prise par le test
+    hachage.configurer(app.config['HACHAGE_METHODE'], fils=1, file_max=0)
+    assert hachage._places.acquire(blocking=False)
+    try:
+        reponse = app.test_client().post('/auth/login', data={'login': 'enseignant', 'password': 'enseignant123'})
+        assert reponse.status_code == 503
+
+        reponse = admin.post('/admin/utilisateur/ajouter', data={
+            'nom': 'Fall', 'prenom': 'Awa', 'login': 'afall', 'role': 'enseignant',
+            'password': 'motdepasse123'
+        })
+        assert reponse.status_code == 503
+    finally:
+        hachage._places.release()
+
+    with app.app_context():
+        assert Utilisateur.query.filter_by(login='afall').first() is None
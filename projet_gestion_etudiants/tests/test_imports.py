@@ -0,0 +1,51 @@
+import io
+
+from app.compteurs import lire_compteurs
+from app.models import Classe, Etudiant
+
+
+def _csv(lignes):
+    return io.BytesIO(('matricule;nom;prenom;email;classe\n' + ''.join(lignes)).encode('utf-8'))
+
+
+def _importer(admin, fichier):
+    return admin.post('/admin/etudiants/importer', data={'fichier': (fichier, 'etudiants.csv')},
+                      content_type='multipart/form-data')
+
+
+def test_fichier_avec_lignes_invalides_refuse_en_entier(app, admin):
+    with app.app_context():
+        avant = Etudiant.query.count()
+        classe = Classe.query.first().nom
+    fichier = _csv([
+        f'2025I0001;Ndiaye;Fatou;fatou@example.com;{classe}\n',
+        '2025I0002;S;Awa;;\n',                          # nom trop court
+        '2025I0003;Fall;Moussa;pas-un-email;\n',        # email invalide
+        f'2025I0001;Diop;Cheikh;;{classe}\n',           # matricule en double dans le fichier
+        '2025I0005;Ba;Khady;;Classe inconnue\n',
+        '2025I0006;Sarr;Modou;;\n',
+    ])
+    reponse = _importer(admin, fichier)
+    assert reponse.status_code == 200
+    page = reponse.get_data(as_text=True)
+    assert 'Fichier refusé' in page
+    for numero in (3, 4, 5, 6):
+        assert f'<td>{numero}</td>' in page
+    with app.app_context():
+        assert Etudiant.query.count() == avant
+        assert Etudiant.query.filter(Etudiant.matricule.like('2025I%')).count() == 0
+
+
+def test_fichier_plus_grand_qu_un_lot(app, admin):
+    app.config['IMPORT_TAILLE_LOT'] = 7
+    with app.app_context():
+        avant = Etudiant.query.count()
+        compteurs = lire_compteurs()
+    nombre = 7 * 3 + 2
+    fichier = _csv(f'2025L{i:04d};Nom{i};Prenom{i};e{i}@example.com;\n' for i in range(nombre))
+    reponse = _importer(admin, fichier)
+    assert reponse.status_code == 200
+    assert f'{nombre} étudiant(s) importé(s)' in reponse.get_data(as_text=True)
+    with app.app_context():
+        assert Etudiant.query.count() == avant + nombre
+        assert lire_compteurs()['etudiants'] == compteurs['etudiants'] + nombre
@@ -0,0 +1,40 @@
+from app import db
+from app.calculs import verifier_moyennes
+from app.models import Matiere, MoyenneMatiere, Note
+from conftest import ajouter_etudiants
+
+
+def _ajouter_note(client, etudiant_id, matiere_id, valeur):
+    reponse = client.post('/enseignant/note/ajouter', data={
+        'etudiant_id': etudiant_id, 'matiere_id': matiere_id, 'valeur': valeur, 'type_evaluation': 'Devoir'
+    })
+    assert reponse.status_code == 302
+
+
+def test_cumul_suit_ajouts_modifications_et_suppressions(app, enseignant):
+    with app.app_context():
+        premier, second = ajouter_etudiants([('Ndiaye', 'Fatou'), ('Sow', 'Awa')])
+        maths, anglais = [m.id for m in Matiere.query.order_by(Matiere.id).limit(2)]
+
+    _ajouter_note(enseignant, premier, maths, 12)
+    _ajouter_note(enseignant, premier, maths, 16)
+    with app.app_context():
+        assert verifier_moyennes() == []
+        assert db.session.get(MoyenneMatiere, (premier, maths)).moyenne == 14
+        note_id = Note.query.filter_by(etudiant_id=premier, valeur=16).one().id
+
+    # La note change d'étudiant et de matière : retirée de l'ancien cumul, ajoutée au nouveau
+    reponse = enseignant.post(f'/enseignant/note/modifier/{note_id}', data={
+        'etudiant_id': second, 'matiere_id': anglais, 'valeur': 9, 'type_evaluation': 'Examen'
+    })
+    assert reponse.status_code == 302
+    with app.app_context():
+        assert verifier_moyennes() == []
+        assert db.session.get(MoyenneMatiere, (premier, maths)).moyenne == 12
+        assert db.session.get(MoyenneMatiere, (second, anglais)).moyenne == 9
+
+    # Dernière note de la matière supprimée : plus de ligne de cumul
+    assert enseignant.get(f'/enseignant/note/supprimer/{note_id}').status_code == 302
+    with app.app_context():
+        assert verifier_moyennes() == []
+        assert db.session.get(MoyenneMatiere, (second, anglais)) is None
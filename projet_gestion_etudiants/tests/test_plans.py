@@ -0,0 +1,17 @@
+from app import db
+from app.migrations import parcours_complets, requetes_chaudes
+
+
+def test_requetes_chaudes_utilisent_un_index(app):
+    """Aucune requête fréquente ne parcourt une table entière (EXPLAIN QUERY PLAN)"""
+    with app.app_context():
+        assert requetes_chaudes()
+        assert parcours_complets() == []
+
+
+def test_parcours_complet_detecte_sans_index(app):
+    """Le contrôle échoue bien quand un index des migrations manque"""
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ix_note_etudiant_matiere'))
+        db.session.commit()
+        assert parcours_complets()
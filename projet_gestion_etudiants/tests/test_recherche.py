@@ -0,0 +1,32 @@
+from conftest import ajouter_etudiants
+
+
+def _recherche(client, saisie):
+    reponse = client.get('/etudiants/recherche', query_string={'q': saisie})
+    assert reponse.status_code == 200
+    return [(e['nom'], e['prenom']) for e in reponse.get_json()['etudiants']]
+
+
+def test_recherche_par_prefixe_sans_accents(app, enseignant):
+    with app.app_context():
+        ajouter_etudiants([('Diallo', 'Élodie'), ('Sow', 'Éric'), ('Faye', 'Lamine')])
+
+    for saisie in ('elo', 'ÉLO', 'élodie dia'):
+        assert _recherche(enseignant, saisie) == [('Diallo', 'Élodie')]
+    assert _recherche(enseignant, 'eri') == [('Sow', 'Éric')]
+
+
+def test_syntaxe_fts_prise_pour_du_texte(app, admin, enseignant):
+    with app.app_context():
+        ajouter_etudiants([('Diallo', 'Élodie'), ('Sow', 'Éric')])
+
+    for saisie in ('"elo', 'elo"', 'elo*', '(elo)', '-elo', '^elo', 'elo:'):
+        assert _recherche(enseignant, saisie) == [('Diallo', 'Élodie')], saisie
+    # Les opérateurs sont des mots comme les autres : aucun étudiant ne s'appelle « NEAR » ou « AND »
+    for saisie in ('"', '*', '()', 'NEAR(elo', 'elo AND', 'elo OR eri'):
+        assert _recherche(enseignant, saisie) == []
+
+    reponse = admin.get('/admin/etudiants', query_string={'q': '"elo'})
+    assert reponse.status_code == 200
+    page = reponse.get_data(as_text=True)
+    assert 'Élodie' in page and 'Éric' not in page
@@ -0,0 +1,47 @@
+import threading
+
+from app import db
+from app.calculs import enregistrer_notes, resultats_etudiant
+from app.models import Classe, Etudiant, Matiere, Note
+from app.referentiels import referentiels
+
+
+def test_matiere_creee_apres_lecture_de_la_version(app):
+    """Un cumul plus récent que la version mémorisée dans la requête ne fait pas échouer le calcul"""
+    with app.app_context():
+        etudiant = Etudiant(matricule='2024R0001', nom='Ndiaye', prenom='Fatou',
+                            classe_id=Classe.query.first().id)
+        db.session.add(etudiant)
+        db.session.commit()
+        referentiels.lire()
+
+        # Autre requête (ou autre worker) : crée une matière et la note
+        def noter():
+            with app.app_context():
+                matiere = Matiere(nom='Cryptographie', coefficient=2, credit=3)
+                db.session.add(matiere)
+                db.session.flush()
+                note = Note(etudiant_id=etudiant.id, matiere_id=matiere.id, valeur=15)
+                db.session.add(note)
+                enregistrer_notes(ajouts=[(note.etudiant_id, note.matiere_id, note.valeur)])
+                db.session.commit()
+        fil = threading.Thread(target=noter)
+        fil.start()
+        fil.join()
+
+        resultat = resultats_etudiant(etudiant)
+        assert list(resultat['matieres']) == ['Cryptographie']
+        assert resultat['moyenne_generale'] == 15
+
+
+def test_version_verifiee_sans_relire_les_tables(app, admin):
+    with app.app_context():
+        referentiels.lire()
+        chargements = referentiels.chargements
+    admin.get('/admin/matieres')
+    admin.get('/enseignant/notes')
+    with app.app_context():
+        assert referentiels.chargements == chargements
+
+    admin.post('/admin/matiere/ajouter', data={'nom': 'Statistiques', 'coefficient': 2, 'credit': 3})
+    assert 'Statistiques' in admin.get('/admin/matieres').get_data(as_text=True)
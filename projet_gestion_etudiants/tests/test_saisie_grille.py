@@ -0,0 +1,35 @@
+from app import db
+from app.calculs import verifier_moyennes
+from app.compteurs import lire_compteurs
+from app.models import Classe, Matiere, MoyenneMatiere, Note
+from conftest import ajouter_etudiants
+
+
+def test_grille_soumise_deux_fois_modifie_sans_doublon(app, enseignant):
+    with app.app_context():
+        classe_id = Classe.query.first().id
+        premier, second, troisieme = ajouter_etudiants([('Ndiaye', 'Fatou'), ('Sow', 'Awa'), ('Ba', 'Moussa')])
+        matiere_id = Matiere.query.first().id
+        notes_avant = lire_compteurs()['notes']
+    url = f'/enseignant/notes/saisie-classe?classe_id={classe_id}&matiere_id={matiere_id}&type_evaluation=Examen'
+
+    reponse = enseignant.post(url, data={f'note_{premier}': '12', f'note_{second}': '8,5'})
+    assert reponse.status_code == 302
+
+    # La grille réaffiche les notes saisies
+    page = enseignant.get(url).get_data(as_text=True)
+    assert 'value="12"' in page and 'value="8.5"' in page
+
+    # Seconde soumission : une note corrigée, une inchangée, une nouvelle
+    reponse = enseignant.post(url, data={f'note_{premier}': '15', f'note_{second}': '8.5', f'note_{troisieme}': '10'})
+    assert reponse.status_code == 302
+
+    with app.app_context():
+        notes = Note.query.filter_by(matiere_id=matiere_id, type_evaluation='Examen').filter(
+            Note.etudiant_id.in_([premier, second, troisieme])
+        ).all()
+        assert sorted((n.etudiant_id, n.valeur) for n in notes) == [(premier, 15), (second, 8.5), (troisieme, 10)]
+        assert db.session.get(MoyenneMatiere, (premier, matiere_id)).moyenne == 15
+        assert verifier_moyennes() == []
+        # Seules les notes réellement créées sont comptées
+        assert lire_compteurs()['notes'] == notes_avant + 3